@@ -0,0 +1,49 @@
+"""Benchmarks how the scheduling cost of a pipeline grows with the size of the DAG.
+
+Builds synthetic layered DAGs of no-op tasks of increasing size and reports the time spent
+creating and running the pipeline per node. Linear scheduling shows up as a constant cost per node.
+
+Usage:
+    python scripts/benchmarks/bench_dag_scaling.py --sizes 1000 2000 5000 10000
+"""
+
+import argparse
+import logging
+import time
+
+from bench_scheduler import build_dag
+
+from blueno import create_pipeline, job_registry
+
+
+def main():
+    """Entrypoint."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000])
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"{'nodes':>8} {'create (s)':>12} {'run (s)':>10} {'cpu (s)':>10} {'us/node':>10}")
+    for size in args.sizes:
+        job_registry.jobs.clear()
+        jobs = build_dag(size, args.width)
+
+        start = time.perf_counter()
+        pipeline = create_pipeline(jobs)
+        setup = time.perf_counter() - start
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        pipeline.run(concurrency=args.concurrency)
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+        per_node = (setup + wall) / size * 1_000_000
+        print(f"{size:>8} {setup:>12.3f} {wall:>10.3f} {cpu:>10.3f} {per_node:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmarks upserts into wide Delta tables with and without row hash change detection.
+
+Loads the same wide table twice - once with a row hash column - and then upserts a copy of it
+where a fraction of the rows changed. Without a row hash, the merge compares every column of every
+matched row. With a row hash, it only compares the hashes.
+
+Usage:
+    python scripts/benchmarks/bench_row_hash_merge.py --rows 100000 --columns 300 --changed 0.01
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from typing import Optional
+
+import polars as pl
+
+from blueno.etl import upsert
+
+
+def build_table(rows: int, columns: int) -> pl.DataFrame:
+    """Builds a table with an id column and `columns` integer and string columns."""
+    return pl.DataFrame({"id": range(rows)}).with_columns(
+        *[
+            (pl.col("id") * i).alias(f"int_{i}")
+            if i % 2
+            else pl.format("value {}", pl.col("id") + i).alias(f"str_{i}")
+            for i in range(columns)
+        ]
+    )
+
+
+def change_rows(df: pl.DataFrame, fraction: float) -> pl.DataFrame:
+    """Changes the last column of a fraction of the rows."""
+    changed = pl.col("id") % round(1 / fraction) == 0 if fraction else pl.lit(False)
+    last = df.columns[-1]
+    return df.with_columns(
+        pl.when(changed).then(pl.col(last).cast(pl.String) + "!").otherwise(pl.col(last))
+        if df.schema[last] == pl.String
+        else pl.when(changed).then(-pl.col(last)).otherwise(pl.col(last))
+    )
+
+
+def time_upsert(
+    path: str, initial: pl.DataFrame, source: pl.DataFrame, row_hash_column: Optional[str]
+) -> tuple[float, dict]:
+    """Loads the initial table, and returns the duration and metrics of upserting the source into it."""
+    upsert(path, initial, ["id"], row_hash_column=row_hash_column)
+
+    start = time.perf_counter()
+    metrics = upsert(path, source, ["id"], row_hash_column=row_hash_column)
+    return time.perf_counter() - start, metrics
+
+
+def main():
+    """Entrypoint."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=300)
+    parser.add_argument("--changed", type=float, default=0.01)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    initial = build_table(args.rows, args.columns)
+    source = change_rows(initial, args.changed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain, plain_metrics = time_upsert(f"{directory}/plain", initial, source, None)
+        hashed, hashed_metrics = time_upsert(f"{directory}/hashed", initial, source, "__row_hash")
+
+    print(f"rows:                   {args.rows}")
+    print(f"columns:                {args.columns + 1}")
+    print(f"changed rows:           {hashed_metrics['num_target_rows_updated']}")
+    print(
+        f"merge without row hash: {plain:.3f}s ({plain_metrics['num_target_rows_updated']} updated)"
+    )
+    print(
+        f"merge with row hash:    {hashed:.3f}s ({hashed_metrics['num_target_rows_updated']} updated)"
+    )
+    print(f"speedup:                {plain / hashed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
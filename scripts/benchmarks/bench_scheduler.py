@@ -0,0 +1,76 @@
+"""Benchmarks the overhead of the pipeline scheduler.
+
+Runs a synthetic DAG of no-op tasks and reports wall-clock time and the CPU time spent by the
+process, which for no-op tasks is almost entirely scheduler overhead.
+
+Usage:
+    python scripts/benchmarks/bench_scheduler.py --tasks 2000 --width 50 --concurrency 8
+"""
+
+import argparse
+import logging
+import time
+
+from blueno import Task, create_pipeline, job_registry
+
+
+def _noop(*args) -> None:
+    return None
+
+
+def build_dag(tasks: int, width: int) -> list[Task]:
+    """Builds a layered DAG where each task depends on up to two tasks in the previous layer."""
+    jobs: list[Task] = []
+    for i in range(tasks):
+        layer, position = divmod(i, width)
+        depends_on = []
+        if layer > 0:
+            previous_layer = jobs[(layer - 1) * width : layer * width]
+            depends_on = [
+                previous_layer[position % len(previous_layer)],
+                previous_layer[(position + 1) % len(previous_layer)],
+            ]
+        task = Task(
+            name=f"task_{i}",
+            tags={},
+            priority=100,
+            _fn=_noop,
+            _depends_on=depends_on,
+        )
+        task._register(job_registry)
+        jobs.append(task)
+    return jobs
+
+
+def main():
+    """Entrypoint."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    jobs = build_dag(args.tasks, args.width)
+
+    start = time.perf_counter()
+    pipeline = create_pipeline(jobs)
+    setup = time.perf_counter() - start
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    pipeline.run(concurrency=args.concurrency)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    print(f"tasks:              {args.tasks}")
+    print(f"concurrency:        {args.concurrency}")
+    print(f"create_pipeline:    {setup:.3f}s")
+    print(f"run wall-clock:     {wall:.3f}s")
+    print(f"run cpu time:       {cpu:.3f}s")
+    print(f"overhead per task:  {wall / args.tasks * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ from blueno.auth import (
     get_onelake_access_token,
 )
 from blueno.orchestration.blueprint import Blueprint
-from blueno.orchestration.job import BaseJob, job_registry
+from blueno.orchestration.job import BaseJob, RetryPolicy, job_registry
 from blueno.orchestration.pipeline import create_pipeline
 from blueno.orchestration.run_context import run_context
 from blueno.orchestration.task import Task
@@ -21,6 +21,7 @@ __all__ = (
     "DataFrameType",
     "Blueprint",
     "BaseJob",
+    "RetryPolicy",
     "Task",
     "create_pipeline",
     "job_registry",
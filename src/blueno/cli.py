@@ -1,4 +1,6 @@
 import logging
+import os
+from datetime import timedelta
 from typing import Annotated, Dict, List, Literal, Optional
 
 from cyclopts import App, Group, Parameter
@@ -6,6 +8,11 @@ from cyclopts import App, Group, Parameter
 from blueno import Blueprint, create_pipeline, job_registry, run_context
 from blueno.display import _task_display
 from blueno.exceptions import BluenoUserError
+from blueno.orchestration.distributed import Worker, WorkQueue
+from blueno.orchestration.history import RunHistory
+from blueno.orchestration.result_cache import ResultCache
+from blueno.tracing import Tracer
+from blueno.utils import get_delta_table_if_exists
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +65,12 @@ def _prepare_blueprints(project_dir: str) -> None:
     job_registry.discover_jobs(project_dir)
 
 
+def _history_path(project_dir: str, history_path: Optional[str]) -> str:
+    if history_path is not None:
+        return history_path
+    return os.path.join(project_dir, ".blueno", "history.db")
+
+
 @app.command
 def run(
     project_dir: str,
@@ -68,9 +81,29 @@ def run(
         Parameter(help="Show live updates, log output, or no output"),
     ] = "live",
     concurrency: int = 1,
+    executor: Literal["thread", "process"] = "thread",
     full_refresh: bool = False,
     force_refresh: bool = False,
     log_resource_usage: bool = False,
+    memory_budget: Optional[str] = None,
+    timeout: Optional[float] = None,
+    history_path: Optional[str] = None,
+    work_queue: Optional[str] = None,
+    shard: Optional[str] = None,
+    run_id: Optional[str] = None,
+    resume: Optional[str] = None,
+    resource_pools: Annotated[Optional[list[str]], Parameter(consume_multiple=True)] = None,
+    fair_share_tag: Optional[str] = None,
+    fair_share_weights: Annotated[Optional[list[str]], Parameter(consume_multiple=True)] = None,
+    fuse_siblings: bool = False,
+    result_cache: Optional[str] = None,
+    result_cache_size: Optional[str] = None,
+    plan: bool = False,
+    trace: Optional[str] = None,
+    trace_format: Literal["chrome", "otlp"] = "chrome",
+    continuous: bool = False,
+    poll_interval: float = 5.0,
+    debounce: float = 2.0,
     help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
     log_level: Annotated[
         Literal["DEBUG", "INFO", "WARNING", "ERROR"],
@@ -85,7 +118,27 @@ def run(
         select_tags: List of tags to filter on. Should be in the format: `mytag=value`. Same name tags will be treated as OR, and different named tags will be treated as AND. I.e. `color=blue color=red shape=circle` filters on `(color=blue OR color=red) AND shape=circle`.
         display_mode: Show live updates, log output, or no output
         concurrency: Number of concurrent jobs to run
+        executor: Default executor backend for jobs. `process` runs jobs in a pool of worker processes, which avoids contention on the GIL for pure-Python transformations.
         log_resource_usage: If True, cpu and memory usage will be logged at logging level INFO.
+        memory_budget: Memory budget for the run, e.g. `48GB`. Jobs are deferred while starting them would exceed the budget, based on their `memory_hint` or their peak memory usage in previous runs.
+        timeout: Default maximum duration in seconds of jobs which don't set their own `timeout`. Jobs running longer fail, and their dependents are cancelled.
+        history_path: Path of the SQLite database where the statistics of each run are recorded. Defaults to `.blueno/history.db` in the `project_dir`.
+        work_queue: Path of a SQLite work queue on shared storage. If provided, the run is coordinated from this process, and the jobs are run by `blueno worker` processes polling the same queue.
+        shard: Only run one shard of the DAG, in the format `i/n`, e.g. `2/3`. Other shards run in other processes with the same `--run-id`, and their upstream jobs are awaited by polling their Delta tables.
+        run_id: Id of the run. Required with `--shard`. Defaults to a new random id.
+        resume: Id of a failed run to resume. Only the jobs which did not complete in the run and their dependents are run again, and completed Delta tables are read at the versions they had in the run.
+        resource_pools: Capacities of the resource pools which jobs declare in their `resources`. Should be in the format: `name=capacity`, e.g. `onelake_write=1 sql_endpoint=2`.
+        fair_share_tag: Tag to share the concurrency fairly between the groups of jobs with the same tag value, e.g. `layer`.
+        fair_share_weights: Weights of the groups of the `fair_share_tag`. Should be in the format: `value=weight`, e.g. `silver=1 gold=2`.
+        fuse_siblings: Run ready blueprints which share an upstream together, and collect their transformed dataframes in one pass so their shared subplans are evaluated once. Each result is still written with the write mode of its blueprint.
+        result_cache: Path of a directory where the transformed dataframes of blueprints with `cache_result` are cached between runs. Blueprints whose transformation, configuration and inputs are unchanged are served from the cache instead of being transformed again.
+        result_cache_size: Maximum total size of the `result_cache`, e.g. `10GB`. The least recently used results are evicted when it is exceeded.
+        plan: Plan the run before starting it, like `blueno plan`. The freshness of all selected blueprints is checked in parallel, and jobs which don't need to run are skipped before any job starts.
+        trace: Path of a file to write a trace of the run to. The trace has a span for the run, each job, each step of the jobs and their Delta and Polars operations, and a counter of the busy and idle concurrency slots.
+        trace_format: Format of the `trace` file. `chrome` writes Chrome trace events which can be opened in Perfetto, and `otlp` writes OpenTelemetry spans in the OTLP JSON file format.
+        continuous: Keep running after the first run, and run the dependents of Delta tables as soon as other processes commit to them. Runs until interrupted.
+        poll_interval: Seconds between polls of the Delta logs of the tables with `--continuous`.
+        debounce: Seconds to wait for further commits before running the dependents of changed tables with `--continuous`.
         full_refresh: Sets a full refresh in the `blueno.orchestration.run_context` which can be accessed in blueprints to handle incremental logic.
         force_refresh: Disregards schedule and freshness checks to force selected jobs to run.
         help: Show this help and exit
@@ -95,26 +148,87 @@ def run(
     _prepare_blueprints(project_dir)
 
     blueprints = list(job_registry.jobs.values())
+    pipeline = create_pipeline(
+        blueprints, name_filters=select, tag_filters=_parse_tag_filters(select_tags or [])
+    )
+    pipeline.log_resource_usage = log_resource_usage
+    pipeline.fuse_siblings = fuse_siblings
+    pipeline.result_cache = (
+        ResultCache(result_cache, max_size=result_cache_size) if result_cache is not None else None
+    )
+    pipeline.history = RunHistory(_history_path(project_dir, history_path))
+    pipeline.tracer = Tracer() if trace is not None else None
+    pipeline.resource_pools = {
+        name: int(capacity) for name, capacity in _parse_assignments(resource_pools or []).items()
+    }
+    pipeline.fair_share_tag = fair_share_tag
+    pipeline.fair_share_weights = {
+        value: float(weight)
+        for value, weight in _parse_assignments(fair_share_weights or []).items()
+    }
 
-    tag_filters: Dict[str, List[str]] = {}
-    for tag in select_tags or []:
-        key, val = tag.split("=", 1)
-        if key in tag_filters:
-            tag_filters[key].append(val.split())
-        else:
-            tag_filters[key] = [val.strip()]
+    if continuous and (work_queue is not None or shard is not None or resume is not None):
+        msg = "`--continuous` can't be combined with `--work-queue`, `--shard` or `--resume`"
+        logger.error(msg)
+        raise BluenoUserError(msg)
 
-    pipeline = create_pipeline(blueprints, name_filters=select, tag_filters=tag_filters)
-    pipeline.log_resource_usage = log_resource_usage
+    if shard is not None:
+        index, count = _parse_shard(shard)
+        if run_id is None:
+            msg = "`--shard` requires a `--run-id` shared by all shards of the run"
+            logger.error(msg)
+            raise BluenoUserError(msg)
+        pipeline.shard(index, count)
+
+    if resume is not None:
+        pipeline.resume(resume)
+        run_id = resume
 
     run_context.force_refresh = force_refresh
     run_context.full_refresh = full_refresh
 
+    if plan:
+        pipeline.plan()
+
+    def run_pipeline() -> None:
+        if work_queue is not None:
+            pipeline.run_distributed(
+                WorkQueue(work_queue),
+                timeout=timedelta(seconds=timeout) if timeout is not None else None,
+                run_id=run_id,
+            )
+            return
+
+        if continuous:
+            pipeline.run_continuous(
+                concurrency=concurrency,
+                poll_interval=poll_interval,
+                debounce=timedelta(seconds=debounce),
+                executor=executor,
+                memory_budget=memory_budget,
+                timeout=timedelta(seconds=timeout) if timeout is not None else None,
+            )
+            return
+
+        pipeline.run(
+            concurrency=concurrency,
+            executor=executor,
+            memory_budget=memory_budget,
+            timeout=timedelta(seconds=timeout) if timeout is not None else None,
+            run_id=run_id,
+        )
+
     if display_mode == "live":
         with _task_display(pipeline, 10):
-            pipeline.run(concurrency=concurrency)
+            run_pipeline()
     else:
-        pipeline.run(concurrency=concurrency)
+        run_pipeline()
+
+    if pipeline.tracer is not None and trace is not None:
+        if trace_format == "otlp":
+            pipeline.tracer.export_otlp(trace)
+        else:
+            pipeline.tracer.export_chrome(trace)
 
     if pipeline.failed_jobs:
         import sys
@@ -122,6 +236,247 @@ def run(
         sys.exit(1)
 
 
+def _parse_tag_filters(select_tags: list[str]) -> Dict[str, List[str]]:
+    tag_filters: Dict[str, List[str]] = {}
+    for tag in select_tags:
+        key, val = tag.split("=", 1)
+        if key in tag_filters:
+            tag_filters[key].append(val.split())
+        else:
+            tag_filters[key] = [val.strip()]
+    return tag_filters
+
+
+def _parse_assignments(assignments: list[str]) -> Dict[str, str]:
+    values = {}
+    for assignment in assignments:
+        key, separator, value = assignment.partition("=")
+        if not separator:
+            msg = "invalid value %s - expected the format `key=value`"
+            logger.error(msg, assignment)
+            raise BluenoUserError(msg % assignment)
+        values[key.strip()] = value.strip()
+    return values
+
+
+def _parse_shard(shard: str) -> tuple[int, int]:
+    index, _, count = shard.partition("/")
+    if not (index.isdigit() and count.isdigit()):
+        msg = "invalid shard %s - expected the format `i/n`, e.g. `2/3`"
+        logger.error(msg, shard)
+        raise BluenoUserError(msg % shard)
+    return int(index), int(count)
+
+
+@app.command
+def worker(
+    project_dir: str,
+    work_queue: str,
+    lease: float = 60.0,
+    poll_interval: float = 1.0,
+    max_idle: Optional[float] = None,
+    help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
+    log_level: Annotated[
+        Literal["DEBUG", "INFO", "WARNING", "ERROR"],
+        Parameter(group=global_args, help="Log level to use"),
+    ] = "INFO",
+):
+    """Runs the jobs of distributed runs, which are coordinated by `blueno run --work-queue`.
+
+    Args:
+        project_dir: Path to the blueprints
+        work_queue: Path of the SQLite work queue shared with the coordinator.
+        lease: Seconds a claimed job stays claimed by this worker without a renewal. Jobs of workers which stop renewing their lease are claimed by other workers.
+        poll_interval: Seconds to wait before polling an empty work queue again.
+        max_idle: Stop the worker when there has been nothing to run for this many seconds. Defaults to running until interrupted.
+        help: Show this help and exit
+        log_level: Log level to use
+    """
+    _setup_logging(log_level, display_mode="log")
+    _prepare_blueprints(project_dir)
+
+    Worker(WorkQueue(work_queue), lease=timedelta(seconds=lease), poll_interval=poll_interval).run(
+        max_idle=timedelta(seconds=max_idle) if max_idle is not None else None
+    )
+
+
+@app.command
+def plan(
+    project_dir: str,
+    select: Annotated[Optional[list[str]], Parameter(consume_multiple=True)] = None,
+    select_tags: Annotated[Optional[list[str]], Parameter(consume_multiple=True)] = None,
+    concurrency: int = 8,
+    force_refresh: bool = False,
+    history_path: Optional[str] = None,
+    help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
+    log_level: Annotated[
+        Literal["DEBUG", "INFO", "WARNING", "ERROR"],
+        Parameter(group=global_args, help="Log level to use"),
+    ] = "WARNING",
+):
+    """Shows which blueprints a run would run and why, without running them.
+
+    Only the metadata of the target tables is read. The expected duration and peak memory of each job are estimated from the run history.
+
+    Args:
+        project_dir: Path to the blueprints
+        select: List of blueprints to run. If not provided, all blueprints will be run
+        select_tags: List of tags to filter on. Should be in the format: `mytag=value`, like in `blueno run`.
+        concurrency: Number of jobs to read the metadata of at the same time
+        force_refresh: Disregards schedule and freshness checks to force selected jobs to run.
+        history_path: Path of the SQLite database where the statistics of each run are recorded. Defaults to `.blueno/history.db` in the `project_dir`.
+        help: Show this help and exit
+        log_level: Log level to use
+    """
+    _setup_logging(log_level, display_mode=None)
+    _prepare_blueprints(project_dir)
+
+    pipeline = create_pipeline(
+        list(job_registry.jobs.values()),
+        name_filters=select,
+        tag_filters=_parse_tag_filters(select_tags or []),
+    )
+    pipeline.history = RunHistory(_history_path(project_dir, history_path))
+    run_context.force_refresh = force_refresh
+
+    entries = pipeline.plan(concurrency=concurrency)
+
+    print(f"{'job':<30}  {'action':<6}  {'duration':>9}  {'peak memory':>11}  reason")
+    for entry in entries:
+        action = "run" if entry.run else "skip"
+        duration = f"{entry.expected_duration:>8.2f}s" if entry.run else ""
+        memory = f"{entry.expected_memory / 1024**2:>8.1f} MB" if entry.run else ""
+        print(f"{entry.job_name:<30}  {action:<6}  {duration:>9}  {memory:>11}  {entry.reason}")
+
+    runs = [entry for entry in entries if entry.run]
+    print(
+        f"{len(runs)} of {len(entries)} jobs would run, "
+        f"with {sum(entry.expected_duration for entry in runs):.1f} seconds of expected work"
+    )
+
+
+@app.command
+def simulate(
+    project_dir: str,
+    concurrency: Annotated[list[int], Parameter(consume_multiple=True)],
+    select: Annotated[Optional[list[str]], Parameter(consume_multiple=True)] = None,
+    run_id: Optional[str] = None,
+    history_path: Optional[str] = None,
+    help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
+    log_level: Annotated[
+        Literal["DEBUG", "INFO", "WARNING", "ERROR"],
+        Parameter(group=global_args, help="Log level to use"),
+    ] = "INFO",
+):
+    """Predicts the duration of a run of the blueprints for each concurrency, without running them.
+
+    Args:
+        project_dir: Path to the blueprints
+        concurrency: Numbers of concurrent jobs to predict the duration for
+        select: List of blueprints to run. If not provided, all blueprints will be run
+        run_id: The recorded run to replay the job durations of. Defaults to the most recent run.
+        history_path: Path of the SQLite database where the statistics of each run are recorded. Defaults to `.blueno/history.db` in the `project_dir`.
+        help: Show this help and exit
+        log_level: Log level to use
+    """
+    _setup_logging(log_level, display_mode=None)
+    _prepare_blueprints(project_dir)
+
+    history = RunHistory(_history_path(project_dir, history_path))
+    durations = history.run_durations(run_id)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()), name_filters=select)
+    pipeline.history = history
+
+    for value in concurrency:
+        makespan = pipeline.simulate(concurrency=value, durations=durations)
+        print(f"concurrency {value}: {makespan:.1f} seconds")
+
+
+@app.command
+def history(
+    project_dir: str = ".",
+    job: Optional[str] = None,
+    limit: int = 20,
+    steps: bool = False,
+    history_path: Optional[str] = None,
+    help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
+    log_level: Annotated[
+        Literal["DEBUG", "INFO", "WARNING", "ERROR"],
+        Parameter(group=global_args, help="Log level to use"),
+    ] = "INFO",
+):
+    """Shows the most recent activities recorded in the run history.
+
+    Args:
+        project_dir: Path to the blueprints
+        job: Only show activities of the job with this name
+        limit: The maximum number of activities to show
+        steps: Show the wall and CPU time of each step of the activities
+        history_path: Path of the SQLite database where the statistics of each run are recorded. Defaults to `.blueno/history.db` in the `project_dir`.
+        help: Show this help and exit
+        log_level: Log level to use
+    """
+    from datetime import datetime
+
+    _setup_logging(log_level, display_mode=None)
+    run_history = RunHistory(_history_path(project_dir, history_path))
+
+    print(
+        f"{'started':<19}  {'run id':<8}  {'job':<30}  {'status':<9}  "
+        f"{'duration':>9}  {'cpu':>9}  {'rows':>10}  {'peak memory':>11}"
+    )
+    for record in run_history.activities(job_name=job, limit=limit):
+        started = datetime.fromtimestamp(record.start).strftime("%Y-%m-%d %H:%M:%S")
+        rows_written = "" if record.rows_written is None else str(record.rows_written)
+        print(
+            f"{started:<19}  {record.run_id[:8]:<8}  {record.job_name:<30}  {record.status:<9}  "
+            f"{record.duration:>8.2f}s  {record.cpu_time:>8.2f}s  {rows_written:>10}  "
+            f"{record.peak_memory / 1024**2:>8.1f} MB"
+        )
+        if steps:
+            for step in record.steps:
+                print(
+                    f"{'':<41}{step.name:<30}  {'':<9}  {step.wall_time:>8.2f}s  {step.cpu_time:>8.2f}s"
+                )
+
+
+@app.command
+def rebuild_key_index(
+    project_dir: str,
+    select: Annotated[Optional[list[str]], Parameter(consume_multiple=True)] = None,
+    help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
+    log_level: Annotated[
+        Literal["DEBUG", "INFO", "WARNING", "ERROR"],
+        Parameter(group=global_args, help="Log level to use"),
+    ] = "INFO",
+):
+    """Rebuilds the key indexes of the blueprints with `key_index`, e.g. after their tables were written by other engines.
+
+    Args:
+        project_dir: Path to the blueprints
+        select: List of blueprints to rebuild the key index of. If not provided, the key indexes of all blueprints will be rebuilt
+        help: Show this help and exit
+        log_level: Log level to use
+    """
+    _setup_logging(log_level, display_mode=None)
+    _prepare_blueprints(project_dir)
+
+    for job in job_registry.jobs.values():
+        if not isinstance(job, Blueprint) or not job.key_index or job.table_uri is None:
+            continue
+        if select and job.name not in select:
+            continue
+
+        dt = get_delta_table_if_exists(job.table_uri)
+        if dt is None:
+            print(f"{job.name:<30}  skipped - {job.table_uri} does not exist")
+            continue
+
+        job._key_index.rebuild(dt)
+        print(f"{job.name:<30}  indexed {dt.table_uri} at version {job._key_index.version}")
+
+
 @app.command
 def show_dag(
     project_dir: str,
@@ -153,6 +508,7 @@ def preview(
     project_dir: str,
     transformation_name: str,
     limit: int = 10,
+    result_cache: Optional[str] = None,
     help: Annotated[bool, Parameter(group=global_args, help="Show this help and exit")] = False,
     log_level: Annotated[
         Literal["DEBUG", "INFO", "WARNING", "ERROR"],
@@ -165,6 +521,7 @@ def preview(
         project_dir: Path to the blueprints
         transformation_name: The name of the transformation to preview
         limit: The number of rows to limit the output by. Using -1 will remove the limit.
+        result_cache: Path of the result cache directory of `blueno run`. A transformation with `cache_result` is served from the cache if its transformation, configuration and inputs are unchanged.
         help: Show this help and exit
         log_level: Log level to use
 
@@ -189,6 +546,9 @@ def preview(
         logger.error(msg)
         raise BluenoUserError(msg)
 
+    if result_cache is not None:
+        blueprint._result_cache = ResultCache(result_cache)
+
     blueprint.preview(
         show_preview=True,
         limit=limit,
@@ -36,6 +36,8 @@ def _render_table(activities: list[PipelineActivity]):
     # table.add_column("Step")
     table.add_column("Start Time")
     table.add_column("Duration")
+    table.add_column("CPU")
+    table.add_column("Peak Memory")
     table.add_column("Error")
 
     table.columns[2].min_width = 10
@@ -48,8 +50,17 @@ def _render_table(activities: list[PipelineActivity]):
 
     for activity in sorted_activities:
         color = STATUS_COLOR.get(activity.status, "white")
-        duration = f"{activity.duration:.1f}s" if activity.duration else "-"
+        if activity.status is ActivityStatus.RUNNING:
+            duration = f"{time.time() - activity.start:.1f}s"
+        else:
+            duration = f"{activity.duration:.1f}s" if activity.duration else "-"
         start = time.strftime("%H:%M:%S", time.localtime(activity.start)) if activity.start else "-"
+        cpu = f"{activity.cpu_time:.1f}s" if activity.start else "-"
+        memory = f"{activity.peak_memory / 1024**2:.1f} MB" if activity.start else "-"
+
+        status = activity.status.value
+        if activity.retries:
+            status += f" (retry {activity.retries})"
 
         if activity.exception:
             error = f"{type(activity.exception).__name__}: {str(activity.exception)}"
@@ -59,10 +70,12 @@ def _render_table(activities: list[PipelineActivity]):
         table.add_row(
             activity.job.name,
             activity.job.type,
-            f"[{color}]{activity.status.value}[/{color}]",
+            f"[{color}]{status}[/{color}]",
             # activity.job.current_step,
             start,
             duration,
+            cpu,
+            memory,
             error,
         )
 
@@ -2,13 +2,17 @@ import logging
 from typing import Dict, List, Optional, Union
 
 import polars as pl
-from deltalake import DeltaTable, write_deltalake
+from deltalake import CommitProperties, DeltaTable, write_deltalake
 from deltalake.table import TableMerger
 
+from blueno.etl.load.key_index import KeyIndex
 from blueno.exceptions import GenericBluenoError
+from blueno.tracing import trace_span
 from blueno.types import DataFrameType
 from blueno.utils import (
     build_merge_predicate,
+    build_merge_pruning_predicate,
+    build_when_matched_row_hash_predicate,
     build_when_matched_update_columns,
     build_when_matched_update_predicate,
     create_or_alter_delta_table,
@@ -18,6 +22,228 @@ from blueno.utils import (
 
 logger = logging.getLogger(__name__)
 
+# Partition columns with more distinct values in the source are pruned by their range instead.
+_MAX_PRUNING_VALUES = 100
+
+# Upserts where at most this fraction of the source keys exist in the target append the new keys, and only merge the others.
+_MAX_SPLIT_OVERLAP = 0.1
+
+# The table property recording the version of Polars which computed the row hashes of a table.
+_ROW_HASH_POLARS_VERSION = "blueno.row_hash.polars_version"
+
+
+def _is_file_scan(df: pl.LazyFrame) -> bool:
+    """Whether a lazy dataframe only scans Arrow IPC or Parquet files, like a spilled result, which is cheap to read again."""
+    plan = df.explain(optimized=False).splitlines()
+    return plan[0].startswith(("Ipc SCAN", "Parquet SCAN"))
+
+
+def _materialize(df: DataFrameType, engine: str = "streaming") -> DataFrameType:
+    """Collects a lazy source dataframe once, so the checks and the write of a load don't evaluate its plan again.
+
+    Lazy dataframes which only scan files are not collected, since they are read again from the files without
+    evaluating a plan, and are streamed to the table in batches instead of being loaded into memory.
+    """
+    if not isinstance(df, pl.LazyFrame):
+        return df
+
+    if _is_file_scan(df):
+        logger.debug("streaming the source dataframe from the files it scans")
+        return df
+
+    with trace_span("collect", "polars") as span:
+        df = df.collect(engine=engine)
+        span.update(rows=df.height, bytes=df.estimated_size())
+    return df
+
+
+def _count_rows(df: DataFrameType) -> int:
+    """The number of rows of a source dataframe, where lazy dataframes are counted without collecting them."""
+    if isinstance(df, pl.LazyFrame):
+        return df.select(pl.len()).collect().item()
+    return df.height
+
+
+def _write(dt: DeltaTable, df: DataFrameType, write_mode: str, rows: int, **options) -> None:
+    """Writes a source dataframe to a Delta table, where lazy dataframes are streamed in batches with `sink_delta`.
+
+    The write is traced with the size of the data and the version it committed.
+    """
+    with trace_span(
+        "write_deltalake",
+        "delta",
+        table_uri=dt.table_uri,
+        write_mode=write_mode,
+        rows=rows,
+        bytes=df.estimated_size() if isinstance(df, pl.DataFrame) else None,
+    ) as span:
+        mode = "append" if write_mode in ("append", "incremental") else "overwrite"
+        if isinstance(df, pl.LazyFrame):
+            df.sink_delta(dt, mode=mode, delta_write_options=options)
+        else:
+            write_deltalake(table_or_uri=dt, data=df, mode=mode, **options)
+        span["version"] = dt.version()
+
+
+def _add_row_hash(df: DataFrameType, row_hash_column: str, exclude: List[str]) -> DataFrameType:
+    """Adds a hash of the columns which are not excluded, in name order so it doesn't depend on the column order.
+
+    Delta tables have no unsigned integers, so the hash is stored as a signed 64-bit integer.
+    """
+    columns = sorted(
+        c for c in df.collect_schema().names() if c not in exclude and c != row_hash_column
+    )
+    row_hash = (
+        pl.struct(columns).hash(seed=0).reinterpret(signed=True)
+        if columns
+        else pl.lit(0, dtype=pl.Int64)
+    )
+    return df.with_columns(row_hash.alias(row_hash_column))
+
+
+def _row_hash_polars_version(dt: DeltaTable) -> Optional[str]:
+    """The version of Polars which computed the row hashes of a table, if it is recorded."""
+    return dt.metadata().configuration.get(_ROW_HASH_POLARS_VERSION)
+
+
+def _record_row_hash_polars_version(dt: DeltaTable) -> None:
+    """Records the current version of Polars as the one which computed the row hashes of a table, unless it already is."""
+    if _row_hash_polars_version(dt) != pl.__version__:
+        dt.alter.set_table_properties(
+            {_ROW_HASH_POLARS_VERSION: pl.__version__}, raise_if_not_exists=False
+        )
+
+
+def _is_orderable(dtype: pl.DataType) -> bool:
+    """Whether values of the type can be compared with SQL literals in a predicate."""
+    return dtype.is_numeric() or dtype.is_temporal() or dtype == pl.String
+
+
+def _overlapping_keys(df: DataFrameType, dt: DeltaTable, key_columns: List[str]) -> pl.DataFrame:
+    """Finds the keys of the source which exist in the target.
+
+    The keys of the target are only read if the statistics of a file allow it to contain a key of the source.
+    Only the statistics of integer and date keys are used, since Delta truncates the statistics of strings and timestamps.
+    """
+    schema = df.collect_schema()
+    keys = df.lazy().select(key_columns)
+    with trace_span("overlap check", "delta", table_uri=dt.table_uri) as span:
+        files = pl.DataFrame(dt.get_add_actions(flatten=True))
+        bounds = (
+            keys.select(
+                *[pl.col(column).min().alias(f"min.{column}") for column in key_columns],
+                *[pl.col(column).max().alias(f"max.{column}") for column in key_columns],
+            )
+            .collect()
+            .row(0, named=True)
+        )
+
+        candidates = files
+        for column in key_columns:
+            minimum, maximum = bounds[f"min.{column}"], bounds[f"max.{column}"]
+            if minimum is None:
+                # The column only contains NULLs, which never match.
+                candidates = candidates.clear()
+                break
+
+            dtype = schema[column]
+            if not (dtype.is_integer() or dtype == pl.Date) or f"min.{column}" not in files.columns:
+                continue
+            candidates = candidates.filter(
+                pl.col(f"min.{column}").is_null()
+                | pl.col(f"max.{column}").is_null()
+                | ((pl.col(f"min.{column}") <= maximum) & (pl.col(f"max.{column}") >= minimum))
+            )
+
+        span.update(files=files.height, candidate_files=candidates.height)
+        if candidates.height == 0:
+            span["overlapping_rows"] = 0
+            return pl.DataFrame(schema={column: schema[column] for column in key_columns})
+
+        existing_keys = (
+            pl.scan_delta(dt)
+            .select(key_columns)
+            .filter(
+                *[
+                    pl.col(column).is_between(
+                        pl.lit(bounds[f"min.{column}"]), pl.lit(bounds[f"max.{column}"])
+                    )
+                    for column in key_columns
+                    if _is_orderable(schema[column])
+                ]
+            )
+            .cast({column: schema[column] for column in key_columns})
+        )
+        overlap = keys.join(existing_keys, on=key_columns, how="semi").collect()
+        span["overlapping_rows"] = overlap.height
+
+    return overlap
+
+
+def _merge_pruning_predicate(
+    df: DataFrameType, dt: DeltaTable, key_columns: List[str], prune_columns: List[str]
+) -> str:
+    """Builds the conjuncts which restrict the target of a merge to the keys and prune columns of the source.
+
+    Key columns are pruned by their range, since NULL keys never match. Prune columns which are partition columns
+    of the target are pruned by their distinct values, and other prune columns by their range, unless they contain NULLs.
+    """
+    target_columns = [field.name for field in dt.schema().fields]
+    partition_columns = dt.metadata().partition_columns
+
+    schema = df.collect_schema()
+
+    def is_orderable(column: str) -> bool:
+        return _is_orderable(schema[column])
+
+    columns = [
+        column
+        for column in dict.fromkeys(key_columns + prune_columns)
+        if column in schema and column in target_columns
+    ]
+    value_columns = [
+        column for column in columns if column in partition_columns and column not in key_columns
+    ]
+    range_columns = [
+        column for column in columns if column not in value_columns and is_orderable(column)
+    ]
+    if not value_columns and not range_columns:
+        return ""
+
+    # The statistics of all columns are computed in one pass.
+    statistics = (
+        df.lazy()
+        .select(
+            *[pl.col(column).min().alias(f"min_{i}") for i, column in enumerate(range_columns)],
+            *[pl.col(column).max().alias(f"max_{i}") for i, column in enumerate(range_columns)],
+            *[
+                pl.col(column).null_count().alias(f"nulls_{i}")
+                for i, column in enumerate(range_columns)
+            ],
+            *[
+                pl.col(column).unique().implode().alias(f"values_{i}")
+                for i, column in enumerate(value_columns)
+            ],
+        )
+        .collect()
+        .row(0, named=True)
+    )
+
+    ranges = {
+        column: (statistics[f"min_{i}"], statistics[f"max_{i}"])
+        for i, column in enumerate(range_columns)
+        if column in key_columns or statistics[f"nulls_{i}"] == 0
+    }
+    values = {}
+    for i, column in enumerate(value_columns):
+        column_values = statistics[f"values_{i}"]
+        if len(column_values) <= _MAX_PRUNING_VALUES:
+            values[column] = column_values
+        elif is_orderable(column) and None not in column_values:
+            ranges[column] = (min(column_values), max(column_values))
+
+    return build_merge_pruning_predicate(ranges, values)
+
 
 def upsert(
     table_or_uri: Union[str, DeltaTable],
@@ -25,6 +251,10 @@ def upsert(
     key_columns: List[str],
     update_exclusion_columns: Optional[List[str]] = None,
     predicate_exclusion_columns: Optional[List[str]] = None,
+    row_hash_column: Optional[str] = None,
+    prune_columns: Optional[List[str]] = None,
+    append_new_keys: bool = False,
+    key_index: Optional[KeyIndex] = None,
 ) -> Dict[str, str] | None:
     """Updates existing records and inserts new records into a Delta table.
 
@@ -34,9 +264,29 @@ def upsert(
         key_columns: Column(s) that uniquely identify each record
         update_exclusion_columns: Columns that should never be updated (e.g., created_at)
         predicate_exclusion_columns: Columns to ignore when checking for changes
+        row_hash_column: Optional column to store a 64-bit hash of the compared columns in.
+            Matched records are then only compared by their hash instead of column by column, which keeps
+            the merge predicate small for wide tables. Records written without a hash are always updated.
+            The hash is only stable within a version of Polars, which is recorded in the table property `blueno.row_hash.polars_version`.
+            When it differs from the current version, a warning is logged and matched records are updated without comparing
+            their hashes, which recomputes them - so every record is rewritten once after Polars is upgraded.
+        prune_columns: Columns whose value never changes for a key, e.g. a partition or event date column.
+            The merge predicate is restricted to the range of the key columns in the source, and the values of these columns,
+            so files of the target outside the source are skipped. Records whose value of a prune column changed are not matched,
+            and are inserted as duplicates.
+        append_new_keys: Whether to check which keys of the source exist in the target before merging.
+            If none exist, the source is appended without a merge. If only a few exist, the records with new keys
+            are appended and only the others are merged, in a second commit. The file statistics of integer and date keys
+            are checked first, so the keys of the target are only read when they may overlap with the source.
+            **Unsafe with concurrent writers**: the check and the append are not atomic, and appends never conflict, so a key
+            inserted by another writer in between is appended as a duplicate, where a merge would have failed with a conflict.
+        key_index: Optional index of the keys of the table, which is synced with the table before and after the upsert.
+            With `append_new_keys`, the keys of the source are looked up in the index instead of the table, so records with new keys
+            are found without reading the table.
 
     Returns:
-        Dict containing merge operation statistics
+        Dict containing merge operation statistics. The `upsert_path` entry records whether the source was
+        appended (`append`), split between an append and a merge (`split`) or merged (`merge`).
 
     Example:
         ```python
@@ -56,14 +306,109 @@ def upsert(
     if predicate_exclusion_columns is None:
         predicate_exclusion_columns = []
 
-    schema = df.schema if isinstance(df, pl.DataFrame) else df.collect_schema()
+    if prune_columns is None:
+        prune_columns = []
+
+    df = _materialize(df)
+    if row_hash_column is not None:
+        df = _add_row_hash(
+            df,
+            row_hash_column,
+            exclude=key_columns + predicate_exclusion_columns + update_exclusion_columns,
+        )
+
+    schema = df.collect_schema()
     dt = create_or_alter_delta_table(table_or_uri, schema)
 
-    target_columns = [field.name for field in dt.schema().fields]
+    row_hash_outdated = False
+    if row_hash_column is not None:
+        hash_polars_version = _row_hash_polars_version(dt)
+        row_hash_outdated = hash_polars_version not in (None, pl.__version__)
+        if row_hash_outdated:
+            logger.warning(
+                "row hashes of %s were computed by Polars %s - updating all matched records to recompute them with Polars %s",
+                dt.table_uri,
+                hash_polars_version,
+                pl.__version__,
+            )
+
+    # TODO: delta-rs doesn't handle duplicates before merging atm, so this check ensure we don't merge with duplicates in the source_df
+    # https://github.com/delta-io/delta-rs/issues/2407
+    # The row count and the number of unique keys are computed in one pass.
+    rows, unique_rows = (
+        df.lazy().select(pl.len(), pl.struct(key_columns).n_unique()).collect().row(0)
+    )
 
-    df = df.lazy()
+    duplicates = rows - unique_rows
+
+    if duplicates != 0:
+        msg = (
+            "%s duplicates in source dataframe detected - duplicates are not allowed when upserting"
+        )
+        logger.error(
+            "%s duplicates in source dataframe detected - duplicates are not allowed when upserting",
+            duplicates,
+        )
+        raise GenericBluenoError(msg % duplicates)
+
+    if rows == 0:
+        logger.warning("no rows in source dataframe detected - skipping upsert")
+        return
+
+    upsert_path = "merge"
+    insert_df, insert_rows, merge_rows = None, 0, rows
+    if append_new_keys:
+        if key_index is not None:
+            key_index.sync(dt)
+            overlap = key_index.candidates(df.lazy().select(key_columns))
+        else:
+            overlap = _overlapping_keys(df, dt, key_columns)
+        overlap_rows = overlap.height
+        if overlap_rows == 0:
+            upsert_path = "append"
+            insert_df, insert_rows, merge_rows = df, rows, 0
+        elif overlap_rows <= rows * _MAX_SPLIT_OVERLAP:
+            upsert_path = "split"
+            # The keys are unique, so the overlapping keys are the records to merge.
+            overlap = overlap if isinstance(df, pl.DataFrame) else overlap.lazy()
+            insert_df = df.join(overlap, on=key_columns, how="anti")
+            df = df.join(overlap, on=key_columns, how="semi")
+            insert_rows, merge_rows = rows - overlap_rows, overlap_rows
+
+    logger.info(
+        "upserting %s rows into %s by %s - appending %s rows and merging %s rows",
+        rows,
+        dt.table_uri,
+        upsert_path,
+        insert_rows,
+        merge_rows,
+    )
+    if insert_rows > 0:
+        _write(dt, insert_df, "append", insert_rows, schema_mode="merge")
+
+    if merge_rows == 0:
+        if row_hash_column is not None:
+            _record_row_hash_polars_version(dt)
+        if key_index is not None:
+            key_index.sync(dt)
+        return {
+            "num_source_rows": rows,
+            "num_target_rows_inserted": rows,
+            "num_target_rows_updated": 0,
+            "num_target_rows_deleted": 0,
+            "num_output_rows": rows,
+            "num_target_files_scanned": 0,
+            "num_target_files_removed": 0,
+            "upsert_path": upsert_path,
+        }
+
+    target_columns = [field.name for field in dt.schema().fields]
 
     merge_predicate = build_merge_predicate(key_columns)
+    pruning_predicate = _merge_pruning_predicate(df, dt, key_columns, prune_columns)
+    if pruning_predicate:
+        logger.debug("pruning merge into %s with predicate: %s", dt.table_uri, pruning_predicate)
+        merge_predicate = f"{merge_predicate} AND {pruning_predicate}"
 
     predicate_update_columns = [
         column
@@ -74,40 +419,28 @@ def upsert(
 
     new_columns = [
         column
-        for column in df.columns
+        for column in schema.names()
         if column not in target_columns + predicate_exclusion_columns
     ]
 
-    when_matched_update_predicates = build_when_matched_update_predicate(
-        predicate_update_columns, new_columns
-    )
+    if row_hash_column is not None:
+        # Until the target has a hash column computed by this version of Polars, every matched record is updated, which adds it.
+        when_matched_update_predicates = (
+            build_when_matched_row_hash_predicate(row_hash_column)
+            if row_hash_column in target_columns and not row_hash_outdated
+            else None
+        )
+    else:
+        when_matched_update_predicates = build_when_matched_update_predicate(
+            predicate_update_columns, new_columns
+        )
 
     update_columns = [
-        column for column in df.columns if column not in key_columns + update_exclusion_columns
+        column for column in schema.names() if column not in key_columns + update_exclusion_columns
     ]
     when_matched_update_columns = build_when_matched_update_columns(update_columns)
 
-    # TODO: delta-rs doesn't handle duplicates before merging atm, so this check ensure we don't merge with duplicates in the source_df
-    # https://github.com/delta-io/delta-rs/issues/2407
-    unique_rows = df.select(key_columns).unique().select(pl.len()).collect().item()
-
-    duplicates = df.select(key_columns).select(pl.len()).collect().item() - unique_rows
-
-    if duplicates != 0:
-        msg = (
-            "%s duplicates in source dataframe detected - duplicates are not allowed when upserting"
-        )
-        logger.error(
-            "%s duplicates in source dataframe detected - duplicates are not allowed when upserting",
-            duplicates,
-        )
-        raise GenericBluenoError(msg % duplicates)
-
-    if df.select(pl.len()).collect().item() == 0:
-        logger.warning("no rows in source dataframe detected - skipping upsert")
-        return
-
-    table_merger: TableMerger = df.sink_delta(
+    table_merger: TableMerger = df.lazy().sink_delta(
         target=dt,
         mode="merge",
         delta_merge_options={
@@ -122,7 +455,34 @@ def upsert(
         predicate=when_matched_update_predicates or None, updates=when_matched_update_columns
     ).when_not_matched_insert_all()
 
-    return table_merger.execute()
+    with trace_span("merge", "delta", table_uri=dt.table_uri) as span:
+        metrics = table_merger.execute()
+        span.update(
+            rows_inserted=metrics.get("num_target_rows_inserted"),
+            rows_updated=metrics.get("num_target_rows_updated"),
+            files_scanned=metrics.get("num_target_files_scanned"),
+            files_skipped=metrics.get("num_target_files_skipped_during_scan"),
+            files_rewritten=metrics.get("num_target_files_removed"),
+            version=dt.version(),
+        )
+
+    logger.debug(
+        "merged into %s: scanned %s files, skipped %s files and rewrote %s files",
+        dt.table_uri,
+        metrics.get("num_target_files_scanned"),
+        metrics.get("num_target_files_skipped_during_scan"),
+        metrics.get("num_target_files_removed"),
+    )
+    metrics["num_source_rows"] = rows
+    metrics["num_target_rows_inserted"] += insert_rows
+    metrics["num_output_rows"] += insert_rows
+    metrics["upsert_path"] = upsert_path
+
+    if row_hash_column is not None:
+        _record_row_hash_polars_version(dt)
+    if key_index is not None:
+        key_index.sync(dt)
+    return metrics
 
 
 def overwrite(table_or_uri: str | DeltaTable, df: DataFrameType) -> None:
@@ -144,21 +504,16 @@ def overwrite(table_or_uri: str | DeltaTable, df: DataFrameType) -> None:
         overwrite("path/to/overwrite_delta_table", data)
         ```
     """
-    if isinstance(df, pl.LazyFrame):
-        df = df.collect()
+    df = _materialize(df, engine="auto")
 
-    dt = create_or_alter_delta_table(table_or_uri, df.schema)
+    dt = create_or_alter_delta_table(table_or_uri, df.collect_schema())
 
-    if df.select(pl.len()).item() == 0:
+    rows = _count_rows(df)
+    if rows == 0:
         logger.warning("no rows in source dataframe detected - skipping overwrite")
         return
 
-    write_deltalake(
-        table_or_uri=dt,
-        data=df,
-        mode="overwrite",
-        schema_mode="overwrite",
-    )
+    _write(dt, df, "overwrite", rows, schema_mode="overwrite")
 
 
 def replace_range(
@@ -186,32 +541,26 @@ def replace_range(
         replace_range("path/to/replace_range_delta_table", data, range_column="date")
         ```
     """
-    if isinstance(df, pl.LazyFrame):
-        min_value, max_value = (
-            df.select(
-                pl.col(range_column).min().alias("min"),
-                pl.col(range_column).max().alias("max"),
-            )
-            .collect()
-            .row(0)
-        )
+    df = _materialize(df)
 
-    else:
-        min_value, max_value = df.select(
+    rows, min_value, max_value = (
+        df.lazy()
+        .select(
+            pl.len(),
             pl.col(range_column).min().alias("min"),
             pl.col(range_column).max().alias("max"),
-        ).row(0)
+        )
+        .collect()
+        .row(0)
+    )
 
     predicate = f"{quote_identifier(range_column)} >= '{min_value}' AND {quote_identifier(range_column)} <= '{max_value}'"
 
     logger.debug("overwriting with predicate: %s" % predicate)
 
-    if isinstance(df, pl.LazyFrame):
-        df = df.collect(engine="streaming")
-
-    dt = create_or_alter_delta_table(table_or_uri, df.schema)
+    dt = create_or_alter_delta_table(table_or_uri, df.collect_schema())
 
-    if df.select(pl.len()).item() == 0:
+    if rows == 0:
         logger.warning("no rows in source dataframe detected - skipping replace_range")
         return
 
@@ -225,21 +574,20 @@ def replace_range(
             % (range_column, dt.table_uri)
         )
 
-    write_deltalake(
-        table_or_uri=dt,
-        data=df,
-        mode="overwrite",
-        predicate=predicate,
-        schema_mode="merge",
-    )
+    _write(dt, df, "replace_range", rows, predicate=predicate, schema_mode="merge")
 
 
-def append(table_or_uri: str | DeltaTable, df: DataFrameType) -> None:
+def append(
+    table_or_uri: str | DeltaTable,
+    df: DataFrameType,
+    commit_properties: Optional[CommitProperties] = None,
+) -> None:
     """Appends the provided dataframe to the Delta table.
 
     Args:
         table_or_uri: The URI of the target Delta table
         df: The dataframe to append to the Delta table
+        commit_properties: Optional properties of the commit, e.g. an application transaction to make the append idempotent.
 
     Example:
         ```python
@@ -253,19 +601,24 @@ def append(table_or_uri: str | DeltaTable, df: DataFrameType) -> None:
         append("path/to/append_delta_table", data)
         ```
     """
-    if isinstance(df, pl.LazyFrame):
-        df = df.collect(engine="streaming")
+    df = _materialize(df)
 
-    dt = create_or_alter_delta_table(table_or_uri, df.schema)
+    dt = create_or_alter_delta_table(table_or_uri, df.collect_schema())
 
-    if df.select(pl.len()).item() == 0:
+    rows = _count_rows(df)
+    if rows == 0:
         logger.warning("no rows in source dataframe detected - skipping append")
         return
 
-    write_deltalake(table_or_uri=dt, data=df, mode="append", schema_mode="merge")
+    _write(dt, df, "append", rows, schema_mode="merge", commit_properties=commit_properties)
 
 
-def incremental(table_or_uri: str | DeltaTable, df: DataFrameType, incremental_column: str) -> None:
+def incremental(
+    table_or_uri: str | DeltaTable,
+    df: DataFrameType,
+    incremental_column: str,
+    commit_properties: Optional[CommitProperties] = None,
+) -> None:
     """Appends only new records based on an incremental column value.
 
     Args:
@@ -274,6 +627,7 @@ def incremental(table_or_uri: str | DeltaTable, df: DataFrameType, incremental_c
         incremental_column: Column used to identify new records. Only records where
             this column's value is greater than the maximum value in the existing
             table will be appended
+        commit_properties: Optional properties of the commit, e.g. an application transaction to make the append idempotent.
 
     Example:
         ```python
@@ -287,28 +641,25 @@ def incremental(table_or_uri: str | DeltaTable, df: DataFrameType, incremental_c
         incremental("path/to/incremental_delta_table", data, incremental_column="timestamp")
         ```
     """
-    schema = df.schema if isinstance(df, pl.DataFrame) else df.collect_schema()
+    dt = create_or_alter_delta_table(table_or_uri, df.collect_schema())
 
-    dt = create_or_alter_delta_table(table_or_uri, schema)
+    # A scan of files is filtered while it is streamed, instead of being collected.
+    streamed = isinstance(df, pl.LazyFrame) and _is_file_scan(df)
 
     max_value = get_max_column_value(dt, incremental_column)
 
     if max_value is not None:
         df = df.filter(pl.col(incremental_column) > max_value)
 
-    if isinstance(df, pl.LazyFrame):
-        df = df.collect(engine="streaming")
+    if not streamed:
+        df = _materialize(df)
 
-    if df.select(pl.len()).item() == 0:
+    rows = _count_rows(df)
+    if rows == 0:
         logger.warning("no rows in source dataframe detected - skipping incremental")
         return
 
-    write_deltalake(
-        table_or_uri=dt,
-        data=df,
-        mode="append",
-        schema_mode="merge",
-    )
+    _write(dt, df, "incremental", rows, schema_mode="merge", commit_properties=commit_properties)
 
 
 # def update_outdated_scd2_dimension_keys(
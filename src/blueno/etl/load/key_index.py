@@ -0,0 +1,234 @@
+import json
+import logging
+from typing import List, Optional
+
+import polars as pl
+from deltalake import DeltaTable
+
+from blueno.auth import get_storage_options
+from blueno.exceptions import GenericBluenoError
+from blueno.tracing import trace_span
+from blueno.types import DataFrameType
+
+logger = logging.getLogger(__name__)
+
+# Indexes of another format are rebuilt.
+_FORMAT_VERSION = "1"
+
+_ENTRIES_SCHEMA = pl.Schema({"key_hash": pl.UInt64, "path": pl.String})
+
+
+class KeyIndex:
+    """An index of the keys in each file of a Delta table, stored in `{table_uri}/_blueno/key_index.parquet`.
+
+    The index maps a 64-bit hash of the key columns of each record to the path of the file holding it, sorted by the hash.
+    It is synced with the Delta log by comparing the files it indexed with the files of the current version of the table:
+    the keys of added files are read, and the entries of removed files are dropped. So it also follows commits of other
+    engines and table maintenance, at the cost of reading the key columns of the files they added.
+
+    The index may contain keys which no longer exist, e.g. records removed by deletion vectors or hash collisions,
+    but it never misses a key of the table - a key which is not in the index does not exist in the table.
+
+    The hash is only stable within a version of Polars, so the index is rebuilt after Polars is upgraded.
+
+    Example:
+    ```python notest
+    from blueno.etl import upsert
+    from blueno.etl.load.key_index import KeyIndex
+
+    key_index = KeyIndex("path/to/delta_table", ["id"])
+    upsert("path/to/delta_table", df, key_columns=["id"], append_new_keys=True, key_index=key_index)
+    ```
+    """
+
+    def __init__(self, table_uri: str, key_columns: List[str]):
+        """Creates the index of a table. The stored index is loaded when it is first synced.
+
+        Args:
+            table_uri: The URI of the Delta table.
+            key_columns: The columns which identify each record.
+        """
+        self.table_uri = table_uri.rstrip("/")
+        self.key_columns = key_columns
+        self.path = f"{self.table_uri}/_blueno/key_index.parquet"
+        self._storage_options = get_storage_options(table_uri)
+        self._entries: Optional[pl.DataFrame] = None
+        self._version: Optional[int] = None
+        self._key_schema: Optional[pl.Schema] = None
+
+    @property
+    def version(self) -> Optional[int]:
+        """The version of the table the index was last synced with, if any."""
+        return self._version
+
+    def _metadata(self) -> dict[str, str]:
+        return {
+            "blueno.key_index.format": _FORMAT_VERSION,
+            "blueno.key_index.key_columns": json.dumps(self.key_columns),
+            "blueno.key_index.polars_version": pl.__version__,
+            "blueno.key_index.table_version": str(self._version),
+        }
+
+    def _load(self, dt: DeltaTable) -> None:
+        """Loads the stored index, unless it is missing, of another format, key or Polars version, or newer than the table."""
+        self._entries = pl.DataFrame(schema=_ENTRIES_SCHEMA)
+        self._version = None
+
+        try:
+            metadata = pl.read_parquet_metadata(self.path, storage_options=self._storage_options)
+        except Exception as e:
+            # A missing or partially written index is rebuilt.
+            logger.debug("no key index found at %s - rebuilding it: %s", self.path, e)
+            return
+
+        expected = self._metadata()
+        table_version = int(metadata.get("blueno.key_index.table_version") or -1)
+        for key in ("format", "key_columns", "polars_version"):
+            name = f"blueno.key_index.{key}"
+            if metadata.get(name) != expected[name]:
+                logger.info(
+                    "key index at %s has %s %s instead of %s - rebuilding it",
+                    self.path,
+                    key,
+                    metadata.get(name),
+                    expected[name],
+                )
+                return
+
+        if table_version > dt.version():
+            logger.info(
+                "key index at %s is of version %s, but the table is at version %s - rebuilding it",
+                self.path,
+                table_version,
+                dt.version(),
+            )
+            return
+
+        self._entries = pl.read_parquet(self.path, storage_options=self._storage_options)
+        self._version = table_version
+
+    def sync(self, dt: DeltaTable) -> None:
+        """Brings the index up to date with the current version of the table, and stores it if it changed.
+
+        Args:
+            dt: The Delta table of the index.
+        """
+        if self._entries is None:
+            self._load(dt)
+
+        version = dt.version()
+        files = pl.DataFrame(dt.get_add_actions(flatten=True))
+        if files.is_empty():
+            files = pl.DataFrame(schema={"path": pl.String})
+        self._key_schema = pl.Schema(
+            {
+                column: dtype
+                for column, dtype in pl.Schema(dt.schema()).items()
+                if column in self.key_columns
+            }
+        )
+
+        indexed = self._entries["path"].unique()
+        removed = indexed.filter(~indexed.is_in(files["path"].implode()))
+        added = files.filter(~pl.col("path").is_in(indexed.implode()))
+        if removed.is_empty() and added.is_empty():
+            self._version = version
+            return
+
+        with trace_span(
+            "key index sync",
+            "delta",
+            table_uri=self.table_uri,
+            from_version=self._version,
+            version=version,
+            files_added=added.height,
+            files_removed=removed.len(),
+        ):
+            entries = pl.concat(
+                [
+                    self._entries.filter(~pl.col("path").is_in(removed.implode())),
+                    self._read_keys(dt, added),
+                ]
+            ).sort("key_hash")
+
+        logger.debug(
+            "synced key index of %s from version %s to %s: indexed %s files and dropped %s files",
+            self.table_uri,
+            self._version,
+            version,
+            added.height,
+            removed.len(),
+        )
+        self._entries, self._version = entries, version
+        entries.write_parquet(
+            self.path, storage_options=self._storage_options, metadata=self._metadata(), mkdir=True
+        )
+
+    def rebuild(self, dt: DeltaTable) -> None:
+        """Discards the index, and indexes every file of the current version of the table.
+
+        Args:
+            dt: The Delta table of the index.
+        """
+        self._entries = pl.DataFrame(schema=_ENTRIES_SCHEMA)
+        self._version = None
+        self.sync(dt)
+
+    def _read_keys(self, dt: DeltaTable, files: pl.DataFrame) -> pl.DataFrame:
+        """Reads the keys of files, where the values of partition columns are taken from their add actions."""
+        if files.is_empty():
+            return pl.DataFrame(schema=_ENTRIES_SCHEMA)
+
+        base_uri = dt.table_uri.rstrip("/")
+        partitions = [
+            column for column in self.key_columns if f"partition.{column}" in files.columns
+        ]
+        data_columns = [column for column in self.key_columns if column not in partitions]
+
+        # Each file is scanned on its own, since the paths in the log are percent-encoded and
+        # don't match the paths Polars reports for the files it scanned.
+        keys = [
+            pl.scan_parquet(
+                f"{base_uri}/{file['path']}",
+                storage_options=self._storage_options,
+                hive_partitioning=False,
+            )
+            .select(
+                *data_columns,
+                *[pl.lit(file[f"partition.{column}"]).alias(column) for column in partitions],
+                pl.lit(file["path"]).alias("path"),
+            )
+            .select(self._hash().alias("key_hash"), "path")
+            for file in files.iter_rows(named=True)
+        ]
+        return pl.concat(pl.collect_all(keys))
+
+    def _hash(self) -> pl.Expr:
+        """The hash of the key columns, cast to their types in the table so the hashes of source and target agree."""
+        return pl.struct(
+            [pl.col(column).cast(self._key_schema[column]) for column in self.key_columns]
+        ).hash(seed=0)
+
+    def may_exist(self) -> pl.Expr:
+        """An expression which is true for records whose keys may exist in the table, and false for records whose keys do not."""
+        if self._entries is None:
+            msg = "key index of %s must be synced before looking up keys"
+            logger.error(msg, self.table_uri)
+            raise GenericBluenoError(msg % self.table_uri)
+
+        return self._hash().is_in(self._entries["key_hash"].implode())
+
+    def candidates(self, df: DataFrameType) -> pl.DataFrame:
+        """The records whose keys may exist in the table. The keys of the other records do not exist in it.
+
+        Args:
+            df: The records to look up, with the key columns.
+
+        Returns:
+            The records whose key hash is in the index.
+        """
+        may_exist = self.may_exist()
+        with trace_span("key index lookup", "polars", table_uri=self.table_uri) as span:
+            candidates = df.lazy().filter(may_exist).collect()
+            span["candidates"] = candidates.height
+        return candidates
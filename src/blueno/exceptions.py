@@ -32,3 +32,15 @@ class Unreachable(Exception):
     """Raised when supposedly unreachable code is executed (should never happen)."""
 
     pass
+
+
+class JobTimeoutError(Exception):
+    """Raised when a job runs longer than its timeout."""
+
+    pass
+
+
+class JobCancelledError(Exception):
+    """Raised in a job when it starts a step after it was cancelled."""
+
+    pass
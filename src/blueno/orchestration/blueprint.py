@@ -3,14 +3,24 @@ from __future__ import annotations
 import inspect
 import json
 import logging
+import os
+import shutil
+import tempfile
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from functools import cached_property
-from typing import Callable, Dict, List, Literal, Optional, Tuple
+from typing import Callable, Dict, List, Literal, Optional, Tuple, Union
 
 import polars as pl
 from croniter import croniter
-from deltalake import DeltaTable, PostCommitHookProperties, WriterProperties
+from deltalake import (
+    CommitProperties,
+    DeltaTable,
+    PostCommitHookProperties,
+    Transaction,
+    WriterProperties,
+)
 from polars.testing import assert_frame_equal
 from typing_extensions import override
 
@@ -25,24 +35,44 @@ from blueno.etl import (
     upsert,
     write_parquet,
 )
+from blueno.etl.load.key_index import KeyIndex
 from blueno.exceptions import (
     BluenoUserError,
     GenericBluenoError,
     InvalidJobError,
     Unreachable,
 )
-from blueno.orchestration.job import BaseJob, JobRegistry, job_registry, track_step
+from blueno.orchestration.job import (
+    BaseJob,
+    CacheHint,
+    JobRegistry,
+    RefreshDecision,
+    RetryPolicy,
+    StepTiming,
+    job_registry,
+    run_coroutine,
+    track_step,
+)
+from blueno.orchestration.result_cache import fingerprint, function_fingerprint, path_fingerprint
 from blueno.orchestration.run_context import run_context
+from blueno.tracing import trace_span
 from blueno.types import DataFrameType
 from blueno.utils import (
     create_or_alter_delta_table,
     get_delta_table_if_exists,
     get_last_modified_time,
     get_max_column_value,
+    get_rows_written,
 )
 
 logger = logging.getLogger(__name__)
 
+# Write modes which are not idempotent, so retried writes must not commit twice in the same run.
+_APPEND_WRITE_MODES = ("append", "incremental", "safe_append")
+
+# Results are spilled beyond this many bytes when they are materialized outside a pipeline run which spills results.
+_DEFAULT_SPILL_SIZE = 1024**3
+
 
 @dataclass(kw_only=True)
 class Blueprint(BaseJob):
@@ -61,12 +91,22 @@ class Blueprint(BaseJob):
     maintenance_schedule: Optional[str] = None
     table_properties: Optional[Dict[str, str]] = None
     cache_mode: Optional[Literal["file", "memory"]] = None
+    cache_result: bool = False
+    row_hash: bool = False
+    merge_prune_columns: List[str] = field(default_factory=list)
+    key_index: bool = False
+    append_new_keys: bool = False
 
     _delta_table: Optional[DeltaTable] = None
     _inputs: list[BaseJob] = field(default_factory=list)
     _dataframe: DataFrameType | None = field(init=False, repr=False, default=None)
     _preview: bool = False
     _upstream_last_modified_time: int = -1
+    _pinned_version: Optional[int] = None
+    _watched_table: Optional[DeltaTable] = field(default=None, repr=False)
+    _result_key: Optional[str] = None
+    _result_lease: Optional[str] = None
+    _spill_dir: Optional[str] = field(default=None, repr=False)
 
     @override
     @classmethod
@@ -89,7 +129,17 @@ class Blueprint(BaseJob):
         schedule: Optional[str] = None,
         maintenance_schedule: Optional[str] = None,
         cache_mode: Optional[Literal["file", "memory"]] = None,
+        cache_result: bool = False,
+        row_hash: bool = False,
+        merge_prune_columns: Optional[List[str]] = None,
+        key_index: bool = False,
+        append_new_keys: bool = False,
         table_properties: Optional[Dict[str, str]] = None,
+        executor: Optional[Literal["thread", "process"]] = None,
+        memory_hint: Optional[Union[str, int]] = None,
+        retry: Optional[RetryPolicy] = None,
+        timeout: Optional[timedelta] = None,
+        resources: Optional[Dict[str, int]] = None,
         **kwargs,
     ):
         """Create a decorator for the Blueprint.
@@ -124,6 +174,7 @@ class Blueprint(BaseJob):
                 When set, limits the global concurrency while this blueprint is running.
                 This is useful for blueprints with high CPU or memory requirements. For example, setting max_concurrency=1 ensures this job runs serially, while still allowing other jobs to run in parallel.
                 Higher priority jobs will be scheduled first when concurrent limits are reached.
+                To only limit the jobs which share a resource, e.g. a rate-limited API, use `resources` instead.
             freshness: Optional freshness threshold for the blueprint.
                 Only applicable if the format is `delta`.
                 If set, the blueprint will only be processed if the delta table's last modification time is older than the freshness threshold.
@@ -136,12 +187,59 @@ class Blueprint(BaseJob):
                 Table maintenance compacts and vacuums the delta table.
                 If not provided, **no maintenance** will be executed.
                 Maintenance will only run once during a cron interval. Setting this value to `* 0-8 * * 6` will run maintenance on the **first** run on Saturdays between 0 and 8.
+            row_hash: Whether `upsert` and `naive_upsert` detect changed records by a hash of their columns, stored in the system column `__row_hash`.
+                The merge then compares one column per matched record instead of every column, which is much faster for wide tables.
+                The identity, audit and excluded columns are not part of the hash. With `row_hash`, `naive_upsert` also only updates changed records.
+                The hash is only stable within a version of Polars, so after Polars is upgraded a warning is logged and every matched record is updated once.
+            merge_prune_columns: Optional list of columns whose value never changes for a primary key, e.g. a partition or event date column.
+                Only applicable to `upsert` and `naive_upsert` write mode.
+                The merge is restricted to the range of the primary keys in the source dataframe, and to the values of these columns,
+                so the files of the target table outside the source dataframe are skipped. This is much faster for large tables receiving a few late records.
+                Records whose value of one of these columns changed are not matched, and are inserted as duplicates.
+            key_index: Whether to maintain an index of the primary keys of the target table in `{table_uri}/_blueno/key_index.parquet`.
+                Only applicable to `upsert`, `naive_upsert` and `safe_append` write mode.
+                The keys of the source dataframe are looked up in the index instead of the target table, so records with new keys
+                are appended without reading the table. The index is synced with the delta log on every write, which also picks up
+                commits of other engines. Use `blueno rebuild-key-index` to rebuild it.
+                With `upsert` and `naive_upsert` write mode, the index is only used together with `append_new_keys`.
+            append_new_keys: Whether `upsert` and `naive_upsert` append the records whose primary keys don't exist in the target table instead of merging them.
+                If no key of the source dataframe exists in the target table, it is appended without a merge. If only a few exist,
+                the new records are appended and the others are merged in a second commit.
+                **Unsafe with concurrent writers**: the check of the existing keys and the append are not atomic, so a key inserted
+                by another writer in between is appended as a duplicate, where a merge would have failed with a conflict.
             table_properties:  Optional table properties to set on the delta table. Table properties are created **after** the write action.
             cache_mode: Optional caching strategy for the transformed dataframe. Options are:
                 - `file`: Caches the result to a parquet file in `{table_uri}/_blueno/cache.parquet`.
                 - `memory`: Caches the result in memory using Polars streaming engine.
-                - `None`: No caching (default).
+                - `None`: No caching (default). Lazy results of `dataframe` blueprints which are read by more than one dependent in a pipeline run
+                  are still materialized once, in memory or in a spill file, unless the pipeline disables `auto_cache`.
                 Caching happens just after user-defined transformation.
+            cache_result: Whether the transformed dataframe may be served from the `result_cache` of the pipeline in later runs.
+                The cache key is a fingerprint of the transformation function, its closure and the constant globals it references,
+                the configuration of the blueprint, and the versions of its inputs - the versions of upstream delta tables,
+                the modification times of local upstream parquet files, and the cache keys of upstream `dataframe` blueprints.
+                On a hit, the transformation is skipped and the cached dataframe is read lazily.
+                Only enable it for blueprints whose result depends on nothing else, e.g. not on files read in the transformation or on the current time.
+                Blueprints with an input without a known version, like a task or a blueprint without `cache_result`, are never cached.
+            executor: Optional executor backend to run the blueprint in. Options are:
+                - `thread`: Runs the blueprint in a thread of the pipeline process.
+                - `process`: Runs the blueprint in a worker process, which avoids contention on the GIL for transformations doing pure-Python work.
+                    In-memory results are exchanged with the pipeline process as Arrow IPC files.
+                - `None`: Uses the executor of the pipeline run (default).
+            memory_hint: Optional expected peak memory usage of the blueprint, e.g. `8GB`.
+                Used by the pipeline to keep the running jobs within the memory budget of the run.
+                If not provided, the peak memory usage of previous runs from the run history is used.
+            retry: Optional policy to retry the blueprint when it fails with a transient error, e.g. `RetryPolicy(attempts=3)`.
+                Writes with the `append`, `incremental` and `safe_append` write modes are tagged with a delta transaction of the pipeline run,
+                so a retry never commits the same write twice.
+            timeout: Optional maximum duration of the blueprint, including retries. Defaults to the timeout of the pipeline run.
+                When the timeout is reached, the blueprint fails and its dependents are cancelled.
+                A blueprint running in a worker process is killed, and its timeout only counts from when a worker starts it.
+                A blueprint running in a thread can't be killed - it is abandoned and only stops at the start of its next step,
+                so its current step, e.g. a write, may still commit after the timeout. Use the `process` executor to stop it at the timeout.
+            resources: Optional amounts of named resource pools which the blueprint holds while it runs, e.g. `{"onelake_write": 1}`.
+                The pipeline only starts the blueprint when every pool has enough of its capacity left, so it can throttle the jobs sharing a resource without limiting other jobs.
+                The capacities of the pools are set with `Pipeline.resource_pools`.
             **kwargs: Additional keyword arguments to pass to the blueprint. This is used when extending the blueprint with custom attributes or methods.
 
         **Simple example**
@@ -226,6 +324,16 @@ class Blueprint(BaseJob):
                 maintenance_schedule=maintenance_schedule,
                 table_properties=table_properties,
                 cache_mode=cache_mode,
+                cache_result=cache_result,
+                row_hash=row_hash,
+                merge_prune_columns=merge_prune_columns or [],
+                key_index=key_index,
+                append_new_keys=append_new_keys,
+                executor=executor,
+                memory_hint=memory_hint,
+                retry=retry,
+                timeout=timeout,
+                resources=resources or {},
                 _fn=func,
                 **kwargs,
             )
@@ -261,6 +369,7 @@ class Blueprint(BaseJob):
                 self.format in ["delta", "parquet"] and self.table_uri is None,
                 "table_uri must be supplied when format is 'delta' or 'parquet'",
             ),
+            *super()._input_validations,
             (
                 self.write_mode in ("upsert", "naive_upsert", "safe_append")
                 and not self.primary_keys,
@@ -318,6 +427,33 @@ class Blueprint(BaseJob):
                 self.table_uri is not None and self.format == "dataframe",
                 "cannot use table_uri when format is dataframe!",
             ),
+            (
+                self.row_hash and self.write_mode not in ("upsert", "naive_upsert"),
+                "row_hash can only be used with upsert and naive_upsert write_mode",
+            ),
+            (
+                not isinstance(self.merge_prune_columns, List)
+                or not all(isinstance(column, str) for column in self.merge_prune_columns),
+                f"merge_prune_columns must be a list of column names - got {self.merge_prune_columns}",
+            ),
+            (
+                self.merge_prune_columns and self.write_mode not in ("upsert", "naive_upsert"),
+                "merge_prune_columns can only be used with upsert and naive_upsert write_mode",
+            ),
+            (
+                self.key_index and self.write_mode not in ("upsert", "naive_upsert", "safe_append"),
+                "key_index can only be used with upsert, naive_upsert and safe_append write_mode",
+            ),
+            (
+                self.append_new_keys and self.write_mode not in ("upsert", "naive_upsert"),
+                "append_new_keys can only be used with upsert and naive_upsert write_mode",
+            ),
+            (
+                self.key_index
+                and self.write_mode in ("upsert", "naive_upsert")
+                and not self.append_new_keys,
+                "key_index with upsert and naive_upsert write_mode requires append_new_keys",
+            ),
         ]
 
         rules.extend(self._extend_input_validations)
@@ -353,6 +489,7 @@ class Blueprint(BaseJob):
             "updated_at_column": "__updated_at",
             "is_current_column": "__is_current",
             "is_deleted_column": "__is_deleted",
+            "row_hash_column": "__row_hash",
         }
 
     @property
@@ -383,6 +520,10 @@ class Blueprint(BaseJob):
     def _is_deleted_column(self) -> str:
         return self._system_columns.get("is_deleted_column", "__is_deleted")
 
+    @property
+    def _row_hash_column(self) -> str:
+        return self._system_columns.get("row_hash_column", "__row_hash")
+
     def _post_transform_apply_scd2_by_column(self):
         scd2_column_dtype = self._dataframe.select(self.scd2_column).dtypes[0]
 
@@ -422,7 +563,7 @@ class Blueprint(BaseJob):
         target_df = pl.scan_delta(target_dt)
 
         self._dataframe = apply_scd_type_2(
-            source_df=source_df,
+            source_df=source_df.lazy(),
             target_df=target_df,
             primary_key_columns=self.primary_keys,
             valid_from_column=self._valid_from_column,
@@ -442,7 +583,7 @@ class Blueprint(BaseJob):
         target_df = pl.scan_delta(target_dt)
 
         self._dataframe = apply_soft_delete_flag(
-            source_df=source_df,
+            source_df=source_df.lazy(),
             target_df=target_df,
             primary_key_columns=self.primary_keys,
             soft_delete_column=self._is_deleted_column,
@@ -467,16 +608,162 @@ class Blueprint(BaseJob):
 
     def _write_mode_safe_append(self) -> None:
         if self.delta_table is None:
-            return append(table_or_uri=self.table_uri, df=self._dataframe)
+            return append(
+                table_or_uri=self.table_uri,
+                df=self._dataframe,
+                commit_properties=self._commit_properties,
+            )
 
         target = pl.scan_delta(self.delta_table)
-        return append(
+        on = self.primary_keys + [self.incremental_column]
+        if not self.key_index:
+            return append(
+                table_or_uri=self.delta_table,
+                df=self._dataframe.lazy().join(other=target, on=on, how="anti"),
+                commit_properties=self._commit_properties,
+            )
+
+        # Records whose keys are not in the index are new, so only the others are compared with the target.
+        self._key_index.sync(self.delta_table)
+        candidates = self._key_index.candidates(self._dataframe)
+        df = self._dataframe.lazy().filter(~self._key_index.may_exist())
+        if candidates.height > 0:
+            df = pl.concat([df, candidates.lazy().join(other=target, on=on, how="anti")])
+
+        append(
             table_or_uri=self.delta_table,
-            df=self._dataframe.join(
-                other=target,
-                on=self.primary_keys + [self.incremental_column],
-                how="anti",
-            ),
+            df=df,
+            commit_properties=self._commit_properties,
+        )
+        self._key_index.sync(self.delta_table)
+
+    def _write_mode_upsert(self, naive: bool = False) -> Optional[Dict[str, str]]:
+        system_columns = [self._identity_column, self._created_at_column]
+        if self.row_hash:
+            # The update time is set on every run, so it would change every hash.
+            predicate_exclusion_columns = system_columns + [self._updated_at_column]
+        elif naive:
+            predicate_exclusion_columns = self.columns
+        else:
+            predicate_exclusion_columns = system_columns
+
+        return upsert(
+            table_or_uri=self.delta_table or self.table_uri,
+            df=self._dataframe,
+            key_columns=self.primary_keys,
+            predicate_exclusion_columns=predicate_exclusion_columns,
+            update_exclusion_columns=system_columns,
+            row_hash_column=self._row_hash_column if self.row_hash else None,
+            prune_columns=self.merge_prune_columns,
+            append_new_keys=self.append_new_keys,
+            key_index=self._key_index if self.key_index else None,
+        )
+
+    @cached_property
+    def _key_index(self) -> KeyIndex:
+        """The index of the primary keys of the target table."""
+        return KeyIndex(self.table_uri, self.primary_keys)
+
+    @property
+    def _transaction_app_id(self) -> Optional[str]:
+        """The application id of the transaction which identifies writes of this blueprint in the current pipeline run."""
+        if run_context.run_id is None:
+            return None
+        return f"blueno/{self.name}/{run_context.run_id}"
+
+    @property
+    def _commit_properties(self) -> Optional[CommitProperties]:
+        """Commit properties which record the application transaction of the current pipeline run."""
+        app_id = self._transaction_app_id
+        if app_id is None:
+            return None
+        return CommitProperties(app_transactions=[Transaction(app_id=app_id, version=1)])
+
+    @property
+    @override
+    def _has_observable_commits(self) -> bool:
+        return self.format == "delta"
+
+    @override
+    def _is_committed_in_run(self) -> bool:
+        """Checks if the blueprint, or a previous attempt of it, already committed in the current pipeline run."""
+        app_id = self._transaction_app_id
+        if app_id is None or self.format != "delta":
+            return False
+
+        # The cached table may be older than the commit of a previous attempt or another process.
+        dt = get_delta_table_if_exists(self.table_uri)
+        return dt is not None and dt.transaction_version(app_id) is not None
+
+    @property
+    @override
+    def _has_in_memory_result(self) -> bool:
+        return self.format == "dataframe"
+
+    @property
+    @override
+    def _shares_result(self) -> bool:
+        if self.format == "dataframe":
+            return True
+        # A collected dataframe which overwrote the table holds the same rows as the table.
+        return (
+            self.format == "delta"
+            and self.write_mode == "overwrite"
+            and isinstance(self._dataframe, pl.DataFrame)
+            and self._rows_written == self._dataframe.height
+        )
+
+    @override
+    def _output_version(self) -> Optional[int]:
+        if self.format != "delta":
+            return None
+        dt = get_delta_table_if_exists(self.table_uri)
+        return dt.version() if dt is not None else None
+
+    @override
+    def _pin_output_version(self, version: Optional[int]) -> None:
+        self._pinned_version = version
+        self._delta_table = None
+
+    @override
+    def _tail_output_version(self) -> Optional[int]:
+        if self.format != "delta":
+            return None
+        if self._watched_table is None:
+            self._watched_table = get_delta_table_if_exists(self.table_uri)
+            return self._watched_table.version() if self._watched_table is not None else None
+
+        with trace_span("delta tail", "delta", table_uri=self.table_uri) as span:
+            self._watched_table.update_incremental()
+            span["version"] = self._watched_table.version()
+        return self._watched_table.version()
+
+    @override
+    def _refresh_metadata(self) -> None:
+        self._delta_table = None
+        self.__dict__.pop("last_modified_time", None)
+
+    @override
+    def _mark_committed_in_run(self) -> None:
+        """Commits the application transaction of the current run, if the write didn't, e.g. because there were no rows to write."""
+        if self._commit_properties is None or self._is_committed_in_run():
+            return
+
+        dt = get_delta_table_if_exists(self.table_uri)
+        if dt is None:
+            logger.warning(
+                "cannot mark %s %s as committed in run %s as %s does not exist",
+                self.type,
+                self.name,
+                run_context.run_id,
+                self.table_uri,
+            )
+            return
+
+        dt.alter.set_table_properties(
+            {"blueno.lastRunId": run_context.run_id},
+            raise_if_not_exists=False,
+            commit_properties=self._commit_properties,
         )
 
     @property
@@ -484,30 +771,21 @@ class Blueprint(BaseJob):
         """Returns a dictionary of available write methods."""
         return {
             "append": lambda: append(
-                table_or_uri=self.delta_table or self.table_uri, df=self._dataframe
+                table_or_uri=self.delta_table or self.table_uri,
+                df=self._dataframe,
+                commit_properties=self._commit_properties,
             ),
             "safe_append": self._write_mode_safe_append,
             "overwrite": lambda: overwrite(
                 table_or_uri=self.delta_table or self.table_uri, df=self._dataframe
             ),
-            "upsert": lambda: upsert(
-                table_or_uri=self.delta_table or self.table_uri,
-                df=self._dataframe,
-                key_columns=self.primary_keys,
-                predicate_exclusion_columns=[self._identity_column, self._created_at_column],
-                update_exclusion_columns=[self._identity_column, self._created_at_column],
-            ),
-            "naive_upsert": lambda: upsert(
-                table_or_uri=self.delta_table or self.table_uri,
-                df=self._dataframe,
-                key_columns=self.primary_keys,
-                predicate_exclusion_columns=self.columns,
-                update_exclusion_columns=[self._identity_column, self._created_at_column],
-            ),
+            "upsert": self._write_mode_upsert,
+            "naive_upsert": lambda: self._write_mode_upsert(naive=True),
             "incremental": lambda: incremental(
                 table_or_uri=self.delta_table or self.table_uri,
                 df=self._dataframe,
                 incremental_column=self.incremental_column,
+                commit_properties=self._commit_properties,
             ),
             "replace_range": lambda: replace_range(
                 table_or_uri=self.delta_table or self.table_uri,
@@ -671,6 +949,8 @@ class Blueprint(BaseJob):
         """The delta table."""
         if self._delta_table is None:
             self._delta_table = get_delta_table_if_exists(self.table_uri)
+            if self._delta_table is not None and self._pinned_version is not None:
+                self._delta_table.load_as_version(self._pinned_version)
         return self._delta_table
 
     @track_step
@@ -686,7 +966,20 @@ class Blueprint(BaseJob):
             write_parquet(self.table_uri, self._dataframe)
             return
 
+        if self.write_mode in _APPEND_WRITE_MODES and self._is_committed_in_run():
+            logger.info(
+                "skipped writing %s %s as a previous attempt already committed it in run %s",
+                self.type,
+                self.name,
+                run_context.run_id,
+            )
+            return
+
+        version = self.delta_table.version() if self.delta_table is not None else -1
         self._write_modes.get(self.write_mode)()
+        self._rows_written = get_rows_written(self.table_uri, since_version=version)
+        # Dependents compare against the new last modified time, which may have been cached while planning.
+        self.__dict__.pop("last_modified_time", None)
 
         logger.debug(
             "wrote %s %s to %s with mode %s", self.type, self.name, self.table_uri, self.write_mode
@@ -708,13 +1001,101 @@ class Blueprint(BaseJob):
 
     @track_step
     def transform(self) -> None:
-        """Runs the transformation."""
+        """Runs the transformation.
+
+        With `cache_result`, the transformed dataframe is served from the result cache of the pipeline
+        when the transformation, the configuration and the inputs of the blueprint are unchanged.
+        """
+        self._result_key = None
+        self._release_result_lease()
+        cache = self._result_cache if self.cache_result else None
+        key = self._result_cache_key() if cache is not None else None
+        if cache is not None and key is not None:
+            with trace_span("result cache", "cache", key=key) as span:
+                cached = cache.get(key)
+                span["hit"] = cached is not None
+            if cached is not None:
+                logger.info("serving %s %s from the result cache", self.type, self.name)
+                self._dataframe = cached
+                self._result_key = self._result_lease = key
+                return
+
+        self._apply_transform()
+
+        if cache is not None and key is not None:
+            with trace_span("result cache", "cache", key=key, hit=False):
+                self._dataframe = cache.put(key, self._dataframe)
+            self._result_key = self._result_lease = key
+
+    def _release_result_lease(self) -> None:
+        """Releases the result cache entry which the dataframe scans, so the cache may evict it."""
+        if self._result_lease is not None and self._result_cache is not None:
+            self._result_cache.release(self._result_lease)
+        self._result_lease = None
+
+    def _result_cache_key(self) -> Optional[str]:
+        """The key of the transformed dataframe in the result cache, or None if an input has no known version."""
+        inputs = {}
+        for input in self.depends_on:
+            version = self._input_version(input)
+            if version is None:
+                logger.info(
+                    "%s %s is not cached as the version of its input %s is unknown",
+                    self.type,
+                    self.name,
+                    getattr(input, "name", input),
+                )
+                return None
+            inputs[getattr(input, "name", str(input))] = version
+
+        return fingerprint(
+            {
+                "transform": function_fingerprint(self._fn),
+                "config": {
+                    "name": self.name,
+                    "table_uri": self.table_uri,
+                    "format": self.format,
+                    "write_mode": self.write_mode,
+                    "schema": str(self.schema),
+                    "primary_keys": self.primary_keys,
+                    "incremental_column": self.incremental_column,
+                    "scd2_column": self.scd2_column,
+                    "tags": self.tags,
+                },
+                "full_refresh": run_context.full_refresh,
+                "inputs": inputs,
+            }
+        )
+
+    @staticmethod
+    def _input_version(input: Union[BaseJob, object]) -> Optional[str]:
+        """The version of an input of a blueprint, as it is part of the result cache key."""
+        if not isinstance(input, BaseJob):
+            return repr(input)
+        if not isinstance(input, Blueprint):
+            return None
+        if input.format == "dataframe":
+            return input._result_key
+        if input.table_uri is None:
+            return None
+        if input.format == "parquet":
+            return path_fingerprint(input.table_uri)
+
+        version = input._pinned_version
+        if version is None:
+            version = input._output_version()
+        return f"{input.table_uri}@{version}" if version is not None else None
+
+    def _apply_transform(self) -> None:
         sig = inspect.signature(self._fn)
         if "self" in sig.parameters.keys():
             self._dataframe: DataFrameType = self._fn(self, *self._inputs)
         else:
             self._dataframe: DataFrameType = self._fn(*self._inputs)
 
+        if inspect.isawaitable(self._dataframe):
+            self._dataframe = run_coroutine(self._dataframe)
+
         if isinstance(self._dataframe, DataFrameType):
             return
 
@@ -741,6 +1122,85 @@ class Blueprint(BaseJob):
             logger.debug("applying post_transform %s to %s %s", transform, self.type, self.name)
             self._post_transforms[transform]()
 
+    @track_step
+    def materialize(self) -> None:
+        """Materializes the transformed dataframe once, before it is validated and written.
+
+        The validations and the write mode then read the materialized dataframe instead of evaluating
+        the lazy plan of the transformation again. Only delta blueprints, and parquet blueprints with
+        primary keys to validate, are materialized - other blueprints evaluate their plan only once.
+
+        Results whose expected size exceeds the spill size of the pipeline run are spilled to an Arrow IPC file,
+        which the write modes stream to the table. Results of unknown size, e.g. on the first run or outside a
+        pipeline, are collected in batches, which are spilled to Arrow IPC files once they exceed the spill size.
+        """
+        if not isinstance(self._dataframe, pl.LazyFrame) or not (
+            self.format == "delta" or (self.format == "parquet" and self.primary_keys)
+        ):
+            return
+
+        hint = self._cache_hint
+        if hint is not None and 0 < hint.expected_size <= hint.spill_size:
+            with trace_span("collect", "polars") as span:
+                self._dataframe = self._dataframe.collect(engine="streaming")
+                span.update(rows=self._dataframe.height, bytes=self._dataframe.estimated_size())
+            return
+
+        if hint is not None and hint.expected_size > hint.spill_size:
+            path = os.path.join(hint.spill_dir, f"{self.name}.arrow")
+            with trace_span("sink_ipc", "polars", path=path):
+                self._dataframe.sink_ipc(path)
+            self._dataframe = pl.scan_ipc(path)
+            return
+
+        self._dataframe = self._collect_or_spill(
+            spill_size=hint.spill_size if hint is not None else _DEFAULT_SPILL_SIZE,
+            spill_dir=hint.spill_dir if hint is not None else None,
+        )
+
+    def _collect_or_spill(self, spill_size: int, spill_dir: Optional[str]) -> DataFrameType:
+        """Collects the lazy result in batches, and spills the batches to Arrow IPC files once they exceed the spill size.
+
+        Args:
+            spill_size: The number of bytes of batches to hold in memory before spilling them.
+            spill_dir: The directory to spill to, or None to spill to a temporary directory which is removed after the write.
+
+        Returns:
+            The collected dataframe, or a scan of the spilled files.
+        """
+        batches, size, paths = [], 0, []
+        with trace_span("collect", "polars") as span:
+            for batch in self._dataframe.collect_batches(engine="streaming"):
+                batches.append(batch)
+                size += batch.estimated_size()
+                if size <= spill_size:
+                    continue
+
+                if spill_dir is None:
+                    spill_dir = self._spill_dir = tempfile.mkdtemp(prefix="blueno-spill-")
+                path = os.path.join(spill_dir, f"{self.name}-{len(paths)}.arrow")
+                pl.concat(batches).write_ipc(path)
+                paths.append(path)
+                batches, size = [], 0
+
+            if not paths:
+                df = (
+                    pl.concat(batches)
+                    if batches
+                    else pl.DataFrame(schema=self._dataframe.collect_schema())
+                )
+                span.update(rows=df.height, bytes=df.estimated_size())
+                return df
+
+            if batches:
+                path = os.path.join(spill_dir, f"{self.name}-{len(paths)}.arrow")
+                pl.concat(batches).write_ipc(path)
+                paths.append(path)
+            span["spilled_files"] = len(paths)
+
+        logger.debug("spilled %s %s to %s files in %s", self.type, self.name, len(paths), spill_dir)
+        return pl.scan_ipc(paths)
+
     @track_step
     def validate_no_nulls_in_primary_keys(self) -> None:
         """Validates that primary keys do not contain NULL value."""
@@ -830,16 +1290,23 @@ class Blueprint(BaseJob):
 
         logger.info("running compaction on table %s", self.name)
         wp = WriterProperties(compression="ZSTD")
-        self.delta_table.optimize.compact(writer_properties=wp)
+        with trace_span("optimize", "delta", table_uri=self.table_uri) as span:
+            metrics = self.delta_table.optimize.compact(writer_properties=wp)
+            span.update(
+                files_added=metrics.get("numFilesAdded"),
+                files_removed=metrics.get("numFilesRemoved"),
+            )
 
         post_commithook_properties = PostCommitHookProperties(
             create_checkpoint=True, cleanup_expired_logs=True
         )
         logger.info("running vacuum on table %s", self.name)
 
-        self.delta_table.vacuum(
-            dry_run=False, full=True, post_commithook_properties=post_commithook_properties
-        )
+        with trace_span("vacuum", "delta", table_uri=self.table_uri) as span:
+            deleted_files = self.delta_table.vacuum(
+                dry_run=False, full=True, post_commithook_properties=post_commithook_properties
+            )
+            span["files_deleted"] = len(deleted_files)
 
         last_maintained = datetime.now(timezone.utc)
         logger.debug("setting new maintenance timestamp to %s on table", last_maintained, self.name)
@@ -984,116 +1451,133 @@ class Blueprint(BaseJob):
         traverse(self)
         return resolved, unresolved
 
-    @track_step
-    def needs_refresh(self) -> bool:
-        """Checks if the blueprint needs to be refreshed."""
+    @override
+    def _decide_refresh(self) -> RefreshDecision:
+        """Decides from the metadata of the target and upstream tables whether the blueprint needs to be refreshed."""
         if run_context.force_refresh is True:
-            logger.info(
-                "blueprint %s will be force refreshed because `run_context.force_refresh` is True",
-                self.name,
-            )
-            return True
+            return RefreshDecision(True, "`run_context.force_refresh` is True")
 
         if self.format != "delta":
-            return True
+            return RefreshDecision(True, f"format {self.format} is always refreshed")
 
         if self.freshness is not None:
             if self.freshness.total_seconds() == 0:
-                logger.info(
-                    "blueprint %s will be force refreshed as the freshness timedelta is 0.",
-                    self.name,
-                )
-                return True
+                return RefreshDecision(True, "the freshness timedelta is 0")
 
-            ts = self.last_modified_time
-
-            ts = ts.replace(tzinfo=timezone.utc)
+            ts = self.last_modified_time.replace(tzinfo=timezone.utc)
             if ts > datetime.now(timezone.utc) - self.freshness:
-                logger.debug(
-                    "blueprint %s is fresh - last modified time is %s, freshness threshold is %s",
-                    self.name,
-                    ts,
-                    self.freshness,
+                return RefreshDecision(
+                    False,
+                    f"fresh - last modified time is {ts.replace(microsecond=0)}, freshness threshold is {self.freshness}",
                 )
-                return False
-
-            logger.debug(
-                "blueprint %s is stale - last modified time is %s, freshness threshold is %s",
-                self.name,
-                ts,
-                self.freshness,
-            )
 
         if len(self.depends_on) == 0:
-            logger.info(
-                "table for blueprint %s has no dependencies and no freshness schedule, so it will always be refreshed",
-                self.name,
+            return RefreshDecision(
+                True,
+                "stale, and it has no dependencies"
+                if self.freshness is not None
+                else "no dependencies and no freshness schedule",
             )
-            return True
 
         table_dependencies, non_tables_dependencies = (
             self._find_first_upstream_table_and_unresolved_upstream_dependencies()
         )
 
         if len(non_tables_dependencies) > 0:
-            logger.info(
-                "one or more of the blueprint %s dependencies resolves to a non-table and blueno cannot check the last modified time of those dependencies - the upstream non-table dependencies are %s",
-                self.name,
-                ", ".join({dep.name for dep in non_tables_dependencies}),
+            return RefreshDecision(
+                True,
+                "depends on non-tables whose last modified time is unknown: %s"
+                % ", ".join(sorted({dep.name for dep in non_tables_dependencies})),
             )
-            return True
 
         if len(table_dependencies) > 0:
-            timestamps: List[datetime] = []
-            for table in table_dependencies:
-                ts = table.last_modified_time
-                logger.info(
-                    "blueprint %s has an (possibly indirect) upstream dependency on %s with a last refresh timestamp of %s",
-                    self.name,
-                    table.name,
-                    ts,
+            timestamps = {table.name: table.last_modified_time for table in table_dependencies}
+            latest = max(timestamps, key=timestamps.__getitem__)
+            upstream_last_modified_time = int(timestamps[latest].timestamp())
+
+            current_upstream_last_modified_time = self.get_upstream_last_modified_time()
+            if upstream_last_modified_time == current_upstream_last_modified_time:
+                return RefreshDecision(
+                    None,
+                    "upstream tables have not changed since the last refresh",
+                    upstream_last_modified_time,
                 )
-                timestamps.append(ts)
 
-            max_upstream_last_modified_time = max(timestamps)
+            return RefreshDecision(
+                True,
+                f"upstream table {latest} was modified {timestamps[latest].replace(microsecond=0)}",
+                upstream_last_modified_time,
+            )
 
-            self._upstream_last_modified_time = int(max_upstream_last_modified_time.timestamp())
+        raise Unreachable("Shouldn't happen.")
 
-            current_upstream_last_modified_time = self.get_upstream_last_modified_time()
-            logger.info(
-                "upstream was last changed %s and table %s last upstream refresh is %s",
-                max_upstream_last_modified_time.replace(microsecond=0),
-                self.name,
-                datetime.fromtimestamp(int(current_upstream_last_modified_time), tz=timezone.utc),
-            )
+    @track_step
+    def needs_refresh(self) -> bool:
+        """Checks if the blueprint needs to be refreshed.
 
-            if self._upstream_last_modified_time == current_upstream_last_modified_time:
-                logger.info(
-                    "skipped run for %s as its upstream dependents have not changed since last run - if you want to force a refresh you can set the `freshness=timedelta(minutes=0)` on the blueprint.",
-                    self.name,
-                )
-                return False
+        Reuses the decision of `Pipeline.plan` when the run was planned, and none of the upstream jobs ran since.
+        """
+        decision = self._planned_refresh or self._decide_refresh()
+        self._planned_refresh = None
 
-            logger.info(
-                "table for blueprint %s needs to be refreshed as an upstream has been modified",
-                self.name,
-            )
+        if decision.upstream_last_modified_time is not None:
+            self._upstream_last_modified_time = decision.upstream_last_modified_time
+
+        if decision.refresh:
+            logger.info("blueprint %s will be refreshed: %s", self.name, decision.reason)
             return True
 
-        raise Unreachable("Shouldn't happen.")
+        logger.info(
+            "blueprint %s does not need a refresh: %s - if you want to force a refresh you can set the `freshness=timedelta(minutes=0)` on the blueprint.",
+            self.name,
+            decision.reason,
+        )
+        return False
 
     @override
     @track_step
     def free_memory(self):
         """Clears the collected dataframe to free memory, and free table handle."""
-        if self.format == "delta":
-            self._dataframe = None
-            self._delta_table = None
+        self._dataframe = None
+        self._delta_table = None
+        self._release_result_lease()
+
+    @override
+    def _result_size(self) -> int:
+        if isinstance(self._dataframe, pl.DataFrame):
+            return self._dataframe.estimated_size()
+        return 0
+
+    @override
+    def _export_result(self, path: str) -> bool:
+        if self.format != "dataframe" or self._dataframe is None:
+            return False
+
+        if isinstance(self._dataframe, pl.LazyFrame):
+            self._dataframe.sink_ipc(path)
+        else:
+            self._dataframe.write_ipc(path)
+        return True
+
+    @override
+    def _load_result(self, path: str) -> None:
+        self._dataframe = pl.scan_ipc(path)
+
+    @override
+    def _clear_result(self) -> None:
+        self._dataframe = None
+        self._delta_table = None
+        self._release_result_lease()
 
     @track_step
     def cache_dataframe(self):
-        """Caches the result of the dataframe."""
+        """Caches the result of the dataframe.
+
+        Without a `cache_mode`, lazy results of `dataframe` blueprints which are read by more than one dependent
+        in a pipeline run are materialized once, see `_decide_cache_mode`.
+        """
         if self.cache_mode is None:
+            self._auto_cache_dataframe()
             return
 
         if self.cache_mode.lower() == "file":
@@ -1102,29 +1586,202 @@ class Blueprint(BaseJob):
             self._dataframe = read_parquet(cache_file)
 
         elif self.cache_mode.lower() == "memory":
-            self._dataframe = self._dataframe.lazy().collect(engine="streaming")
+            with trace_span("collect", "polars") as span:
+                self._dataframe = self._dataframe.lazy().collect(engine="streaming")
+                span.update(rows=self._dataframe.height, bytes=self._dataframe.estimated_size())
 
         else:
             raise BluenoUserError(
                 f"`cache_mode` must be `file` or `memory` or unset. Got `{self.cache_mode}`."
             )
 
+    def _decide_cache_mode(
+        self, hint: CacheHint
+    ) -> tuple[Optional[Literal["file", "memory"]], str]:
+        """Decides how to materialize a lazy result which is read by several dependents.
+
+        Plans which only scan an in-memory dataframe are cheap to execute again, so they stay lazy.
+        Other plans are collected into memory, unless their expected size exceeds the spill size of the
+        cache hint - then they are spilled to an Arrow IPC file which the dependents scan.
+
+        Args:
+            hint: How the pipeline run consumes the result.
+
+        Returns:
+            The cache mode, or None to leave the plan lazy, and the reason for the decision.
+        """
+        plan = self._dataframe.explain().splitlines()
+        reason = f"read by {hint.consumers} dependents, plan of {len(plan)} lines"
+        if len(plan) == 1 and plan[0].startswith("DF "):
+            return None, f"{reason} which only scans a dataframe in memory"
+
+        if hint.expected_size > hint.spill_size:
+            return (
+                "file",
+                f"{reason}, expected size of {hint.expected_size} bytes exceeds the spill size",
+            )
+        return "memory", f"{reason}, expected size of {hint.expected_size} bytes"
+
+    def _auto_cache_dataframe(self) -> None:
+        hint = self._cache_hint
+        if (
+            hint is None
+            or hint.consumers < 2
+            or self.format != "dataframe"
+            or not isinstance(self._dataframe, pl.LazyFrame)
+        ):
+            return
+
+        mode, reason = self._decide_cache_mode(hint)
+        self._cache_decision = f"{mode or 'lazy'} - {reason}"
+        logger.info("automatic cache of %s %s: %s", self.type, self.name, self._cache_decision)
+
+        if mode == "memory":
+            with trace_span("collect", "polars") as span:
+                self._dataframe = self._dataframe.collect(engine="streaming")
+                span.update(rows=self._dataframe.height, bytes=self._dataframe.estimated_size())
+
+        elif mode == "file":
+            path = os.path.join(hint.spill_dir, f"{self.name}.arrow")
+            with trace_span("sink_ipc", "polars", path=path):
+                self._dataframe.sink_ipc(path)
+            self._dataframe = pl.scan_ipc(path)
+
     @override
     @track_step
     def run(self):
         """Runs the job."""
+        if self._build_result():
+            self._store_result()
+
+    def _build_result(self) -> bool:
+        """Runs the steps up to the transformed dataframe, and returns whether the blueprint must be written."""
         if not self.needs_refresh():
             logger.info("blueprint %s is skipped due to freshness policy", self.name)
-            return
+            return False
         self.read_sources()
         self.transform()
         self.cache_dataframe()
-        self.validate_no_nulls_in_primary_keys()
-        self.post_transform()
-        self.validate_schema()
-        self.write()
-        self.set_table_properties()
-        self.maintain()
+        return True
+
+    def _store_result(self) -> None:
+        """Runs the steps from the transformed dataframe to the maintained target."""
+        try:
+            self.materialize()
+            self.validate_no_nulls_in_primary_keys()
+            self.post_transform()
+            self.validate_schema()
+            self.write()
+            self.set_table_properties()
+            self.maintain()
+        finally:
+            if self._spill_dir is not None:
+                # Dependents read the written table instead of the removed spill files.
+                self._dataframe = None
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+
+    @property
+    @override
+    def _has_lazy_result(self) -> bool:
+        if self.format != "dataframe" or not isinstance(self._dataframe, pl.LazyFrame):
+            return False
+        # Plans which only scan a dataframe in memory are cheap to evaluate again, see `_decide_cache_mode`.
+        plan = self._dataframe.explain().splitlines()
+        return not (len(plan) == 1 and plan[0].startswith("DF "))
+
+    @property
+    @override
+    def _fusable(self) -> bool:
+        # Subclasses which override `run` may not run the steps of a blueprint.
+        return self.format != "dataframe" and type(self).run is Blueprint.run
+
+    @staticmethod
+    @override
+    def _run_fused(jobs: List[BaseJob]) -> Dict[str, Exception]:
+        """Runs sibling blueprints, and collects their transformed dataframes together in one pass.
+
+        The lazy plans of the blueprints are collected with `pl.collect_all`, so Polars evaluates
+        the subplans they share - like the scan of a common upstream table - only once. Each
+        blueprint then validates and writes its collected dataframe with its own write mode.
+        Each blueprint records the fused collect as its step `fused_collect`, with an even share of its CPU time.
+
+        The fused collect holds all results in memory, so it only takes results while their expected sizes add up to at most
+        the spill size. The others are materialized on their own, which spills them like `materialize` does.
+
+        Args:
+            jobs: The blueprints to run. The pipeline only fuses jobs of the same type.
+
+        Returns:
+            The exceptions of the blueprints which failed, by name.
+        """
+        blueprints = [job for job in jobs if isinstance(job, Blueprint)]
+        errors: Dict[str, Exception] = {}
+        built = []
+        for blueprint in blueprints:
+            try:
+                if blueprint._build_result():
+                    built.append(blueprint)
+            except Exception as e:
+                errors[blueprint.name] = e
+
+        lazy, size = [], 0
+        for blueprint in built:
+            if not isinstance(blueprint._dataframe, pl.LazyFrame):
+                continue
+            hint = blueprint._cache_hint
+            expected_size = hint.expected_size if hint is not None else 0
+            spill_size = hint.spill_size if hint is not None else _DEFAULT_SPILL_SIZE
+            if size + expected_size > spill_size:
+                logger.debug(
+                    "%s %s is materialized on its own as its expected size of %s bytes would exceed the spill size",
+                    blueprint.type,
+                    blueprint.name,
+                    expected_size,
+                )
+                continue
+            lazy.append(blueprint)
+            size += expected_size
+
+        if len(lazy) > 1:
+            Blueprint._collect_fused(lazy)
+
+        for blueprint in built:
+            try:
+                blueprint._store_result()
+            except Exception as e:
+                errors[blueprint.name] = e
+
+        return errors
+
+    @staticmethod
+    def _collect_fused(blueprints: List[Blueprint]) -> None:
+        names = [b.name for b in blueprints]
+        logger.info("collecting %s in one fused execution", ", ".join(names))
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            with trace_span("fused collect", "polars", jobs=", ".join(names)) as span:
+                frames = pl.collect_all([b._dataframe for b in blueprints])
+                span.update(
+                    rows=sum(df.height for df in frames),
+                    bytes=sum(df.estimated_size() for df in frames),
+                )
+        except Exception as e:
+            # Collected separately, the failure is attributed to the blueprint which caused it.
+            logger.warning(
+                "fused collect of %s failed - collecting them separately: %s", ", ".join(names), e
+            )
+            return
+
+        step = StepTiming(
+            name="fused_collect",
+            wall_time=time.perf_counter() - wall_start,
+            cpu_time=(time.thread_time() - cpu_start) / len(blueprints),
+        )
+        for blueprint, df in zip(blueprints, frames):
+            blueprint._dataframe = df
+            blueprint._step_timings.append(step)
+            blueprint._peak_result_size = max(blueprint._peak_result_size, df.estimated_size())
 
     @track_step
     def preview(self, show_preview: bool = True, limit: int = 10):
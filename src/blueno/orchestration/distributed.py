@@ -0,0 +1,509 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import psutil
+
+from blueno.orchestration.job import StepTiming, job_registry
+from blueno.orchestration.pipeline import ActivityStatus, Pipeline, PipelineActivity
+from blueno.orchestration.run_context import run_context
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    run_id TEXT NOT NULL,
+    job_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    critical_path REAL NOT NULL,
+    context TEXT NOT NULL,
+    timeout REAL,
+    published REAL NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started REAL,
+    duration REAL NOT NULL DEFAULT 0.0,
+    cpu_time REAL NOT NULL DEFAULT 0.0,
+    peak_memory INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER,
+    steps TEXT NOT NULL DEFAULT '[]',
+    result_path TEXT,
+    error TEXT,
+    PRIMARY KEY (run_id, job_name)
+);
+CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, priority, critical_path);
+"""
+
+_COLUMNS = (
+    "run_id, job_name, status, priority, critical_path, context, timeout, worker, attempts, "
+    "started, duration, cpu_time, peak_memory, rows_written, steps, result_path, error"
+)
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    """An activity of a distributed pipeline run in a `WorkQueue`.
+
+    Attributes:
+        run_id: The id of the pipeline run.
+        job_name: The name of the job to run.
+        status: `ready`, `running`, `completed`, `failed` or `cancelled`.
+        priority: The priority of the job. Higher priorities are claimed first.
+        critical_path: The expected duration of the job and its longest chain of descendants. Longer critical paths are claimed first among equal priorities.
+        context: The values of the `run_context` of the coordinator.
+        timeout: The default timeout in seconds of the run, if any.
+        worker: The id of the worker which last claimed the item.
+        attempts: The number of times the item was claimed.
+        started: When the item was last claimed as a unix timestamp.
+        duration: The elapsed time of the activity in seconds.
+        cpu_time: The CPU time of the activity in seconds.
+        peak_memory: The peak memory usage of the activity in bytes.
+        rows_written: The number of rows written to the target table, if any.
+        steps: The time spent in each step of the job.
+        result_path: The Arrow IPC file with the in-memory result of the job, if it has one.
+        error: The error of a failed activity.
+    """
+
+    run_id: str
+    job_name: str
+    status: str
+    priority: int
+    critical_path: float
+    context: Dict[str, object]
+    timeout: Optional[float]
+    worker: Optional[str]
+    attempts: int
+    started: Optional[float]
+    duration: float
+    cpu_time: float
+    peak_memory: int
+    rows_written: Optional[int]
+    steps: List[StepTiming] = field(default_factory=list)
+    result_path: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def _from_row(cls, row: tuple) -> WorkItem:
+        *values, steps, result_path, error = row
+        values[5] = json.loads(values[5])
+        return cls(
+            *values,
+            steps=[
+                StepTiming(
+                    name=step["name"], wall_time=step["wall_time"], cpu_time=step["cpu_time"]
+                )
+                for step in json.loads(steps)
+            ],
+            result_path=result_path,
+            error=error,
+        )
+
+
+class WorkQueue:
+    """A work queue in a SQLite file which distributes the activities of pipeline runs to workers.
+
+    The coordinator of a run publishes activities once their upstream activities are done, and
+    `Worker` processes claim them with a lease which they renew while the activity runs. When a
+    worker dies, its lease expires and the activity is claimed again by another worker. Place the
+    file on storage which is shared by all workers to distribute a run across machines.
+
+    In-memory results of jobs, e.g. of blueprints with format `dataframe`, are handed over to the
+    workers of their dependents as Arrow IPC files in the `results` directory next to the queue.
+
+    Example:
+    ```python notest
+    from blueno import create_pipeline, job_registry
+    from blueno.orchestration.distributed import WorkQueue
+
+    job_registry.discover_jobs("blueprints")
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run_distributed(WorkQueue("/mnt/shared/blueno/queue.db"))
+    ```
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """Opens the work queue, and creates it if it does not exist.
+
+        Args:
+            path: The path of the SQLite database file.
+            max_attempts: The maximum number of times an activity is claimed before it fails, when the leases of its workers expire.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def result_dir(self, run_id: str) -> str:
+        """The directory where workers write the in-memory results of the jobs of a run."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), "results", run_id)
+
+    def publish(
+        self,
+        run_id: str,
+        activity: PipelineActivity,
+        context: Dict[str, object],
+        timeout: Optional[timedelta] = None,
+    ) -> None:
+        """Publishes a ready activity to the workers.
+
+        Args:
+            run_id: The id of the pipeline run.
+            activity: The activity to publish.
+            context: The values of the `run_context` to run the activity with.
+            timeout: The default timeout of the run, which applies if the job doesn't set its own.
+        """
+        logger.debug("publishing activity %s of run %s", activity.job.name, run_id)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO work_items
+                    (run_id, job_name, status, priority, critical_path, context, timeout, published)
+                VALUES (?, ?, 'ready', ?, ?, ?, ?, ?)
+                """,
+                (
+                    run_id,
+                    activity.job.name,
+                    activity.job.priority,
+                    activity.critical_path,
+                    json.dumps(context),
+                    timeout.total_seconds() if timeout is not None else None,
+                    time.time(),
+                ),
+            )
+
+    def claim(self, worker_id: str, lease: timedelta) -> Optional[WorkItem]:
+        """Claims the next ready activity, or an activity whose lease has expired.
+
+        Args:
+            worker_id: The id of the claiming worker.
+            lease: How long the worker may run the activity before it must renew the lease.
+
+        Returns:
+            The claimed item, or None if there is nothing to claim.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    now = time.time()
+                    row = conn.execute(
+                        """
+                        SELECT run_id, job_name, status, attempts, worker
+                        FROM work_items
+                        WHERE status = 'ready' OR (status = 'running' AND lease_expires < ?)
+                        ORDER BY priority DESC, critical_path DESC, published
+                        LIMIT 1
+                        """,
+                        (now,),
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+
+                    run_id, job_name, status, attempts, previous_worker = row
+                    if status == "running":
+                        logger.warning(
+                            "lease of worker %s on activity %s of run %s expired",
+                            previous_worker,
+                            job_name,
+                            run_id,
+                        )
+
+                    if attempts >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE work_items SET status = 'failed', error = ? WHERE run_id = ? AND job_name = ?",
+                            (
+                                "the lease of worker %s expired after %s attempts"
+                                % (previous_worker, attempts),
+                                run_id,
+                                job_name,
+                            ),
+                        )
+                        continue
+
+                    conn.execute(
+                        """
+                        UPDATE work_items
+                        SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, started = ?
+                        WHERE run_id = ? AND job_name = ?
+                        """,
+                        (worker_id, now + lease.total_seconds(), now, run_id, job_name),
+                    )
+                    item = conn.execute(
+                        f"SELECT {_COLUMNS} FROM work_items WHERE run_id = ? AND job_name = ?",
+                        (run_id, job_name),
+                    ).fetchone()
+                    conn.execute("COMMIT")
+                    return WorkItem._from_row(item)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def renew(self, item: WorkItem, worker_id: str, lease: timedelta) -> bool:
+        """Extends the lease of a worker on a running activity.
+
+        Returns:
+            False if the worker lost the lease, e.g. because it expired and another worker claimed the activity.
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                """
+                UPDATE work_items SET lease_expires = ?
+                WHERE run_id = ? AND job_name = ? AND worker = ? AND status = 'running'
+                """,
+                (time.time() + lease.total_seconds(), item.run_id, item.job_name, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(
+        self,
+        item: WorkItem,
+        worker_id: str,
+        activity: PipelineActivity,
+        result_path: Optional[str] = None,
+    ) -> bool:
+        """Reports the outcome of an activity which was run by a worker.
+
+        Args:
+            item: The claimed item.
+            worker_id: The id of the worker.
+            activity: The finished activity.
+            result_path: The Arrow IPC file with the in-memory result of the job, if it has one.
+
+        Returns:
+            False if the worker lost the lease, in which case the outcome is discarded.
+        """
+        status = "completed" if activity.status is ActivityStatus.COMPLETED else "failed"
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                """
+                UPDATE work_items
+                SET status = ?, duration = ?, cpu_time = ?, peak_memory = ?, rows_written = ?,
+                    steps = ?, result_path = ?, error = ?
+                WHERE run_id = ? AND job_name = ? AND worker = ? AND status = 'running'
+                """,
+                (
+                    status,
+                    activity.duration,
+                    activity.cpu_time,
+                    activity.peak_memory,
+                    activity.rows_written,
+                    json.dumps([asdict(step) for step in activity.steps]),
+                    result_path,
+                    None if activity.exception is None else repr(activity.exception),
+                    item.run_id,
+                    item.job_name,
+                    worker_id,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, item: WorkItem, worker_id: str, error: str) -> None:
+        """Reports that a worker could not run an activity."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                UPDATE work_items SET status = 'failed', error = ?
+                WHERE run_id = ? AND job_name = ? AND worker = ? AND status = 'running'
+                """,
+                (error, item.run_id, item.job_name, worker_id),
+            )
+
+    def items(self, run_id: str) -> List[WorkItem]:
+        """The published activities of a run."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM work_items WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return [WorkItem._from_row(row) for row in rows]
+
+    def result_paths(self, run_id: str) -> Dict[str, str]:
+        """The in-memory results of the completed activities of a run, by job name."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT job_name, result_path FROM work_items
+                WHERE run_id = ? AND status = 'completed' AND result_path IS NOT NULL
+                """,
+                (run_id,),
+            ).fetchall()
+        return dict(rows)
+
+    def cancel(self, run_id: str) -> None:
+        """Cancels the activities of a run which have not been claimed yet."""
+        logger.debug("cancelling ready activities of run %s", run_id)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE work_items SET status = 'cancelled' WHERE run_id = ? AND status = 'ready'",
+                (run_id,),
+            )
+
+
+class Worker:
+    """Runs activities claimed from a `WorkQueue`.
+
+    The jobs must be discovered with `job_registry.discover_jobs` before the worker runs, from the
+    same project as the coordinator.
+
+    Example:
+    ```python notest
+    from blueno import job_registry
+    from blueno.orchestration.distributed import WorkQueue, Worker
+
+    job_registry.discover_jobs("blueprints")
+    Worker(WorkQueue("/mnt/shared/blueno/queue.db")).run()
+    ```
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        worker_id: Optional[str] = None,
+        lease: timedelta = timedelta(seconds=60),
+        poll_interval: float = 1.0,
+    ):
+        """Creates a worker.
+
+        Args:
+            queue: The work queue to claim activities from.
+            worker_id: The id of the worker. Defaults to the host name and process id.
+            lease: How long an activity stays claimed by the worker without a renewal. The worker renews its lease three times per period while an activity runs.
+            poll_interval: The number of seconds to wait before polling an empty queue again.
+        """
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+    def run(self, max_idle: Optional[timedelta] = None) -> int:
+        """Claims and runs activities until interrupted.
+
+        Args:
+            max_idle: Stop when the queue has had nothing to claim for this long.
+
+        Returns:
+            The number of activities the worker ran.
+        """
+        logger.info("worker %s started polling %s", self.worker_id, self.queue.path)
+        runs = 0
+        idle_since = time.monotonic()
+        while True:
+            item = self.queue.claim(self.worker_id, self.lease)
+            if item is None:
+                if (
+                    max_idle is not None
+                    and time.monotonic() - idle_since > max_idle.total_seconds()
+                ):
+                    logger.info(
+                        "worker %s stopped after being idle for %s", self.worker_id, max_idle
+                    )
+                    return runs
+                time.sleep(self.poll_interval)
+                continue
+
+            self.run_item(item)
+            runs += 1
+            idle_since = time.monotonic()
+
+    def run_item(self, item: WorkItem) -> None:
+        """Runs a claimed activity and reports its outcome to the queue.
+
+        The `run_context` of the run is set while the activity runs, and restored afterwards.
+        """
+        previous_context = asdict(run_context)
+        for key, value in item.context.items():
+            setattr(run_context, key, value)
+        try:
+            self._run_item(item)
+        finally:
+            for key, value in previous_context.items():
+                setattr(run_context, key, value)
+
+    def _run_item(self, item: WorkItem) -> None:
+        job = job_registry.jobs.get(item.job_name)
+        if job is None:
+            msg = "job %s of run %s was not discovered by worker %s"
+            logger.error(msg, item.job_name, item.run_id, self.worker_id)
+            self.queue.fail(
+                item, self.worker_id, msg % (item.job_name, item.run_id, self.worker_id)
+            )
+            return
+
+        activity = PipelineActivity(job, id=0)
+        pipeline = Pipeline(activities=[activity])
+        pipeline._process = psutil.Process(os.getpid())
+        pipeline._timeout = timedelta(seconds=item.timeout) if item.timeout is not None else None
+
+        inputs = self.queue.result_paths(item.run_id)
+        upstreams = [upstream for upstream in job.depends_on if upstream.name in inputs]
+        for upstream in upstreams:
+            upstream._load_result(inputs[upstream.name])
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._renew_lease, args=(item, activity, stop_heartbeat), daemon=True
+        )
+        heartbeat.start()
+
+        result_path = None
+        try:
+            pipeline.run_activity(activity)
+
+            path = os.path.join(self.queue.result_dir(item.run_id), f"{job.name}.arrow")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if job._export_result(path):
+                result_path = path
+        except Exception as e:
+            activity.status = ActivityStatus.FAILED
+            activity.duration = time.time() - activity.start
+            activity.exception = e
+            logger.error("Error running %s %s: %s", job.type, job.name, e, exc_info=e)
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            for upstream in upstreams:
+                upstream._clear_result()
+            job._clear_result()
+
+        if not self.queue.complete(item, self.worker_id, activity, result_path):
+            logger.warning(
+                "discarded the outcome of %s %s as worker %s lost its lease",
+                job.type,
+                job.name,
+                self.worker_id,
+            )
+
+    def _renew_lease(
+        self, item: WorkItem, activity: PipelineActivity, stop_event: threading.Event
+    ) -> None:
+        """Renews the lease on an activity while it runs, and cancels the job if the lease is lost."""
+        while not stop_event.wait(self.lease.total_seconds() / 3):
+            if not self.queue.renew(item, self.worker_id, self.lease):
+                logger.warning(
+                    "worker %s lost its lease on activity %s - cancelling it",
+                    self.worker_id,
+                    item.job_name,
+                )
+                activity.job._cancel()
+                return
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from blueno.orchestration.job import StepTiming
+
+if TYPE_CHECKING:
+    from blueno.orchestration.pipeline import PipelineActivity
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity_runs (
+    run_id TEXT NOT NULL,
+    job_name TEXT NOT NULL,
+    job_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    start REAL NOT NULL,
+    duration REAL NOT NULL,
+    cpu_time REAL NOT NULL,
+    peak_memory INTEGER NOT NULL,
+    rows_written INTEGER
+);
+CREATE INDEX IF NOT EXISTS activity_runs_job_name ON activity_runs (job_name, start);
+CREATE TABLE IF NOT EXISTS activity_steps (
+    run_id TEXT NOT NULL,
+    job_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    wall_time REAL NOT NULL,
+    cpu_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS activity_steps_run_id ON activity_steps (run_id, job_name);
+CREATE TABLE IF NOT EXISTS run_manifests (
+    run_id TEXT NOT NULL,
+    job_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_version INTEGER,
+    PRIMARY KEY (run_id, job_name)
+);
+"""
+
+
+@dataclass(frozen=True)
+class JobStatistics:
+    """Statistics of a job aggregated over its previous runs.
+
+    Attributes:
+        runs: The number of runs the statistics are based on.
+        duration: The average duration in seconds of the successful runs.
+        peak_memory: The highest peak memory usage in bytes of the runs.
+    """
+
+    runs: int
+    duration: float
+    peak_memory: int
+
+
+@dataclass(frozen=True)
+class ActivityRecord:
+    """A recorded activity of a pipeline run.
+
+    Attributes:
+        run_id: The id of the pipeline run.
+        job_name: The name of the job.
+        job_type: The type of the job, e.g. `Blueprint`.
+        status: The final status of the activity.
+        start: When the activity started as a unix timestamp.
+        duration: The elapsed time of the activity in seconds.
+        cpu_time: The CPU time of the activity in seconds.
+        peak_memory: The peak memory usage of the activity in bytes.
+        rows_written: The number of rows written to the target table, if any.
+        steps: The time spent in each step of the job, in the order they completed.
+    """
+
+    run_id: str
+    job_name: str
+    job_type: str
+    status: str
+    start: float
+    duration: float
+    cpu_time: float
+    peak_memory: int
+    rows_written: Optional[int]
+    steps: List[StepTiming] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """The outcome of an activity in the manifest of a pipeline run.
+
+    Attributes:
+        status: The final status of the activity.
+        output_version: The version of the target Delta table after the activity completed, if it has one.
+    """
+
+    status: str
+    output_version: Optional[int]
+
+
+class RunHistory:
+    """A local SQLite store of the activities of previous pipeline runs.
+
+    Example:
+    ```python notest
+    from blueno import create_pipeline, job_registry
+    from blueno.orchestration.history import RunHistory
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.history = RunHistory(".blueno/history.db")
+    pipeline.run(concurrency=4)
+    ```
+    """
+
+    def __init__(self, path: str):
+        """Opens the history store, and creates it if it does not exist.
+
+        Args:
+            path: The path of the SQLite database file.
+        """
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record_run(self, run_id: str, activities: Iterable[PipelineActivity]) -> None:
+        """Appends the activities of a pipeline run to the history, and updates the manifest of the run.
+
+        Args:
+            run_id: The id of the pipeline run.
+            activities: The activities of the run. Activities which never started are only recorded in the manifest, and skipped activities are not recorded.
+        """
+        activities = list(activities)
+        manifest = [
+            (run_id, activity.job.name, activity.status.value, activity.output_version)
+            for activity in activities
+            if activity.status.value != "skipped"
+        ]
+        activities = [activity for activity in activities if activity.start]
+        rows = [
+            (
+                run_id,
+                activity.job.name,
+                activity.job.type,
+                activity.status.value,
+                activity.start,
+                activity.duration,
+                activity.cpu_time,
+                activity.peak_memory,
+                activity.rows_written,
+            )
+            for activity in activities
+        ]
+        steps = [
+            (run_id, activity.job.name, position, step.name, step.wall_time, step.cpu_time)
+            for activity in activities
+            for position, step in enumerate(activity.steps)
+        ]
+
+        logger.debug("recording %s activities of run %s in %s", len(rows), run_id, self.path)
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT INTO activity_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO activity_steps VALUES (?, ?, ?, ?, ?, ?)", steps)
+            conn.executemany("INSERT OR REPLACE INTO run_manifests VALUES (?, ?, ?, ?)", manifest)
+
+    def manifest(self, run_id: str) -> Dict[str, ManifestEntry]:
+        """The final status and output version of each activity of a run.
+
+        Args:
+            run_id: The id of the run.
+
+        Returns:
+            The manifest entries by job name, or an empty mapping if the run is not recorded.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT job_name, status, output_version FROM run_manifests WHERE run_id = ?",
+                (run_id,),
+            ).fetchall()
+
+        return {
+            name: ManifestEntry(status=status, output_version=output_version)
+            for name, status, output_version in rows
+        }
+
+    def activities(self, job_name: Optional[str] = None, limit: int = 20) -> List[ActivityRecord]:
+        """The most recently started activities, including the time spent in each of their steps.
+
+        Args:
+            job_name: Only include activities of the job with this name.
+            limit: The maximum number of activities to return.
+
+        Returns:
+            The activities, most recent first.
+        """
+        query = """
+            SELECT run_id, job_name, job_type, status, start, duration, cpu_time, peak_memory, rows_written
+            FROM activity_runs
+            WHERE ? IS NULL OR job_name = ?
+            ORDER BY start DESC
+            LIMIT ?
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, (job_name, job_name, limit)).fetchall()
+
+            records = []
+            for row in rows:
+                record = ActivityRecord(*row)
+                steps = conn.execute(
+                    """
+                    SELECT step, wall_time, cpu_time
+                    FROM activity_steps
+                    WHERE run_id = ? AND job_name = ?
+                    ORDER BY position
+                    """,
+                    (record.run_id, record.job_name),
+                ).fetchall()
+                record.steps.extend(
+                    StepTiming(name=name, wall_time=wall_time, cpu_time=cpu_time)
+                    for name, wall_time, cpu_time in steps
+                )
+                records.append(record)
+
+        return records
+
+    def run_durations(self, run_id: Optional[str] = None) -> Dict[str, float]:
+        """The duration of each job in a recorded run.
+
+        Args:
+            run_id: The id of the run. Defaults to the most recent run.
+
+        Returns:
+            The duration in seconds by job name.
+        """
+        with closing(self._connect()) as conn:
+            if run_id is None:
+                row = conn.execute(
+                    "SELECT run_id FROM activity_runs ORDER BY start DESC LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return {}
+                run_id = row[0]
+
+            rows = conn.execute(
+                "SELECT job_name, duration FROM activity_runs WHERE run_id = ?", (run_id,)
+            ).fetchall()
+
+        return dict(rows)
+
+    def job_statistics(self, lookback: int = 10) -> Dict[str, JobStatistics]:
+        """Aggregates the statistics of each job over its most recent runs.
+
+        Args:
+            lookback: The number of most recent runs per job to aggregate over.
+
+        Returns:
+            The statistics by job name.
+        """
+        query = """
+            SELECT
+                job_name,
+                COUNT(*),
+                COALESCE(AVG(CASE WHEN status = 'completed' THEN duration END), 0.0),
+                MAX(peak_memory)
+            FROM (
+                SELECT
+                    *,
+                    ROW_NUMBER() OVER (PARTITION BY job_name ORDER BY start DESC) AS recency
+                FROM activity_runs
+            )
+            WHERE recency <= ?
+            GROUP BY job_name
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, (lookback,)).fetchall()
+
+        return {
+            name: JobStatistics(runs=runs, duration=duration, peak_memory=peak_memory)
+            for name, runs, duration, peak_memory in rows
+        }
@@ -1,41 +1,225 @@
 from __future__ import annotations
 
+import asyncio
 import importlib
 import inspect
 import logging
 import pathlib
+import random
 import sys
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from datetime import timedelta
 from tempfile import TemporaryDirectory
-from typing import Callable, Dict, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 # from blueno.blueprints.blueprint import Blueprint
-from blueno.exceptions import BluenoUserError, DuplicateJobError, JobNotFoundError
+from blueno.exceptions import (
+    BluenoUserError,
+    DuplicateJobError,
+    JobCancelledError,
+    JobNotFoundError,
+)
+from blueno.tracing import trace_span
 from blueno.types import DataFrameType
+from blueno.utils import parse_size
+
+if TYPE_CHECKING:
+    from blueno.orchestration.result_cache import ResultCache
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class RefreshDecision:
+    """Whether a job needs to run, as decided from metadata before running it.
+
+    Attributes:
+        refresh: True if the job needs to run, and False if it can be skipped.
+            None if the job only needs to run when one of its upstream jobs runs.
+        reason: Why the job does or doesn't need to run.
+        upstream_last_modified_time: The last modified time of the upstream tables as a unix timestamp, if the decision depends on them.
+    """
+
+    refresh: Optional[bool]
+    reason: str
+    upstream_last_modified_time: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class CacheHint:
+    """How a pipeline run consumes the result of a job, to decide whether the job caches its result.
+
+    Attributes:
+        consumers: The number of dependents which will read the result in the run.
+        expected_size: The expected size in bytes of the result, e.g. from previous runs.
+        spill_size: Results expected to be larger than this many bytes are spilled to disk instead of kept in memory.
+        spill_dir: The directory to spill results to.
+    """
+
+    consumers: int
+    expected_size: int
+    spill_size: int
+    spill_dir: str
+
+
+@dataclass(frozen=True)
+class StepTiming:
+    """The time spent in a step of a job.
+
+    Attributes:
+        name: The name of the step, e.g. `transform`.
+        wall_time: The elapsed time of the step in seconds.
+        cpu_time: The CPU time of the thread running the step in seconds.
+    """
+
+    name: str
+    wall_time: float
+    cpu_time: float
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """A policy to retry a job which failed with a transient error.
+
+    The delay before each retry doubles from `backoff` up to `max_backoff`. With jitter, the delay is
+    drawn uniformly between zero and the backoff, which spreads out the retries of jobs failing at
+    the same time.
+
+    Attributes:
+        attempts: The maximum number of attempts, including the first one.
+        backoff: The delay in seconds before the first retry.
+        max_backoff: The maximum delay in seconds before a retry.
+        jitter: Whether to randomize the delay before a retry.
+        retry_on: The exception classes to retry. Jobs failing with other exceptions fail immediately.
+            Defaults to `OSError`, which covers timeouts, connection errors and object store errors.
+
+    Example:
+    ```python notest
+    from blueno import Blueprint, RetryPolicy
+
+
+    @Blueprint.register(
+        table_uri="/path/to/bronze/orders",
+        format="delta",
+        write_mode="append",
+        retry=RetryPolicy(attempts=5, backoff=2.0),
+    )
+    def bronze_orders(): ...
+    ```
+    """
+
+    attempts: int = 3
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+    jitter: bool = True
+    retry_on: Tuple[Type[BaseException], ...] = (OSError,)
+
+    def should_retry(self, exception: BaseException, attempt: int) -> bool:
+        """Whether to retry after the given attempt failed with the exception."""
+        return attempt < self.attempts and isinstance(exception, self.retry_on)
+
+    def delay(self, attempt: int) -> float:
+        """The delay in seconds before retrying after the given attempt."""
+        backoff = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
 
 def track_step(func):
     """A wrapper which logs when a function was called, and when a function call ended.
 
-    Also sets the current step.
+    Also sets the current step, records the wall and CPU time of the step, and traces the step as a span.
+    A cancelled job raises `JobCancelledError` when it starts its next step.
     """
 
-    def wrapper(self, *args, **kwargs):
+    def start_step(self) -> tuple[float, float]:
+        if self._cancel_event.is_set():
+            msg = "%s %s was cancelled before step %s"
+            logger.debug(msg, self.type, self.name, func.__name__)
+            raise JobCancelledError(msg % (self.type, self.name, func.__name__))
+
         logger.debug("started step %s for %s %s", func.__name__, self.type, self.name)
         if self._current_step:
             self._current_step += " -> " + func.__name__
         else:
             self._current_step = func.__name__
-        result = func(self, *args, **kwargs)
+
+        return time.perf_counter(), time.thread_time()
+
+    def end_step(self, wall_start: float, cpu_start: Optional[float]) -> None:
+        self._step_timings.append(
+            StepTiming(
+                name=func.__name__,
+                wall_time=time.perf_counter() - wall_start,
+                cpu_time=time.thread_time() - cpu_start if cpu_start is not None else 0.0,
+            )
+        )
+
+    if inspect.iscoroutinefunction(func):
+
+        async def async_wrapper(self, *args, **kwargs):
+            # The event loop thread is shared with other jobs, so its CPU time can't be attributed to the step.
+            wall_start, _ = start_step(self)
+            try:
+                with trace_span(func.__name__, "step", job_name=self.name):
+                    result = await func(self, *args, **kwargs)
+            finally:
+                end_step(self, wall_start, None)
+            logger.debug("completed step %s for %s %s", func.__name__, self.type, self.name)
+            return result
+
+        return async_wrapper
+
+    def wrapper(self, *args, **kwargs):
+        wall_start, cpu_start = start_step(self)
+        try:
+            with trace_span(func.__name__, "step", job_name=self.name):
+                result = func(self, *args, **kwargs)
+        finally:
+            end_step(self, wall_start, cpu_start)
+        self._peak_result_size = max(self._peak_result_size, self._result_size())
         logger.debug("completed step %s for %s %s", func.__name__, self.type, self.name)
         return result
 
     return wrapper
 
 
+def run_coroutine(awaitable: Awaitable[T]) -> T:
+    """Runs an awaitable to completion from synchronous code, and returns its result.
+
+    Uses a new event loop in the current thread, or in a separate thread if the current thread
+    already runs an event loop, e.g. in a notebook.
+    """
+
+    async def wrap() -> T:
+        return await awaitable
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(wrap())
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, wrap()).result()
+
+
 @dataclass(kw_only=True)
 class BaseJob(ABC):
     """The base class for a Job."""
@@ -45,10 +229,71 @@ class BaseJob(ABC):
     tags: Dict[str, str]
     max_concurrency: Optional[int] = None
     schedule: Optional[str] = None
+    executor: Optional[Literal["thread", "process"]] = None
+    memory_hint: Optional[Union[str, int]] = None
+    retry: Optional[RetryPolicy] = None
+    timeout: Optional[timedelta] = None
+    resources: Dict[str, int] = field(default_factory=dict)
     _current_step: Optional[str] = None
+    _step_timings: List[StepTiming] = field(default_factory=list)
+    _rows_written: Optional[int] = None
+    _peak_result_size: int = 0
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _planned_refresh: Optional[RefreshDecision] = field(default=None, repr=False)
+    _cache_hint: Optional[CacheHint] = field(default=None, repr=False)
+    _cache_decision: Optional[str] = None
+    _result_cache: Optional[ResultCache] = field(default=None, repr=False)
     _fn: Callable[..., DataFrameType]
     _depends_on: Optional[List[BaseJob]] = None
 
+    @property
+    def _input_validations(self) -> List[tuple[bool, str]]:
+        """Validations of the parameters shared by all jobs, as pairs of a condition which is true for invalid input and its error."""
+
+        def is_valid_size(size: Union[str, int]) -> bool:
+            try:
+                parse_size(size)
+                return True
+            except ValueError:
+                return False
+
+        return [
+            (
+                self.executor not in (None, "thread", "process"),
+                f"executor must be one of: 'thread', 'process' - got {self.executor}",
+            ),
+            (
+                self.memory_hint is not None and not is_valid_size(self.memory_hint),
+                f"memory_hint must be a size like '512MB' or a number of bytes - got {self.memory_hint}",
+            ),
+            (
+                self.retry is not None
+                and (not isinstance(self.retry, RetryPolicy) or self.retry.attempts < 1),
+                f"retry must be a RetryPolicy with at least one attempt - got {self.retry}",
+            ),
+            (
+                self.timeout is not None
+                and (not isinstance(self.timeout, timedelta) or self.timeout <= timedelta(0)),
+                f"timeout must be a positive timedelta - got {self.timeout}",
+            ),
+            (
+                not isinstance(self.resources, Dict)
+                or not all(
+                    isinstance(k, str) and isinstance(v, int) and v > 0
+                    for k, v in self.resources.items()
+                ),
+                f"resources must be a dictionary of pool names and positive integer amounts - got {self.resources}",
+            ),
+        ]
+
+    def __post_init__(self):
+        """Validates the parameters of the job."""
+        errors = [msg for cond, msg in self._input_validations if cond]
+        if errors:
+            for msg in errors:
+                logger.error(msg)
+            raise BluenoUserError("\n".join(errors))
+
     @track_step
     def _register(self, registry: JobRegistry) -> None:
         if self.name in registry.jobs:
@@ -58,6 +303,107 @@ class BaseJob(ABC):
 
         registry.jobs[self.name] = self
 
+    def _reset_metrics(self) -> None:
+        """Resets the metrics recorded while running the job."""
+        self._step_timings = []
+        self._rows_written = None
+        self._peak_result_size = 0
+        self._cache_decision = None
+
+    @property
+    def _runs_on_event_loop(self) -> bool:
+        """Whether the job can run on the event loop of `Pipeline.run_async` instead of in a worker thread."""
+        return False
+
+    async def run_async(self) -> None:
+        """Runs the job from an event loop.
+
+        Jobs which only implement `run` are run in a separate thread.
+        """
+        await asyncio.to_thread(self.run)
+
+    def _cancel(self) -> None:
+        """Asks the job to stop at its next step."""
+        self._cancel_event.set()
+
+    def _result_size(self) -> int:
+        """The estimated size in bytes of the in-memory result of the job, if it has one."""
+        return 0
+
+    def _decide_refresh(self) -> RefreshDecision:
+        """Decides from metadata only whether the job needs to run, without running it."""
+        return RefreshDecision(True, f"{self.type.lower()}s always run")
+
+    @property
+    def _has_observable_commits(self) -> bool:
+        """Whether other processes can observe through `_is_committed_in_run` that the job completed in a run."""
+        return False
+
+    def _is_committed_in_run(self) -> bool:
+        """Checks if the job committed to its target in the current pipeline run."""
+        return False
+
+    def _mark_committed_in_run(self) -> None:
+        """Records in the target of the job that it completed in the current pipeline run."""
+        pass
+
+    @property
+    def _has_in_memory_result(self) -> bool:
+        """Whether the result of the job only lives in memory, so it must be recomputed for dependents in a resumed run."""
+        return False
+
+    @property
+    def _shares_result(self) -> bool:
+        """Whether dependents read the in-memory result of the job instead of its target, so it must be kept until they finish."""
+        return self._has_in_memory_result
+
+    @property
+    def _has_lazy_result(self) -> bool:
+        """Whether the in-memory result of the job is a plan which each dependent evaluates again, e.g. a scan with transformations."""
+        return False
+
+    @property
+    def _fusable(self) -> bool:
+        """Whether the job can run fused with its siblings of the same type in one worker, see `_run_fused`."""
+        return False
+
+    @staticmethod
+    def _run_fused(jobs: List[BaseJob]) -> Dict[str, Exception]:
+        """Runs sibling jobs in the current thread, sharing their common work where the job type supports it.
+
+        Args:
+            jobs: The jobs to run.
+
+        Returns:
+            The exceptions of the jobs which failed, by name.
+        """
+        errors: Dict[str, Exception] = {}
+        for job in jobs:
+            try:
+                job.run()
+            except Exception as e:
+                errors[job.name] = e
+        return errors
+
+    def _output_version(self) -> Optional[int]:
+        """The version of the target table of the job, if it has one."""
+        return None
+
+    def _pin_output_version(self, version: Optional[int]) -> None:
+        """Makes dependents read the target table of the job at a version. `None` removes the pin."""
+        pass
+
+    def _tail_output_version(self) -> Optional[int]:
+        """Reads the current version of the target table of the job from the commits added since it was last read.
+
+        Unlike `_output_version`, the table is kept open between calls, so only the new commits of the log are read.
+        """
+        return None
+
+    def _refresh_metadata(self) -> None:
+        """Drops the cached table handles and metadata of the job, so they are read again from the target."""
+        pass
+
     @property
     def current_step(self) -> str:
         """The current step which the job is executing."""
@@ -124,8 +470,24 @@ class BaseJob(ABC):
     def free_memory(self) -> None:
         """Method to free up memory, e.g. deleting dataframe.
 
-        This will be called when the jobs dependents have completed.
+        This will be called when the last dependent of the job which reads its in-memory result has finished,
+        or when the job completes if its dependents read its target instead.
+        """
+        pass
+
+    def _export_result(self, path: str) -> bool:
+        """Writes the in-memory result of the job to an Arrow IPC file.
+
+        Used to hand over results between processes. Returns False if the job has no in-memory result.
         """
+        return False
+
+    def _load_result(self, path: str) -> None:
+        """Loads a result written by `_export_result`."""
+        pass
+
+    def _clear_result(self) -> None:
+        """Drops the in-memory result of the job."""
         pass
 
 
@@ -135,6 +497,7 @@ class JobRegistry:
 
     _instance: Optional[JobRegistry] = None
     jobs: dict[str, BaseJob] = field(default_factory=dict)
+    discovered_paths: list[str] = field(default_factory=list)
 
     def __new__(cls):
         """Singleton method."""
@@ -284,6 +647,8 @@ class JobRegistry:
     def discover_jobs(self, path: str | pathlib.Path = "blueprints") -> None:
         """Discover jobs from with possible discovery methods."""
         self.discover_py_blueprints(path)
+        if str(path) not in self.discovered_paths:
+            self.discovered_paths.append(str(path))
         # self.discover_sql_blueprints(path)
 
     # def register(self, job: BaseJob) -> None:
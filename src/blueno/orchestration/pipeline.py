@@ -1,22 +1,40 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import heapq
+import itertools
 import json
 import logging
 import os
+import shutil
+import tempfile
+import threading
 import time
-from concurrent.futures import Future, ThreadPoolExecutor
-from dataclasses import dataclass, field
-from datetime import datetime, timezone
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from fnmatch import fnmatch
-from functools import lru_cache
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Literal, Optional, Union
 
 import psutil
 from croniter import croniter
 
-from blueno.exceptions import BluenoUserError
-from blueno.orchestration.job import BaseJob
+from blueno.exceptions import BluenoUserError, GenericBluenoError, JobTimeoutError
+from blueno.orchestration.history import JobStatistics, RunHistory
+from blueno.orchestration.job import BaseJob, CacheHint, RefreshDecision, StepTiming
+from blueno.orchestration.process_backend import ProcessBackend
+from blueno.orchestration.result_cache import ResultCache
+from blueno.orchestration.run_context import run_context
+from blueno.tracing import Tracer, activate, trace_counter, trace_span
+from blueno.utils import parse_size
+
+if TYPE_CHECKING:
+    from blueno.orchestration.distributed import WorkItem, WorkQueue
 
 # class Trigger(Enum):
 #     ON_SUCCESS = "on_success"
@@ -38,17 +56,60 @@ class ActivityStatus(Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class ResourceSample:
+    """A sample of the resource usage of a running activity.
+
+    Attributes:
+        timestamp: When the sample was taken as a unix timestamp.
+        cpu_time: The CPU time of the activity in seconds.
+        memory: The growth in bytes of the process memory since the activity started.
+    """
+
+    timestamp: float
+    cpu_time: float
+    memory: int
+
+
+@dataclass(slots=True)
 class PipelineActivity:
-    """PipelineActivity."""
+    """PipelineActivity.
+
+    An activity is a node in the pipeline DAG. Its edges are stored as adjacency lists of
+    integer ids, which are the positions of the activities in `Pipeline.activities`.
+
+    While an activity runs, its CPU time is attributed from the CPU time of the thread running it,
+    and its peak memory from the growth of the process memory and the estimated size of its
+    in-memory dataframe at the end of each step.
+    """
 
-    # id: str
     job: BaseJob
+    id: int = -1
     start: float = 0.0
     duration: float = 0.0
     status: ActivityStatus = ActivityStatus.PENDING
     in_degrees: int = 0
-    dependents: list[BaseJob] = field(default_factory=list)
+    upstreams: list[int] = field(default_factory=list)
+    dependents: list[int] = field(default_factory=list)
+    pending_upstreams: int = 0
+    pending_consumers: int = 0
+    critical_path: float = 0.0
+    retries: int = 0
+    on_event_loop: bool = False
+    shard: Optional[int] = None
+    skip_reason: Optional[str] = None
+    cpu_time: float = 0.0
+    rows_written: Optional[int] = None
+    output_version: Optional[int] = None
+    cache_decision: Optional[str] = None
+    steps: list[StepTiming] = field(default_factory=list)
+    dataframe_size: int = 0
+    samples: list[ResourceSample] = field(default_factory=list)
+    memory_estimate: int = 0
+    thread_id: Optional[int] = None
+    start_cpu_time: float = 0.0
+    start_memory: int = 0
+    peak_memory: int = 0
     exception: Optional[Exception] = None
 
     def __str__(self):
@@ -56,138 +117,671 @@ class PipelineActivity:
         return json.dumps(
             {
                 "job": json.loads(str(self.job)),
+                "id": self.id,
                 "start": self.start,
                 "duration": self.duration,
                 "status": str(self.status),
                 "in_degrees": self.in_degrees,
+                "upstreams": self.upstreams,
                 "dependants": self.dependents,
+                "critical_path": self.critical_path,
+                "retries": self.retries,
+                "memory_estimate": self.memory_estimate,
+                "peak_memory": self.peak_memory,
+                "cpu_time": self.cpu_time,
+                "rows_written": self.rows_written,
+                "output_version": self.output_version,
+                "cache_decision": self.cache_decision,
             },
             indent=4,
         )
 
 
+@dataclass(frozen=True)
+class PlanEntry:
+    """Whether an activity would run in a planned run of a pipeline.
+
+    Attributes:
+        job_name: The name of the job.
+        run: Whether the activity would run.
+        reason: Why the activity would or wouldn't run.
+        expected_duration: The expected duration in seconds of the activity from previous runs, if it would run.
+        expected_memory: The expected peak memory in bytes of the activity, if it would run.
+    """
+
+    job_name: str
+    run: bool
+    reason: str
+    expected_duration: float = 0.0
+    expected_memory: int = 0
+    _decision: Optional[RefreshDecision] = field(default=None, repr=False, compare=False)
+
+
+_DONE_STATUSES = (ActivityStatus.COMPLETED, ActivityStatus.SKIPPED)
+_ABORTED_STATUSES = (ActivityStatus.FAILED, ActivityStatus.CANCELLED)
+
+
 @dataclass
 class Pipeline:
-    """Pipeline."""
+    """Pipeline.
+
+    Attributes:
+        resource_pools: The capacities of the named resource pools which jobs declare in their `resources`, e.g. `{"onelake_write": 2}`.
+            An activity is only started when every pool it uses has enough capacity left. Pools without a capacity are unlimited.
+        fair_share_tag: Optional tag to share the workers fairly between the groups of jobs with the same value of the tag, e.g. `layer`.
+            The next activity to start comes from the group with the fewest running activities relative to its weight.
+            Priorities and critical paths order the activities within a group.
+        fair_share_weights: The weights of the groups of the `fair_share_tag` by tag value, e.g. `{"gold": 2}`. Groups default to a weight of 1.
+        auto_cache: Whether lazy results of `dataframe` blueprints without a `cache_mode`, which are read by more than one dependent, are materialized once.
+            See `cache_report` for the decisions of a run.
+        auto_cache_spill_size: Automatically cached results whose expected size exceeds this many bytes are spilled to an Arrow IPC file instead of kept in memory.
+            So are the results which blueprints materialize before validating and writing them, see `Blueprint.materialize`.
+        result_cache: Optional persistent cache of the transformed dataframes of blueprints with `cache_result`, shared between runs.
+            Jobs in worker processes don't use the cache.
+        fuse_siblings: Whether ready blueprints which share an upstream run together in one worker of a threaded run.
+            Their transformed dataframes are collected in one pass with `pl.collect_all`, so the subplans they share are evaluated once,
+            and each result is then written with the write mode of its blueprint. Since fused siblings run one after another, siblings are only
+            fused when they read the same lazy in-memory result, or when they would still wait for a slot after every free slot is taken - then they are
+            spread over the siblings which took the slots. Fused siblings don't occupy a slot of their own. Blueprints with a timeout, retry policy, resources,
+            `max_concurrency` or the `process` executor always run on their own. The run traces the siblings as one `fused execution`.
+        tracer: Optional tracer which records the run, its activities, the steps of their jobs and their Delta and Polars operations as spans.
+            The tracer also records the busy and idle concurrency slots, and the number of ready activities waiting for a slot.
+            Jobs in worker processes are only recorded as a whole.
+    """
 
     activities: list[PipelineActivity] = field(default_factory=list)
-    # _ready_activities: list[Activity] = field(default_factory=list)
-    # _lock = threading.Lock()
+    _ready_queue: list[tuple[tuple, int]] = field(default_factory=list)
+    _ready_on_event_loop: list[tuple[tuple, int]] = field(default_factory=list)
     _running_activities: dict[Future[str], PipelineActivity] = field(default_factory=dict)
     failed_jobs: dict[str, Exception] = field(default_factory=dict)
     log_resource_usage: bool = False
+    resource_pools: dict[str, int] = field(default_factory=dict)
+    fair_share_tag: Optional[str] = None
+    fair_share_weights: dict[str, float] = field(default_factory=dict)
+    history: Optional[RunHistory] = None
+    auto_cache: bool = True
+    auto_cache_spill_size: int = 1024**3
+    result_cache: Optional[ResultCache] = None
+    fuse_siblings: bool = False
+    tracer: Optional[Tracer] = None
+    run_id: Optional[str] = None
+    _executor: Literal["thread", "process"] = "thread"
+    _process_backend: Optional[ProcessBackend] = None
+    _process: psutil.Process = field(default_factory=lambda: psutil.Process(os.getpid()))
+    _memory_budget: Optional[int] = None
+    _timeout: Optional[timedelta] = None
+    _use_event_loop: bool = False
+    _shard: Optional[int] = None
+    _waiting_remote: set[int] = field(default_factory=set)
+    remote_poll_interval: float = 5.0
+    _last_remote_poll: float = 0.0
+    _started: float = 0.0
+    _stop_monitor: threading.Event = field(default_factory=threading.Event)
+    _job_statistics: dict[str, JobStatistics] = field(default_factory=dict)
+    _pinned_jobs: list[BaseJob] = field(default_factory=list)
+    _plan: Optional[list[PlanEntry]] = None
+    _trace_stack: ExitStack = field(default_factory=ExitStack)
+    _retained_results: dict[int, int] = field(default_factory=dict)
+    _cache_dir: Optional[str] = None
+    _fused_siblings: dict[int, list[tuple[PipelineActivity, Future]]] = field(default_factory=dict)
+    _fused_ids: set[int] = field(default_factory=set)
 
     def _have_all_dependents_completed(self, activity: PipelineActivity) -> bool:
         """Check if all dependents of an activity have completed."""
-        dependent_activities = [a for a in self.activities if a.job.name in activity.dependents]
-        return all(
-            dep.status in (ActivityStatus.COMPLETED, ActivityStatus.SKIPPED)
-            for dep in dependent_activities
-        )
+        return all(self.activities[i].status in _DONE_STATUSES for i in activity.dependents)
 
     def _is_ready(self, activity: PipelineActivity) -> bool:
-        dep_activities = [
-            a for a in self.activities if a.job.name in [d.name for d in activity.job.depends_on]
-        ]
-        # if hasattr(activity.job, "trigger"):
-        #     trigger = getattr(activity.job, "trigger", Trigger.ON_SUCCESS)
-        #     if trigger == Trigger.ON_SUCCESS:
-        #         return all(dep.status == Status.COMPLETED for dep in dep_activities)
-        #     elif trigger == Trigger.ON_COMPLETION:
-        #         return all(
-        #             dep.status in (Status.COMPLETED, Status.FAILED, Status.SKIPPED)
-        #             for dep in dep_activities
-        #         )
-        #     elif trigger == Trigger.ON_FAILURE:
-        #         return any(dep.status == Status.FAILED for dep in dep_activities)
-        is_ready = all(
-            dep.status in (ActivityStatus.COMPLETED, ActivityStatus.SKIPPED)
-            for dep in dep_activities
-        )
-        return is_ready
+        return all(self.activities[i].status in _DONE_STATUSES for i in activity.upstreams)
+
+    def _priority_key(self, activity: PipelineActivity) -> tuple:
+        """The key which orders the ready queue - lower keys are dispatched first.
+
+        Explicit priorities take precedence, and activities with the longest remaining path to a sink go first among equal priorities.
+        """
+        return (-activity.job.priority, -activity.critical_path, activity.id)
+
+    def _expected_durations(self) -> dict[str, float]:
+        """The expected duration of each activity from previous runs.
+
+        Jobs without successful runs in the history are expected to take the average duration of the jobs with.
+        """
+        known = [s.duration for s in self._job_statistics.values() if s.duration > 0]
+        default = sum(known) / len(known) if known else 1.0
+
+        durations = {}
+        for activity in self.activities:
+            statistics = self._job_statistics.get(activity.job.name)
+            durations[activity.job.name] = (
+                statistics.duration if statistics and statistics.duration > 0 else default
+            )
+        return durations
+
+    def _compute_critical_paths(self, durations: dict[str, float]) -> None:
+        """Computes the longest remaining path to a sink of each activity, including its own duration."""
+        # Activities are in topological order, so dependents are visited before their upstreams.
+        for activity in reversed(self.activities):
+            duration = 0.0 if activity.status in _DONE_STATUSES else durations[activity.job.name]
+            activity.critical_path = duration + max(
+                (self.activities[i].critical_path for i in activity.dependents), default=0.0
+            )
+
+    def _set_ready(self, activity: PipelineActivity) -> None:
+        logger.debug("setting status for %s to READY", activity.job.name)
+        activity.status = ActivityStatus.READY
+        activity.on_event_loop = self._use_event_loop and activity.job._runs_on_event_loop
+        queue = self._ready_on_event_loop if activity.on_event_loop else self._ready_queue
+        heapq.heappush(queue, (self._priority_key(activity), activity.id))
+
+    def _cancel_descendants(self, activity: PipelineActivity) -> None:
+        """Cancels all pending descendants of a failed or cancelled activity."""
+        stack = [activity]
+        while stack:
+            upstream = stack.pop()
+            for i in upstream.dependents:
+                dependent = self.activities[i]
+                if dependent.status is not ActivityStatus.PENDING:
+                    continue
+                logger.debug(
+                    "setting status for activity %s to CANCELLED as upstream activity %s has status %s",
+                    dependent.job.name,
+                    upstream.job.name,
+                    upstream.status.name,
+                )
+                dependent.status = ActivityStatus.CANCELLED
+                self._waiting_remote.discard(dependent.id)
+                self._release_upstream_results(dependent)
+                stack.append(dependent)
 
     def _update_activities_status(self):
-        # with self._lock:
+        """Initializes the dependency counters and the ready queue from the current statuses."""
+        self._ready_queue = []
+        self._ready_on_event_loop = []
+        self._waiting_remote = (
+            {
+                a.id
+                for a in self.activities
+                if a.status is ActivityStatus.PENDING and self._is_remote(a)
+            }
+            if self._shard is not None
+            else set()
+        )
+
         for activity in self.activities:
-            if activity.status is ActivityStatus.PENDING and self._is_ready(activity):
-                logger.debug("setting status for %s to READY", activity.job.name)
-                activity.status = ActivityStatus.READY
+            activity.pending_upstreams = sum(
+                1 for i in activity.upstreams if self.activities[i].status not in _DONE_STATUSES
+            )
+            activity.pending_consumers = sum(
+                1
+                for i in activity.dependents
+                if self.activities[i].status is ActivityStatus.PENDING
+                and not self._is_remote(self.activities[i])
+            )
+
+        for activity in self.activities:
+            if self._is_remote(activity):
+                continue
+            if activity.status is ActivityStatus.PENDING and activity.pending_upstreams == 0:
+                self._set_ready(activity)
+            elif activity.status in _ABORTED_STATUSES:
+                self._cancel_descendants(activity)
+
+    def _update_dependents_status(self, activity: PipelineActivity) -> None:
+        """Updates the status of the dependents of an activity which has just finished."""
+        self._release_upstream_results(activity)
+        if activity.status in _ABORTED_STATUSES:
+            self._cancel_descendants(activity)
+            return
+
+        for i in activity.dependents:
+            dependent = self.activities[i]
+            dependent.pending_upstreams -= 1
+            if self._is_remote(dependent):
                 continue
+            if dependent.status is ActivityStatus.PENDING and dependent.pending_upstreams == 0:
+                self._set_ready(dependent)
 
-            if activity.status in (ActivityStatus.CANCELLED, ActivityStatus.FAILED):
-                for dep in activity.dependents:
-                    act = [act for act in self.activities if act.job.name == dep][0]
-                    if act.status is ActivityStatus.PENDING:
-                        logger.debug(
-                            "setting status for activity %s to CANCELLED as upstream activity %s has status %s",
-                            act.job.name,
-                            activity.job.name,
-                            activity.status.name,
-                        )
-                        act.status = ActivityStatus.CANCELLED
+        if activity.status is ActivityStatus.COMPLETED:
+            self._retain_or_release_result(activity)
+
+    def _retain_or_release_result(self, activity: PipelineActivity) -> None:
+        """Keeps the in-memory result of a completed activity while dependents still read it, and releases it otherwise.
+
+        The in-memory results of the leaves of the DAG are kept after the run, as they are its outputs.
+        """
+        job = activity.job
+        if activity.pending_consumers > 0 and job._shares_result:
+            logger.debug(
+                "keeping the result of %s in memory for %s dependents",
+                job.name,
+                activity.pending_consumers,
+            )
+            self._retained_results[activity.id] = activity.dataframe_size
+        elif activity.dependents or not job._has_in_memory_result:
+            job.free_memory()
+        self._trace_retained_results()
+
+    def _release_upstream_results(self, activity: PipelineActivity) -> None:
+        """Releases the retained results of the upstreams of a finished activity which have no other pending consumers."""
+        if self._is_remote(activity):
+            return
+        for i in activity.upstreams:
+            upstream = self.activities[i]
+            upstream.pending_consumers -= 1
+            if upstream.pending_consumers == 0 and upstream.id in self._retained_results:
+                logger.debug("releasing the result of %s", upstream.job.name)
+                del self._retained_results[upstream.id]
+                upstream.job.free_memory()
+                self._trace_retained_results()
+
+    def _trace_retained_results(self) -> None:
+        trace_counter(
+            "retained results",
+            results=len(self._retained_results),
+            bytes=sum(self._retained_results.values()),
+        )
+
+    def shard(self, index: int, count: int) -> None:
+        """Restricts the pipeline to one of `count` static shards of the DAG.
+
+        Each shard runs its activities in a separate `blueno run` process, possibly on another machine,
+        and all shards must run with the same `run_id`. Activities are assigned to shards round-robin
+        in topological order. Jobs whose completion can't be observed from another process, i.e. tasks
+        and blueprints which are not in the `delta` format, are assigned to the shard of their dependents.
+
+        A shard waits on upstream activities of other shards by polling their Delta tables for a commit in
+        the run, every `remote_poll_interval` seconds. A waiting activity fails if its upstream doesn't
+        commit within its timeout from the start of the run.
+
+        Args:
+            index: The shard to run, from 1 to `count`.
+            count: The number of shards.
+
+        Example:
+        ```python notest
+        from blueno import create_pipeline, job_registry
+
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.shard(index=2, count=3)
+        pipeline.run(concurrency=4, run_id="2025-06-01")
+        ```
+        """
+        if not 1 <= index <= count:
+            msg = "the shard index must be between 1 and the shard count %s - got %s"
+            logger.error(msg, count, index)
+            raise BluenoUserError(msg % (count, index))
+
+        groups = list(range(len(self.activities)))
+
+        def find(i: int) -> int:
+            while groups[i] != i:
+                groups[i] = groups[groups[i]]
+                i = groups[i]
+            return i
+
+        for activity in self.activities:
+            if activity.job._has_observable_commits:
                 continue
+            for i in activity.dependents:
+                a, b = find(i), find(activity.id)
+                groups[max(a, b)] = min(a, b)
 
-            if (
-                activity.status is ActivityStatus.COMPLETED
-            ):  # and self._have_all_dependents_completed(activity):
-                activity.job.free_memory()
+        # Groups are numbered by their first activity, which is the same in every shard process.
+        roots = sorted({find(activity.id) for activity in self.activities})
+        shards = {root: position % count + 1 for position, root in enumerate(roots)}
+        for activity in self.activities:
+            activity.shard = shards[find(activity.id)]
+        self._shard = index
+
+        needed = {
+            i
+            for activity in self.activities
+            if activity.shard == index and activity.status is ActivityStatus.PENDING
+            for i in activity.upstreams
+        }
+        for activity in self.activities:
+            if self._is_remote(activity) and activity.id not in needed:
+                if activity.status is ActivityStatus.PENDING:
+                    activity.skip_reason = f"runs in shard {activity.shard}"
+                    logger.debug(
+                        "activity %s was skipped as it runs in shard %s",
+                        activity.job.name,
+                        activity.shard,
+                    )
+                    activity.status = ActivityStatus.SKIPPED
 
-    def _can_schedule_activity(self, activity: PipelineActivity, pipeline_concurrency: int) -> bool:
-        """Check if an activity can be schedule considering its max_concurrency and it's priority relative to other activity priorities."""
+    def _is_remote(self, activity: PipelineActivity) -> bool:
+        """Whether the activity runs in another shard."""
+        return self._shard is not None and activity.shard != self._shard
+
+    @property
+    def _remote_poll_timeout(self) -> Optional[float]:
+        """The time until activities of other shards should be polled again, if any are waited on."""
+        if not self._waiting_remote:
+            return None
+        return max(self._last_remote_poll + self.remote_poll_interval - time.monotonic(), 0.0)
+
+    def _poll_remote_activities(self) -> None:
+        """Completes the activities of other shards which have committed in the run."""
+        if time.monotonic() - self._last_remote_poll < self.remote_poll_interval:
+            return
+        self._last_remote_poll = time.monotonic()
+
+        for i in sorted(self._waiting_remote):
+            if i not in self._waiting_remote:
+                # Cancelled by a failed upstream polled before it.
+                continue
+            activity = self.activities[i]
+            if activity.job._is_committed_in_run():
+                logger.info("activity %s completed in shard %s", activity.job.name, activity.shard)
+                activity.status = ActivityStatus.COMPLETED
+                self._waiting_remote.discard(i)
+                self._update_dependents_status(activity)
+                continue
+
+            timeout = activity.job.timeout or self._timeout
+            if timeout is not None and time.monotonic() - self._started > timeout.total_seconds():
+                msg = "%s %s in shard %s did not commit within %s seconds of the start of run %s"
+                logger.error(
+                    msg,
+                    activity.job.type,
+                    activity.job.name,
+                    activity.shard,
+                    timeout.total_seconds(),
+                    self.run_id,
+                )
+                activity.status = ActivityStatus.FAILED
+                activity.exception = JobTimeoutError(
+                    msg
+                    % (
+                        activity.job.type,
+                        activity.job.name,
+                        activity.shard,
+                        timeout.total_seconds(),
+                        self.run_id,
+                    )
+                )
+                self.failed_jobs[activity.job.name] = activity.exception
+                self._waiting_remote.discard(i)
+                self._update_dependents_status(activity)
+
+    @property
+    def _running_in_workers(self) -> list[PipelineActivity]:
+        """The running activities which occupy a worker, i.e. which don't run on the event loop or fused in the worker of a sibling."""
+        return [
+            a
+            for a in self._running_activities.values()
+            if not a.on_event_loop and a.id not in self._fused_ids
+        ]
+
+    def _has_free_capacity(self, pipeline_concurrency: int) -> bool:
+        """Check if any activity can be scheduled considering the max_concurrency of the running activities."""
+        running = self._running_in_workers
         # If there are no running we can schedule
-        if self._running_activities == {}:
+        if not running:
             return True
 
-        # Check if there's a higher prio waiting.
-        higher_prio_waiting = any(
-            a for a in self._ready_activities if a.job.priority > activity.job.priority
-        )
-        if higher_prio_waiting:
-            return False
+        max_concurrency = min(a.job.max_concurrency or pipeline_concurrency for a in running)
+        return len(running) < max_concurrency
 
-        # Check if adding a new activity would exceed the max_concurrency of current running activities
-        max_concurrency = min(
-            a.job.max_concurrency or pipeline_concurrency for a in self._running_activities.values()
-        )
-        if len(self._running_activities) + 1 > max_concurrency:
+    def _can_schedule_activity(self, activity: PipelineActivity, pipeline_concurrency: int) -> bool:
+        """Check if an activity can be schedule considering its own and the running activities max_concurrency.
+
+        Priorities are handled by the order of the ready queue.
+        """
+        if not self._has_free_capacity(pipeline_concurrency):
             return False
 
         # Check if adding a new activity would exceed it's own max_concurrency
         if (
             activity.job.max_concurrency
-            and len(self._running_activities) >= activity.job.max_concurrency  # ty: ignore[unsupported-operator]
+            and len(self._running_in_workers) >= activity.job.max_concurrency  # ty: ignore[unsupported-operator]
         ):
             return False
 
         return True
 
-    def _update_activities(self):
-        for activity in self.activities:
-            # if activity.status is Status.RUNNING and activity.start == 0:
-            #     activity.start = time.time()
-
-            if activity.status is ActivityStatus.RUNNING:
-                activity.duration = time.time() - activity.start
-            # elif (
-            #     activity.status in (Status.COMPLETED, Status.FAILED)
-            #     and activity.duration == 0.0
-            # ):
-            #     activity.duration = time.time() - activity.start
-
-            # if any(
-            #     activity for activity in self.activities if activity.status == Status.FAILED
-            # ):
-            #     logger.warning("Setting skipped")
-            #     if activity.status == Status.WAITING:
-            #         activity.status = Status.SKIPPED
+    def _fits_resource_pools(
+        self, activity: PipelineActivity, running: Iterable[PipelineActivity]
+    ) -> bool:
+        """Check if every resource pool of an activity has enough capacity left for it.
+
+        An activity may always use a pool which nothing else uses, even if it needs more than the capacity of the pool.
+        """
+        running = list(running)
+        for pool, amount in activity.job.resources.items():
+            capacity = self.resource_pools.get(pool)
+            if capacity is None:
+                continue
+            used = sum(a.job.resources.get(pool, 0) for a in running)
+            if used and used + amount > capacity:
+                return False
+        return True
+
+    def _admits_resources(self, activity: PipelineActivity, blocked_pools: set[str]) -> bool:
+        """Check if an activity can take its resources, and reserves them for it if it can't.
+
+        Resources reserved for a waiting activity are not handed to activities further back in the ready queue.
+        """
+        if not blocked_pools.intersection(activity.job.resources) and self._fits_resource_pools(
+            activity, self._running_activities.values()
+        ):
+            return True
+
+        logger.debug(
+            "deferring activity %s as its resource pools %s have no capacity left",
+            activity.job.name,
+            activity.job.resources,
+        )
+        blocked_pools.update(activity.job.resources)
+        return False
+
+    def _pop_ready_activity(self) -> tuple[tuple, int]:
+        """Pops the next activity from the ready queue, from the group with the lowest weighted share of the workers when sharing fairly."""
+        tag = self.fair_share_tag
+        if tag is None:
+            return heapq.heappop(self._ready_queue)
+
+        running = Counter(a.job.tags.get(tag) for a in self._running_in_workers)
+
+        def share(item: tuple[tuple, int]) -> tuple[float, tuple, int]:
+            group = self.activities[item[1]].job.tags.get(tag)
+            key, i = item
+            return (running[group] / self.fair_share_weights.get(group, 1.0), key, i)
+
+        item = min(self._ready_queue, key=share)
+        self._ready_queue.remove(item)
+        heapq.heapify(self._ready_queue)
+        return item
+
+    def _estimate_memory(self, activity: PipelineActivity) -> int:
+        """The expected peak memory of an activity from its hint, or else from previous runs."""
+        if activity.job.memory_hint is not None:
+            return parse_size(activity.job.memory_hint)
+
+        statistics = self._job_statistics.get(activity.job.name)
+        return statistics.peak_memory if statistics else 0
+
+    def _fits_memory_budget(self, activity: PipelineActivity) -> bool:
+        """Check if the projected memory of the running activities and the activity fits the memory budget."""
+        if self._memory_budget is None or not self._running_activities:
+            return True
+
+        # Results retained for dependents stay in memory until their last dependent finishes.
+        projected = (
+            activity.memory_estimate
+            + sum(max(a.memory_estimate, a.peak_memory) for a in self._running_activities.values())
+            + sum(self._retained_results.values())
+        )
+        return projected <= self._memory_budget
+
+    def _schedule_ready_activities(
+        self, submit: Callable[[PipelineActivity], Union[Future, asyncio.Future]], concurrency: int
+    ) -> None:
+        """Submits ready activities in priority order while there is capacity.
+
+        Activities running on the event loop don't occupy a worker, and are submitted at once as long as their resource pools have capacity.
+        """
+        blocked_pools: set[str] = set()
+        deferred = []
+
+        while self._ready_on_event_loop:
+            key, i = heapq.heappop(self._ready_on_event_loop)
+            activity = self.activities[i]
+            if not self._admits_resources(activity, blocked_pools):
+                deferred.append((key, i))
+                continue
+
+            logger.debug("setting status for activity %s to QUEUED", activity.job.name)
+            activity.status = ActivityStatus.QUEUED
+            self._running_activities[submit(activity)] = activity
+
+        for item in deferred:
+            heapq.heappush(self._ready_on_event_loop, item)
+
+        deferred = []
+        blocked_priority = None
+        # The activities are submitted after the pass, so siblings which are still waiting for a slot can be fused into them.
+        dispatched: list[tuple[Future, PipelineActivity]] = []
+
+        while self._ready_queue and self._has_free_capacity(concurrency):
+            key, i = self._pop_ready_activity()
+            activity = self.activities[i]
+
+            # Never schedule an activity ahead of a higher priority activity which is waiting
+            if blocked_priority is not None and activity.job.priority < blocked_priority:
+                deferred.append((key, i))
+                break
+
+            if not self._can_schedule_activity(activity, concurrency):
+                deferred.append((key, i))
+                if blocked_priority is None:
+                    blocked_priority = activity.job.priority
+                continue
+
+            # Defer everything until enough memory is released for the highest priority activity
+            if not self._fits_memory_budget(activity):
+                logger.debug(
+                    "deferring activity %s as its expected memory usage of %s bytes exceeds the memory budget",
+                    activity.job.name,
+                    activity.memory_estimate,
+                )
+                deferred.append((key, i))
+                break
+
+            if not self._admits_resources(activity, blocked_pools):
+                deferred.append((key, i))
+                continue
+
+            logger.debug("setting status for activity %s to QUEUED", activity.job.name)
+            activity.status = ActivityStatus.QUEUED
+            placeholder: Future = Future()
+            self._running_activities[placeholder] = activity
+            dispatched.append((placeholder, activity))
+            if self.fuse_siblings:
+                sharing, _ = self._ready_siblings(activity)
+                self._fuse_into(activity, sharing)
+
+        for item in deferred:
+            heapq.heappush(self._ready_queue, item)
+
+        if self.fuse_siblings and dispatched and not self._has_free_capacity(concurrency):
+            self._fuse_waiting_siblings([activity for _, activity in dispatched], concurrency)
+
+        for placeholder, activity in dispatched:
+            del self._running_activities[placeholder]
+            self._running_activities[submit(activity)] = activity
+
+        busy = len(self._running_in_workers)
+        trace_counter(
+            "concurrency slots", busy=busy, idle=concurrency - busy, ready=len(self._ready_queue)
+        )
+
+    def _is_fusable(self, activity: PipelineActivity) -> bool:
+        """Check if an activity can run fused with its siblings in the worker of one of them."""
+        job = activity.job
+        return (
+            job._fusable
+            and bool(activity.upstreams)
+            and not activity.on_event_loop
+            and (job.executor or self._executor) == "thread"
+            and job.timeout is None
+            and self._timeout is None
+            and job.retry is None
+            and not job.resources
+            and job.max_concurrency is None
+        )
+
+    def _ready_siblings(self, activity: PipelineActivity) -> tuple[list[tuple], list[tuple]]:
+        """The ready siblings of an activity which it can run fused with, in priority order.
+
+        Returns:
+            The items of the ready queue of the siblings which share a lazy upstream result with the activity, and of the others.
+        """
+        if self._use_event_loop or not self._is_fusable(activity):
+            return [], []
+
+        upstreams = set(activity.upstreams)
+        lazy_upstreams = {i for i in upstreams if self.activities[i].job._has_lazy_result}
+        sharing, others = [], []
+        for item in sorted(self._ready_queue):
+            sibling = self.activities[item[1]]
+            if (
+                type(sibling.job) is not type(activity.job)
+                or not upstreams.intersection(sibling.upstreams)
+                or not self._is_fusable(sibling)
+            ):
+                continue
+            if lazy_upstreams.intersection(sibling.upstreams):
+                sharing.append(item)
+            else:
+                others.append(item)
+        return sharing, others
+
+    def _fuse_into(self, activity: PipelineActivity, items: list[tuple]) -> None:
+        """Takes siblings from the ready queue to run them fused in the worker of an activity, while they fit the memory budget.
+
+        The siblings get futures of their own, which the worker of the activity resolves. They don't occupy a worker.
+        """
+        fused = self._fused_siblings.setdefault(activity.id, [])
+        for item in items:
+            sibling = self.activities[item[1]]
+            if not self._fits_memory_budget(sibling):
+                continue
+
+            self._ready_queue.remove(item)
+            logger.debug("setting status for activity %s to QUEUED", sibling.job.name)
+            sibling.status = ActivityStatus.QUEUED
+            future: Future = Future()
+            self._running_activities[future] = sibling
+            self._fused_ids.add(sibling.id)
+            fused.append((sibling, future))
+
+        if fused:
+            heapq.heapify(self._ready_queue)
+        else:
+            del self._fused_siblings[activity.id]
+
+    def _fuse_waiting_siblings(self, activities: list[PipelineActivity], concurrency: int) -> None:
+        """Fuses the siblings which still wait for a slot after a scheduling pass into the activities it dispatched.
+
+        Fused siblings run one after another, so each activity only takes its share of the waiting siblings, the ones with the
+        lowest priority, and the others are left for the workers which free up first.
+        """
+        for activity in activities:
+            _, others = self._ready_siblings(activity)
+            share = -(-len(others) // concurrency)
+            if share:
+                self._fuse_into(activity, others[len(others) - share :])
 
     @property
     def _ready_activities(self) -> list[PipelineActivity]:
-        return [activity for activity in self.activities if activity.status is ActivityStatus.READY]
+        return [
+            self.activities[i] for _, i in sorted(self._ready_queue + self._ready_on_event_loop)
+        ]
 
     @property
     def _has_ready_activities(self) -> bool:
-        return any(self._ready_activities)
+        return bool(self._ready_queue or self._ready_on_event_loop)
 
     def run_activity(self, activity: PipelineActivity, **kwargs):
         """Run a single activity."""
@@ -195,13 +789,144 @@ class Pipeline:
         if context is not None:
             context.thread_local_storage.invocation_id = context.invocation_id
 
+        siblings = self._fused_siblings.pop(activity.id, None)
+        if siblings:
+            self._run_fused_activities(activity, siblings)
+            return
+
+        self._start_activity(activity)
+        activity.thread_id = threading.get_native_id()
+        activity.start_cpu_time = time.thread_time()
+        with trace_span(activity.job.name, "activity", job_type=activity.job.type) as span:
+            try:
+                self._run_with_retries(activity)
+            finally:
+                # Jobs in worker processes and jobs with a timeout run in another thread, which reports its own CPU time.
+                if activity.thread_id == threading.get_native_id():
+                    activity.cpu_time = time.thread_time() - activity.start_cpu_time
+                self._collect_job_metrics(activity, span)
+
+            self._complete_activity(activity)
+            span.update(peak_memory=activity.peak_memory, output_version=activity.output_version)
+
+    def _run_fused_activities(
+        self, activity: PipelineActivity, siblings: list[tuple[PipelineActivity, Future]]
+    ) -> None:
+        """Runs an activity and its fused siblings together, and resolves the futures of the siblings.
+
+        The CPU time of each activity is the CPU time of its steps, as they share the thread.
+        """
+        # Siblings cancelled before the worker picked them up are not run.
+        siblings = [(a, future) for a, future in siblings if future.set_running_or_notify_cancel()]
+        activities = [activity] + [sibling for sibling, _ in siblings]
+        names = [a.job.name for a in activities]
+        errors: dict[str, Exception] = {}
+        logger.info("running activities %s fused", ", ".join(names))
+        try:
+            for a in activities:
+                self._start_activity(a)
+
+            with trace_span("fused execution", "activity", jobs=", ".join(names)) as span:
+                errors = type(activity.job)._run_fused([a.job for a in activities])
+                for a in activities:
+                    a.cpu_time = sum(step.cpu_time for step in a.job._step_timings)
+                    self._collect_job_metrics(a, {})
+                    if a.job.name not in errors:
+                        self._complete_activity(a)
+
+                span.update(
+                    failed=", ".join(errors),
+                    rows_written=sum(a.rows_written or 0 for a in activities),
+                    bytes=sum(a.dataframe_size for a in activities),
+                )
+        except Exception as e:
+            for a in activities:
+                if a.status is not ActivityStatus.COMPLETED:
+                    errors.setdefault(a.job.name, e)
+
+        for sibling, future in siblings:
+            if sibling.job.name in errors:
+                future.set_exception(errors[sibling.job.name])
+            else:
+                future.set_result(None)
+
+        if activity.job.name in errors:
+            raise errors[activity.job.name]
+
+    async def run_activity_async(self, activity: PipelineActivity) -> None:
+        """Run a single activity on the event loop."""
+        self._start_activity(activity)
+        job = activity.job
+        timeout = job.timeout or self._timeout
+        deadline = time.monotonic() + timeout.total_seconds() if timeout else None
+
+        with trace_span(job.name, "activity", job_type=job.type, on_event_loop=True) as span:
+            try:
+                for attempt in itertools.count(1):
+                    remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                    try:
+                        await asyncio.wait_for(job.run_async(), remaining)
+                        break
+                    except asyncio.TimeoutError as e:
+                        if not timeout or deadline is None or time.monotonic() < deadline:
+                            raise
+                        msg = "%s %s did not finish within %s seconds"
+                        logger.error(msg, job.type, job.name, timeout.total_seconds())
+                        raise JobTimeoutError(
+                            msg % (job.type, job.name, timeout.total_seconds())
+                        ) from e
+                    except Exception as e:
+                        delay = self._retry_delay(activity, e, attempt, deadline)
+                        if delay is None:
+                            raise
+                        await asyncio.sleep(delay)
+            finally:
+                self._collect_job_metrics(activity, span)
+
+            self._complete_activity(activity)
+            span.update(peak_memory=activity.peak_memory)
+
+    def _start_activity(self, activity: PipelineActivity) -> None:
         activity.status = ActivityStatus.RUNNING
         activity.start = time.time()
+        activity.start_memory = self._process.memory_info().rss
         logger.debug("setting status for activity %s to RUNNING", activity.job.name)
         logger.info("starting activity %s", activity.job.name)
 
-        activity.job.run()
+        activity.job._reset_metrics()
+        activity.job._cancel_event = threading.Event()
+        activity.job._result_cache = self.result_cache
+        activity.job._cache_hint = (
+            CacheHint(
+                consumers=activity.pending_consumers,
+                expected_size=activity.memory_estimate,
+                spill_size=self.auto_cache_spill_size,
+                spill_dir=self._cache_dir,
+            )
+            if self._cache_dir is not None
+            else None
+        )
+
+    def _collect_job_metrics(self, activity: PipelineActivity, span: dict) -> None:
+        job = activity.job
+        activity.steps = list(job._step_timings)
+        activity.rows_written = job._rows_written
+        activity.dataframe_size = job._peak_result_size
+        activity.cache_decision = job._cache_decision
+        span.update(
+            cache=activity.cache_decision,
+            rows_written=activity.rows_written,
+            bytes=activity.dataframe_size,
+            retries=activity.retries,
+        )
+
+    def _complete_activity(self, activity: PipelineActivity) -> None:
+        if any(self._is_remote(self.activities[i]) for i in activity.dependents):
+            activity.job._mark_committed_in_run()
+
         activity.duration = time.time() - activity.start
+        activity.output_version = activity.job._output_version()
+        self._sample_memory(activity)
         activity.status = ActivityStatus.COMPLETED
         logger.debug("setting status for activity %s to COMPLETED", activity.job.name)
         logger.info(
@@ -210,93 +935,898 @@ class Pipeline:
             round(activity.duration, 3),
         )
 
-    def run(self, concurrency: int = 1, **kwargs):
-        """Runs the pipeline."""
+    def _run_with_retries(self, activity: PipelineActivity) -> None:
+        """Runs the job of an activity, and retries it according to the retry policy of the job.
+
+        The timeout of the job bounds the total duration of all attempts.
+        """
+        job = activity.job
+        timeout = job.timeout or self._timeout
+        deadline = time.monotonic() + timeout.total_seconds() if timeout else None
+        process_backend = self._process_backend
+
+        for attempt in itertools.count(1):
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                # Workers of distributed runs have no process pool, and run process jobs in a thread.
+                if (job.executor or self._executor) == "process" and process_backend is not None:
+                    activity.thread_id = None
+                    activity.cpu_time += process_backend.run(job, timeout=remaining)
+                elif remaining is not None:
+                    self._run_in_thread(activity, remaining)
+                else:
+                    job.run()
+                return
+            except Exception as e:
+                delay = self._retry_delay(activity, e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _retry_delay(
+        self,
+        activity: PipelineActivity,
+        exception: Exception,
+        attempt: int,
+        deadline: Optional[float],
+    ) -> Optional[float]:
+        """The delay before retrying a failed attempt of an activity, or None if it must not be retried."""
+        job = activity.job
+        if (
+            job.retry is None
+            or isinstance(exception, JobTimeoutError)
+            or not job.retry.should_retry(exception, attempt)
+        ):
+            return None
+
+        delay = job.retry.delay(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+
+        activity.retries += 1
+        logger.warning(
+            "activity %s failed with %s: %s - retrying in %.1f seconds (attempt %s of %s)",
+            job.name,
+            type(exception).__name__,
+            exception,
+            delay,
+            attempt + 1,
+            job.retry.attempts,
+        )
+        # Results of the failed attempt may be stale, e.g. a table read before a commit.
+        job._clear_result()
+        return delay
+
+    def _run_in_thread(self, activity: PipelineActivity, timeout: float) -> None:
+        """Runs the job of an activity in a separate thread, which is abandoned if the job doesn't finish within the timeout.
+
+        Python threads can't be killed, so an abandoned job is cancelled and stops when it starts its next step.
+        """
+        job = activity.job
+        errors: list[BaseException] = []
+        # Record the spans of the job as children of the span of the activity.
+        context = contextvars.copy_context()
+
+        def target() -> None:
+            activity.thread_id = threading.get_native_id()
+            activity.start_cpu_time = time.thread_time()
+            try:
+                context.run(job.run)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                if not job._cancel_event.is_set():
+                    activity.cpu_time = time.thread_time() - activity.start_cpu_time
+
+        thread = threading.Thread(target=target, name=f"blueno-{job.name}", daemon=True)
+        thread.start()
+        thread.join(timeout)
+
+        if thread.is_alive():
+            job._cancel()
+            msg = "%s %s did not finish within %s seconds"
+            logger.error(msg, job.type, job.name, round(timeout, 3))
+            raise JobTimeoutError(msg % (job.type, job.name, round(timeout, 3)))
+
+        if errors:
+            raise errors[0]
+
+    def _sample_memory(self, activity: PipelineActivity) -> int:
+        """Updates the peak memory of an activity, and returns the growth of the process memory since it started."""
+        memory = self._process.memory_info().rss - activity.start_memory
+        activity.peak_memory = max(activity.peak_memory, memory, activity.job._peak_result_size)
+        return memory
+
+    def _sample_resources(self) -> None:
+        """Records a resource sample for each running activity."""
+        running = [a for a in self.activities if a.status is ActivityStatus.RUNNING]
+        if not running:
+            return
+
+        thread_cpu_times = {
+            thread.id: thread.user_time + thread.system_time for thread in self._process.threads()
+        }
+        now = time.time()
+        for activity in running:
+            memory = self._sample_memory(activity)
+
+            # Jobs in worker processes report their CPU time when they complete.
+            thread_cpu_time = thread_cpu_times.get(activity.thread_id)
+            if (
+                thread_cpu_time is not None
+                and (activity.job.executor or self._executor) == "thread"
+            ):
+                activity.cpu_time = max(
+                    activity.cpu_time, thread_cpu_time - activity.start_cpu_time
+                )
+
+            activity.samples.append(
+                ResourceSample(timestamp=now, cpu_time=activity.cpu_time, memory=memory)
+            )
+
+    def _monitor_resources(self, stop_event: threading.Event, interval: float) -> None:
+        """Samples resource usage of the running activities until the stop event is set."""
+        last_logged = 0.0
+        while not stop_event.wait(interval):
+            self._sample_resources()
+
+            if self.log_resource_usage and time.time() - last_logged >= 1:
+                self._log_resource_usage(self._process)
+                last_logged = time.time()
+
+    def _log_resource_usage(self, process: psutil.Process) -> None:
+        process_cpu_percent = process.cpu_percent(interval=0)
+        cpu_percent = psutil.cpu_percent(interval=0)
+        cpu_cores = psutil.cpu_count(logical=True)
+
+        virtual_mem = psutil.virtual_memory()
+        total_mem = virtual_mem.total / (1024**2)
+        used_mem = virtual_mem.used / (1024**2)
+        mem_percent = virtual_mem.percent
+
+        process_mem = process.memory_info().rss / (1024**2)
+
+        logger.info(
+            "cpu usage: %.1f%% on %d cores (process: %.1f%%), memory usage: %.2f MB / %.2f MB (%.1f%%) (process: %.2f MB)",
+            cpu_percent,
+            cpu_cores,
+            process_cpu_percent,
+            used_mem,
+            total_mem,
+            mem_percent,
+            process_mem,
+        )
+
+    def _handle_completed_activity(self, future: Future) -> None:
+        activity = self._running_activities.pop(future)
+        maybe_exception = future.exception()
+        if maybe_exception:
+            logger.debug("setting status for activity %s to FAILED", activity.job.name)
+            activity.status = ActivityStatus.FAILED
+            activity.duration = time.time() - activity.start
+            logger.info(
+                "activity %s completed in failure after %s seconds",
+                activity.job.name,
+                activity.duration,
+            )
+            self.failed_jobs[activity.job.name] = maybe_exception
+            activity.exception = maybe_exception
+            logger.error(
+                "Error running blueprint %s: %s",
+                activity.job.name,
+                maybe_exception,
+                exc_info=maybe_exception,
+            )
+
+    def run(
+        self,
+        concurrency: int = 1,
+        executor: Literal["thread", "process"] = "thread",
+        memory_budget: Optional[str | int] = None,
+        timeout: Optional[timedelta] = None,
+        run_id: Optional[str] = None,
+        **kwargs,
+    ):
+        """Runs the pipeline.
+
+        The scheduler blocks until a running activity completes, and dispatches newly ready
+        activities as soon as their upstream activities are done. Ready activities are dispatched
+        by priority, and then by their critical path - the longest expected duration of the activity
+        and its descendants, based on the durations of previous runs in the `history`.
+
+        Args:
+            concurrency: The maximum number of activities to run at the same time.
+            executor: The default executor backend for jobs which don't set their own.
+                `thread` runs jobs in threads of the current process, and `process` runs jobs in a pool of `concurrency` worker processes.
+            memory_budget: Optional memory budget for the run, e.g. `48GB`.
+                Activities are only started while the expected peak memory of the running activities fits the budget - others are deferred until memory is released.
+                The expected peak memory of an activity is the `memory_hint` of its job, or else the highest peak memory of its previous runs in the `history`.
+                An activity is always started if nothing else is running.
+            timeout: Optional maximum duration of each activity whose job doesn't set its own `timeout`.
+                When the timeout is reached, the activity fails and its dependents are cancelled.
+                Jobs in worker processes are killed, but jobs in threads are only abandoned and may still commit, see `Blueprint.register`.
+            run_id: Optional id of the run. The shards of a sharded run must use the same id. Defaults to a new random id.
+            **kwargs: Additional keyword arguments passed on to each activity.
+        """
+        self._start_run(concurrency, executor, memory_budget, timeout, run_id)
+        try:
+            self._run(concurrency, **kwargs)
+        finally:
+            self._end_run()
+
+    async def run_async(
+        self,
+        concurrency: int = 1,
+        executor: Literal["thread", "process"] = "thread",
+        memory_budget: Optional[str | int] = None,
+        timeout: Optional[timedelta] = None,
+        run_id: Optional[str] = None,
+    ):
+        """Runs the pipeline on the running event loop.
+
+        Tasks defined with `async def` run on the event loop, so any number of them can wait on I/O
+        at the same time. All other jobs run in a pool of `concurrency` workers, like with `run`.
+        The run can be awaited from an event loop which is already running, e.g. in a notebook.
+
+        Args:
+            concurrency: The maximum number of activities to run at the same time in workers.
+            executor: The default executor backend for jobs which don't set their own.
+            memory_budget: Optional memory budget for the run, e.g. `48GB`. See `run`.
+            timeout: Optional maximum duration of each activity whose job doesn't set its own `timeout`.
+            run_id: Optional id of the run, e.g. to resume a failed run. Defaults to a new random id. See `run`.
+
+        Example:
+        ```python notest
+        import aiohttp
+
+        from blueno import Task, create_pipeline, job_registry
+
+
+        @Task.register()
+        async def ping_api() -> None:
+            async with aiohttp.ClientSession() as session:
+                await session.get("https://example.com/health")
+
+
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        await pipeline.run_async(concurrency=4)
+        ```
+        """
+        self._use_event_loop = True
+        self._start_run(concurrency, executor, memory_budget, timeout, run_id)
+        try:
+            await self._run_async(concurrency)
+        finally:
+            self._end_run()
+            self._use_event_loop = False
+
+    def _plan_run(self, timeout: Optional[timedelta], run_id: Optional[str]) -> None:
+        """Starts a new run, and plans it from the statistics of previous runs."""
+        self.run_id = run_id or uuid.uuid4().hex
+        run_context.run_id = self.run_id
+        if self.tracer is not None:
+            activate(self.tracer)
+            self._trace_stack.enter_context(trace_span("pipeline run", "run", run_id=self.run_id))
+        self._started = time.monotonic()
+        self._last_remote_poll = 0.0
+        self._process = psutil.Process(os.getpid())
+        self._job_statistics = self.history.job_statistics() if self.history else {}
+        self._timeout = timeout
+        if self._plan is not None:
+            self._apply_plan(self._plan)
+            self._plan = None
+        self._compute_critical_paths(self._expected_durations())
+        for activity in self.activities:
+            activity.memory_estimate = self._estimate_memory(activity)
+
         self._update_activities_status()
-        self._update_activities()
+        if self.auto_cache and any(
+            a.pending_consumers > 1 or a.memory_estimate > self.auto_cache_spill_size
+            for a in self.activities
+        ):
+            self._cache_dir = tempfile.mkdtemp(prefix="blueno-cache-")
+
+    def cache_report(self) -> dict[str, str]:
+        """The decisions of the automatic cache in the last run, by job name.
+
+        Returns:
+            How the result of each automatically cached job was materialized - `memory`, `file` or `lazy` - and why.
+        """
+        return {a.job.name: a.cache_decision for a in self.activities if a.cache_decision}
+
+    def plan(self, concurrency: int = 8) -> list[PlanEntry]:
+        """Decides which activities a run of the pipeline would run, and why, without running any jobs.
+
+        The schedule and the name and tag filters are already applied by `create_pipeline`. The freshness
+        and the upstream timestamps of the selected blueprints are read from the metadata of their Delta
+        tables, for all activities in parallel. An activity whose upstream tables haven't changed still
+        runs when one of its upstream activities runs.
+
+        The next `run` reuses the plan. Activities which don't need to run are skipped before any worker
+        starts, and blueprints only read their metadata again when an upstream job runs before them.
+
+        Args:
+            concurrency: The number of activities to read the metadata of at the same time.
+
+        Returns:
+            An entry for each activity, in topological order.
+
+        Example:
+        ```python notest
+        from blueno import create_pipeline, job_registry
+
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        for entry in pipeline.plan():
+            print(entry.job_name, entry.run, entry.reason)
+
+        pipeline.run(concurrency=4)
+        ```
+        """
+        self._job_statistics = self.history.job_statistics() if self.history else {}
+        durations = self._expected_durations()
+
+        pending = [a for a in self.activities if a.status is ActivityStatus.PENDING]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            decisions = dict(
+                zip(
+                    (activity.id for activity in pending),
+                    executor.map(lambda activity: activity.job._decide_refresh(), pending),
+                )
+            )
+
+        entries = []
+        runs = set()
+        # Activities are in topological order, so upstreams are decided before their dependents.
+        for activity in self.activities:
+            name = activity.job.name
+            decision = decisions.get(activity.id)
+            if decision is None:
+                reason = activity.skip_reason or f"the activity is {activity.status.value}"
+                entries.append(PlanEntry(name, run=False, reason=reason))
+                continue
+
+            upstream_runs = [self.activities[i].job.name for i in activity.upstreams if i in runs]
+            if decision.refresh is None and upstream_runs:
+                decision = RefreshDecision(True, f"upstream job {upstream_runs[0]} will run")
+
+            if not decision.refresh:
+                entries.append(PlanEntry(name, run=False, reason=decision.reason))
+                continue
+
+            runs.add(activity.id)
+            entries.append(
+                PlanEntry(
+                    name,
+                    run=True,
+                    reason=decision.reason,
+                    expected_duration=durations[name],
+                    expected_memory=self._estimate_memory(activity),
+                    # The metadata changes when an upstream job runs, so the decision is made again then.
+                    _decision=None if upstream_runs else decision,
+                )
+            )
+
+        logger.info("planned %s of %s activities to run", len(runs), len(self.activities))
+        self._plan = entries
+        return entries
+
+    def _apply_plan(self, plan: list[PlanEntry]) -> None:
+        """Skips the pending activities which the plan doesn't run, and hands the decisions to the jobs which it does."""
+        entries = {entry.job_name: entry for entry in plan}
+        for activity in self.activities:
+            entry = entries.get(activity.job.name)
+            if entry is None or activity.status is not ActivityStatus.PENDING:
+                continue
+
+            if entry.run:
+                activity.job._planned_refresh = entry._decision
+                continue
+
+            logger.info("activity %s was skipped as planned: %s", activity.job.name, entry.reason)
+            activity.status = ActivityStatus.SKIPPED
+            activity.skip_reason = entry.reason
+
+    def resume(self, run_id: str) -> None:
+        """Prepares the pipeline to resume a failed run from its last successful frontier.
+
+        Activities which completed in the run are marked as completed, and dependents read their Delta
+        tables at the versions recorded in the manifest of the run. Only the other activities and their
+        descendants run again, along with the upstream blueprints whose results only lived in memory.
+
+        Run the pipeline with the same `run_id` afterwards, so appends which the failed run already
+        committed are not committed twice.
+
+        Args:
+            run_id: The id of the run to resume, as recorded in the `history`.
+
+        Example:
+        ```python notest
+        from blueno import create_pipeline, job_registry
+        from blueno.orchestration.history import RunHistory
+
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.history = RunHistory(".blueno/history.db")
+        pipeline.resume("8f14e45fceea167a5a36dedd4bea2543")
+        pipeline.run(concurrency=4, run_id="8f14e45fceea167a5a36dedd4bea2543")
+        ```
+        """
+        manifest = self.history.manifest(run_id) if self.history is not None else {}
+        if not manifest:
+            msg = "cannot resume run %s as it has no manifest in the run history"
+            logger.error(msg, run_id)
+            raise BluenoUserError(msg % run_id)
+
+        # Activities are in topological order, so upstreams are visited before their dependents.
+        rerun = set()
+        for activity in self.activities:
+            if activity.status is ActivityStatus.SKIPPED:
+                continue
+            entry = manifest.get(activity.job.name)
+            if (
+                entry is None
+                or entry.status != ActivityStatus.COMPLETED.value
+                or any(i in rerun for i in activity.upstreams)
+            ):
+                rerun.add(activity.id)
+
+        for activity in reversed(self.activities):
+            if activity.id not in rerun:
+                continue
+            for i in activity.upstreams:
+                upstream = self.activities[i]
+                if (
+                    upstream.status is not ActivityStatus.SKIPPED
+                    and upstream.job._has_in_memory_result
+                ):
+                    rerun.add(i)
+
+        for activity in self.activities:
+            if activity.status is ActivityStatus.SKIPPED:
+                continue
+            if activity.id in rerun:
+                activity.status = ActivityStatus.PENDING
+                continue
+
+            activity.status = ActivityStatus.COMPLETED
+            activity.output_version = manifest[activity.job.name].output_version
+            if activity.output_version is not None:
+                activity.job._pin_output_version(activity.output_version)
+                self._pinned_jobs.append(activity.job)
+
+        logger.info(
+            "resuming run %s with %s activities to run again",
+            run_id,
+            len(rerun),
+        )
 
+    def run_continuous(
+        self,
+        concurrency: int = 1,
+        poll_interval: float = 5.0,
+        debounce: timedelta = timedelta(seconds=2),
+        stop_event: Optional[threading.Event] = None,
+        max_batches: Optional[int] = None,
+        **kwargs,
+    ) -> None:
+        """Runs the pipeline, and then keeps running the dependents of Delta tables which receive new commits.
+
+        After a first run of the selected activities, the Delta logs of their tables are tailed every
+        `poll_interval` seconds, which only reads the commits added since the previous poll. Commits from other
+        processes trigger a micro-batch of the selected descendants of the changed tables, along with the upstream
+        blueprints whose results only live in memory. A micro-batch starts once no new commits arrived for
+        `debounce`, and runs like `run`. Micro-batches run one at a time, so a running job is never triggered
+        again - commits arriving meanwhile trigger the next micro-batch.
+
+        Args:
+            concurrency: The maximum number of activities to run at the same time.
+            poll_interval: The number of seconds between polls of the Delta logs.
+            debounce: How long to wait for further commits before starting a micro-batch.
+            stop_event: Optional event which stops the pipeline when set. Otherwise, it runs until interrupted.
+            max_batches: Optional number of runs, including the first run, after which the pipeline stops.
+            **kwargs: Additional keyword arguments passed on to `run`, e.g. `executor`, `memory_budget` or `timeout`.
+                Each run gets its own run id, so a `run_id` is not accepted - the appends of later micro-batches would be
+                skipped as already committed in the run.
+
+        Example:
+        ```python notest
+        from datetime import timedelta
+
+        from blueno import create_pipeline, job_registry
+
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.run_continuous(concurrency=4, poll_interval=2.0, debounce=timedelta(seconds=5))
+        ```
+        """
+        if "run_id" in kwargs:
+            msg = "run_continuous gives each micro-batch its own run id - got run_id %s"
+            logger.error(msg, kwargs["run_id"])
+            raise BluenoUserError(msg % kwargs["run_id"])
+
+        stop_event = stop_event or threading.Event()
+        selected = {a.id for a in self.activities if a.status is not ActivityStatus.SKIPPED}
+        watched = {i for i in selected if self.activities[i].job._has_observable_commits}
+
+        self.run(concurrency=concurrency, **kwargs)
+        batches = 1
+        versions = {i: self.activities[i].job._tail_output_version() for i in watched}
+        changed: set[int] = set()
+        last_change = 0.0
+
+        try:
+            while max_batches is None or batches < max_batches:
+                if stop_event.wait(poll_interval):
+                    break
+
+                for i in watched:
+                    version = self.activities[i].job._tail_output_version()
+                    if version != versions[i]:
+                        logger.info(
+                            "table of %s changed from version %s to %s",
+                            self.activities[i].job.name,
+                            versions[i],
+                            version,
+                        )
+                        versions[i] = version
+                        changed.add(i)
+                        last_change = time.monotonic()
+
+                if not changed or time.monotonic() - last_change < debounce.total_seconds():
+                    continue
+
+                triggered = self._reset_activities_for_batch(changed, selected)
+                changed = set()
+                if not triggered:
+                    continue
+
+                logger.info("starting micro-batch of %s activities", len(triggered))
+                self.run(concurrency=concurrency, **kwargs)
+                batches += 1
+                # The commits of the micro-batch itself must not trigger another one.
+                for i in triggered & watched:
+                    versions[i] = self.activities[i].job._tail_output_version()
+
+        except KeyboardInterrupt:
+            logger.info("stopping the continuous run")
+
+    def _reset_activities_for_batch(self, changed: set[int], selected: set[int]) -> set[int]:
+        """Makes the selected descendants of the changed activities pending for the next micro-batch, and skips all others.
+
+        Returns:
+            The ids of the activities to run.
+        """
+        # Activities are in topological order, so upstreams are visited before their dependents.
+        triggers: dict[int, str] = {}
+        for activity in self.activities:
+            if activity.id not in selected:
+                continue
+            for i in activity.upstreams:
+                if i in changed:
+                    triggers[activity.id] = self.activities[i].job.name
+                    break
+                if i in triggers:
+                    triggers[activity.id] = triggers[i]
+                    break
+        triggered = set(triggers)
+
+        for activity in reversed(self.activities):
+            if activity.id not in triggered:
+                continue
+            for i in activity.upstreams:
+                if i in selected and self.activities[i].job._has_in_memory_result:
+                    triggered.add(i)
+
+        self.failed_jobs = {}
+        for activity in self.activities:
+            if activity.id not in selected:
+                continue
+            activity.job._refresh_metadata()
+            activity.start = activity.duration = activity.cpu_time = 0.0
+            activity.retries = activity.dataframe_size = activity.peak_memory = 0
+            activity.rows_written = activity.output_version = activity.exception = None
+            activity.cache_decision = None
+            activity.steps = []
+            activity.samples = []
+            if activity.id in triggered:
+                activity.status = ActivityStatus.PENDING
+                activity.skip_reason = None
+                # The commits are newer than the last refresh, even within the resolution of the freshness checks.
+                if activity.id in triggers:
+                    activity.job._planned_refresh = RefreshDecision(
+                        True, f"upstream table {triggers[activity.id]} received new commits"
+                    )
+            else:
+                activity.status = ActivityStatus.SKIPPED
+                activity.skip_reason = "not affected by the new commits"
+
+        return triggered
+
+    def run_distributed(
+        self,
+        queue: WorkQueue,
+        timeout: Optional[timedelta] = None,
+        run_id: Optional[str] = None,
+        poll_interval: float = 1.0,
+    ) -> None:
+        """Coordinates a run of the pipeline on `Worker` processes, possibly on other machines.
+
+        Activities are published to the work queue as soon as their upstream activities are done,
+        and run by the first worker to claim them. Ready activities are claimed by priority, and
+        then by their critical path. The concurrency of the run is the number of workers, so the
+        `max_concurrency` and `resources` of jobs and memory budgets don't apply.
+        The in-memory results which the workers hand over to each other are removed when the run ends.
+
+        Args:
+            queue: The work queue which the workers claim activities from.
+            timeout: Optional maximum duration of each activity whose job doesn't set its own `timeout`.
+            run_id: Optional id of the run. Defaults to a new random id.
+            poll_interval: The number of seconds between polls of the work queue for finished activities.
+
+        Example:
+        ```python notest
+        from blueno import create_pipeline, job_registry
+        from blueno.orchestration.distributed import WorkQueue
+
+        # Start workers with `blueno worker blueprints --work-queue /mnt/shared/blueno/queue.db`
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.run_distributed(WorkQueue("/mnt/shared/blueno/queue.db"))
+        ```
+        """
+        self._plan_run(timeout, run_id)
+        run_id = self.run_id
+        assert run_id is not None
+        context = asdict(run_context)
+        published: dict[str, PipelineActivity] = {}
+
+        start = time.time()
+        logger.info(
+            "distributed pipeline run %s started %s",
+            run_id,
+            datetime.fromtimestamp(start, tz=timezone.utc),
+        )
+        try:
+            while self._ready_queue or published:
+                while self._ready_queue:
+                    _, i = heapq.heappop(self._ready_queue)
+                    activity = self.activities[i]
+                    logger.debug("setting status for activity %s to QUEUED", activity.job.name)
+                    activity.status = ActivityStatus.QUEUED
+                    queue.publish(run_id, activity, context, timeout)
+                    published[activity.job.name] = activity
+
+                time.sleep(poll_interval)
+
+                for item in queue.items(run_id):
+                    activity = published.get(item.job_name)
+                    if activity is None:
+                        continue
+
+                    if item.status == "running" and activity.status is ActivityStatus.QUEUED:
+                        logger.info(
+                            "activity %s started on worker %s", activity.job.name, item.worker
+                        )
+                        activity.status = ActivityStatus.RUNNING
+                        activity.start = item.started or activity.start
+                    elif item.status in ("completed", "failed"):
+                        del published[item.job_name]
+                        self._complete_work_item(activity, item)
+                        self._update_dependents_status(activity)
+
+        except KeyboardInterrupt:
+            queue.cancel(run_id)
+            for activity in published.values():
+                if activity.status is ActivityStatus.QUEUED:
+                    logger.debug(
+                        "setting status for activity %s to CANCELLED as KeyboardInterrupt was called",
+                        activity.job.name,
+                    )
+                    activity.status = ActivityStatus.CANCELLED
+            raise
+
+        finally:
+            # The results handed over between the workers are not read after the run.
+            shutil.rmtree(queue.result_dir(run_id), ignore_errors=True)
+            self._end_run()
+
+        logger.info(
+            "distributed pipeline run %s ended after %s seconds",
+            run_id,
+            round(time.time() - start, 3),
+        )
+
+    def _complete_work_item(self, activity: PipelineActivity, item: WorkItem) -> None:
+        """Updates an activity from its outcome on a worker."""
+        activity.start = item.started or activity.start
+        activity.duration = item.duration
+        activity.cpu_time = item.cpu_time
+        activity.peak_memory = item.peak_memory
+        activity.rows_written = item.rows_written
+        activity.steps = item.steps
+
+        if item.status == "completed":
+            activity.output_version = activity.job._output_version()
+            logger.debug("setting status for activity %s to COMPLETED", activity.job.name)
+            activity.status = ActivityStatus.COMPLETED
+            logger.info(
+                "activity %s completed successfully on worker %s in %s seconds",
+                activity.job.name,
+                item.worker,
+                round(activity.duration, 3),
+            )
+            return
+
+        logger.debug("setting status for activity %s to FAILED", activity.job.name)
+        activity.status = ActivityStatus.FAILED
+        msg = "%s %s failed on worker %s: %s"
+        logger.error(msg, activity.job.type, activity.job.name, item.worker, item.error)
+        activity.exception = GenericBluenoError(
+            msg % (activity.job.type, activity.job.name, item.worker, item.error)
+        )
+        self.failed_jobs[activity.job.name] = activity.exception
+
+    def _start_run(
+        self,
+        concurrency: int,
+        executor: Literal["thread", "process"],
+        memory_budget: Optional[str | int],
+        timeout: Optional[timedelta],
+        run_id: Optional[str] = None,
+    ) -> None:
+        self._memory_budget = parse_size(memory_budget) if memory_budget is not None else None
+        self._plan_run(timeout, run_id)
+
+        self._executor = executor
+        if any(
+            (activity.job.executor or executor) == "process"
+            for activity in self.activities
+            if activity.status in (ActivityStatus.PENDING, ActivityStatus.READY)
+        ):
+            self._process_backend = ProcessBackend(processes=concurrency)
+
+        self._stop_monitor = threading.Event()
+        monitor = threading.Thread(
+            target=self._monitor_resources, args=(self._stop_monitor, 0.5), daemon=True
+        )
+        monitor.start()
+
+    def _end_run(self) -> None:
+        # Results are only retained beyond their consumers when the run was interrupted.
+        for i in self._retained_results:
+            self.activities[i].job.free_memory()
+        self._retained_results = {}
+        self._fused_siblings = {}
+        self._fused_ids = set()
+        if self._cache_dir is not None:
+            shutil.rmtree(self._cache_dir, ignore_errors=True)
+            self._cache_dir = None
+        for job in self._pinned_jobs:
+            job._pin_output_version(None)
+        self._pinned_jobs = []
+        for activity in self.activities:
+            activity.job._planned_refresh = None
+
+        self._stop_monitor.set()
+        if self._process_backend is not None:
+            self._process_backend.close()
+            self._process_backend = None
+        if self.history is not None:
+            self.history.record_run(self.run_id, self.activities)
+
+        if self.tracer is not None:
+            trace_counter("concurrency slots", busy=0, idle=0, ready=0)
+            self._trace_stack.close()
+            activate(None)
+
+    def simulate(self, concurrency: int, durations: Optional[Dict[str, float]] = None) -> float:
+        """Predicts the makespan of the pipeline without running any jobs.
+
+        Replays the scheduling decisions of `run` with the given concurrency, where each activity
+        takes its expected duration.
+
+        Args:
+            concurrency: The maximum number of activities to run at the same time.
+            durations: The duration of each job in seconds, e.g. from `RunHistory.run_durations`.
+                Jobs which are not in the mapping take their average duration from the `history`.
+
+        Returns:
+            The predicted duration of the run in seconds.
+
+        Example:
+        ```python notest
+        from blueno import create_pipeline, job_registry
+        from blueno.orchestration.history import RunHistory
+
+        history = RunHistory(".blueno/history.db")
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.history = history
+
+        for concurrency in (1, 2, 4, 8):
+            print(concurrency, pipeline.simulate(concurrency, history.run_durations()))
+        ```
+        """
+        self._job_statistics = self.history.job_statistics() if self.history else {}
+        durations = {**self._expected_durations(), **(durations or {})}
+        self._compute_critical_paths(durations)
+
+        pending_upstreams = {}
+        ready: list[tuple[tuple, int]] = []
+        for activity in self.activities:
+            if activity.status in _DONE_STATUSES:
+                continue
+            pending_upstreams[activity.id] = sum(
+                1 for i in activity.upstreams if self.activities[i].status not in _DONE_STATUSES
+            )
+            if pending_upstreams[activity.id] == 0:
+                heapq.heappush(ready, (self._priority_key(activity), activity.id))
+
+        def has_free_capacity(activity: PipelineActivity) -> bool:
+            limits = [concurrency, activity.job.max_concurrency] + [
+                self.activities[i].job.max_concurrency for _, i in running
+            ]
+            return len(running) < min(limit for limit in limits if limit is not None)
+
+        now = 0.0
+        running: list[tuple[float, int]] = []
+        while ready or running:
+            deferred = []
+            while ready and has_free_capacity(self.activities[ready[0][1]]):
+                key, i = heapq.heappop(ready)
+                activity = self.activities[i]
+                if not self._fits_resource_pools(
+                    activity, (self.activities[j] for _, j in running)
+                ):
+                    deferred.append((key, i))
+                    continue
+                heapq.heappush(running, (now + durations[activity.job.name], i))
+            for item in deferred:
+                heapq.heappush(ready, item)
+
+            now, i = heapq.heappop(running)
+            for dependent in self.activities[i].dependents:
+                if dependent not in pending_upstreams:
+                    continue
+                pending_upstreams[dependent] -= 1
+                if pending_upstreams[dependent] == 0:
+                    heapq.heappush(
+                        ready, (self._priority_key(self.activities[dependent]), dependent)
+                    )
+
+        return now
+
+    def _run(self, concurrency: int, **kwargs):
         start = time.time()
         logger.info("pipeline run started %s", datetime.fromtimestamp(start, tz=timezone.utc))
 
-        process = psutil.Process(os.getpid())
+        def submit(activity: PipelineActivity) -> Future:
+            return executor.submit(self.run_activity, activity, context=kwargs.get("context"))
 
         with ThreadPoolExecutor(max_workers=concurrency) as executor:
             try:
-                while self._has_ready_activities or self._running_activities:
-                    for activity in self._ready_activities:
-                        if not self._can_schedule_activity(activity, concurrency):
-                            continue
-                        # if activity.job.max_concurrency and len(self._running_futures) >= activity.job.max_concurrency:
-                        #     continue
-
-                        logger.debug("setting status for activity %s to QUEUED", activity.job.name)
-                        activity.status = ActivityStatus.QUEUED
-                        future = executor.submit(
-                            self.run_activity, activity, context=kwargs.get("context")
+                while (
+                    self._has_ready_activities or self._running_activities or self._waiting_remote
+                ):
+                    self._schedule_ready_activities(submit, concurrency)
+
+                    poll_timeout = self._remote_poll_timeout
+                    done = set()
+                    if self._running_activities:
+                        done, _ = wait(
+                            self._running_activities,
+                            timeout=poll_timeout,
+                            return_when=FIRST_COMPLETED,
                         )
-                        self._running_activities[future] = activity
-
-                    last_logged = time.time()
-                    while True:
-                        # self.benchmark(self._update_activities)
-                        self._update_activities()
-
-                        done = [f for f in self._running_activities if f.done()]
-                        if done:
-                            break
-                        time.sleep(0.1)
-
-                        if self.log_resource_usage and time.time() - last_logged > 1:
-                            process_cpu_percent = process.cpu_percent(interval=0)
-                            cpu_percent = psutil.cpu_percent(interval=0)
-                            cpu_cores = psutil.cpu_count(logical=True)
-
-                            virtual_mem = psutil.virtual_memory()
-                            total_mem = virtual_mem.total / (1024**2)
-                            used_mem = virtual_mem.used / (1024**2)
-                            mem_percent = virtual_mem.percent / (1024**2)
-
-                            process_mem = process.memory_info().rss / (1024**2)
-
-                            logger.info(
-                                "cpu usage: %.1f%% on %d cores (process: %.1f%%), memory usage: %.2f MB / %.2f MB (%.1f%%) (process: %.2f MB)",
-                                cpu_percent,
-                                cpu_cores,
-                                process_cpu_percent,
-                                used_mem,
-                                total_mem,
-                                mem_percent,
-                                process_mem,
-                            )
-                            last_logged = time.time()
+                    elif poll_timeout is not None:
+                        time.sleep(poll_timeout)
 
                     for future in done:
-                        activity = self._running_activities.pop(future)
-                        maybe_exception = future.exception()
-                        if maybe_exception:
-                            logger.debug(
-                                "setting status for activity %s to FAILED", activity.job.name
-                            )
-                            activity.status = ActivityStatus.FAILED
-                            activity.duration = time.time() - activity.start
-                            logger.info(
-                                "activity %s completed in failure after %s seconds",
-                                activity.job.name,
-                                activity.duration,
-                            )
-                            self.failed_jobs[activity.job.name] = maybe_exception
-                            activity.exception = maybe_exception
-                            logger.error(
-                                "Error running blueprint %s: %s",
-                                activity.job.name,
-                                maybe_exception,
-                                exc_info=maybe_exception,
-                            )
-
-                    self._update_activities_status()
+                        activity = self._running_activities[future]
+                        self._handle_completed_activity(future)
+                        self._update_dependents_status(activity)
+
+                    self._poll_remote_activities()
 
             except KeyboardInterrupt:
                 for future, activity in self._running_activities.items():
+                    activity.job._cancel()
                     if not (future.done() or future.running()):
                         logger.debug(
                             "setting status for activity %s to CANCELLED as KeyboardInterrupt was called",
@@ -313,6 +1843,63 @@ class Pipeline:
             round(time.time() - start, 3),
         )
 
+    async def _run_async(self, concurrency: int) -> None:
+        start = time.time()
+        logger.info("pipeline run started %s", datetime.fromtimestamp(start, tz=timezone.utc))
+
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        def submit(activity: PipelineActivity) -> asyncio.Future:
+            if activity.on_event_loop:
+                return asyncio.ensure_future(self.run_activity_async(activity))
+            return loop.run_in_executor(executor, self.run_activity, activity)
+
+        try:
+            while self._has_ready_activities or self._running_activities or self._waiting_remote:
+                self._schedule_ready_activities(submit, concurrency)
+
+                poll_timeout = self._remote_poll_timeout
+                done = set()
+                if self._running_activities:
+                    done, _ = await asyncio.wait(
+                        self._running_activities,
+                        timeout=poll_timeout,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                elif poll_timeout is not None:
+                    await asyncio.sleep(poll_timeout)
+
+                for future in done:
+                    activity = self._running_activities[future]
+                    self._handle_completed_activity(future)
+                    self._update_dependents_status(activity)
+
+                if self._waiting_remote:
+                    await asyncio.to_thread(self._poll_remote_activities)
+
+        except asyncio.CancelledError:
+            for future, activity in self._running_activities.items():
+                activity.job._cancel()
+                if activity.status is ActivityStatus.QUEUED or activity.on_event_loop:
+                    logger.debug(
+                        "setting status for activity %s to CANCELLED as the run was cancelled",
+                        activity.job.name,
+                    )
+                    activity.status = ActivityStatus.CANCELLED
+                    future.cancel()
+            raise
+
+        finally:
+            # Don't block the event loop on abandoned or cancelled workers.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.info(
+            "pipeline run ended %s after %s seconds",
+            datetime.fromtimestamp(start, tz=timezone.utc),
+            round(time.time() - start, 3),
+        )
+
 
 def _is_schedule_due(schedule: str) -> bool:
     """Checks if now is in the interval of the schedule."""
@@ -353,9 +1940,7 @@ def create_pipeline(
 
     # Step 1: Create all activities
     for job in jobs:
-        activity = PipelineActivity(job)
-        # for dep in job.depends_on:
-        #     activity.in_degrees += 1
+        activity = PipelineActivity(job, id=len(pipeline.activities))
         pipeline.activities.append(activity)
 
     def find_circular_dependencies(jobs):
@@ -399,55 +1984,58 @@ def create_pipeline(
                 logger.debug(
                     "setting %s as a dependent of %s", activity.job.name, dep_activity.job.name
                 )
-                dep_activity.dependents.append(activity.job.name)
+                dep_activity.dependents.append(activity.id)
+                activity.upstreams.append(dep_activity.id)
                 activity.in_degrees += 1
 
-    @lru_cache(maxsize=None)
-    def total_upstream_score(name):
-        activity = name_to_activity[name]
-        score = activity.in_degrees
-        for dep in activity.job.depends_on:
-            score += total_upstream_score(dep.name)
-        return score
-
-    # Step 3: Sort activities
-    pipeline.activities = sorted(
-        pipeline.activities,
-        key=lambda activity: (
-            total_upstream_score(activity.job.name),
-            -activity.job.priority,
-        ),
+    # Step 3: Score activities in topological order
+    total_upstream_score = [0] * len(pipeline.activities)
+    remaining = [activity.in_degrees for activity in pipeline.activities]
+    frontier = [activity.id for activity in pipeline.activities if activity.in_degrees == 0]
+    while frontier:
+        i = frontier.pop()
+        activity = pipeline.activities[i]
+        total_upstream_score[i] = activity.in_degrees + sum(
+            total_upstream_score[u] for u in activity.upstreams
+        )
+        for d in activity.dependents:
+            remaining[d] -= 1
+            if remaining[d] == 0:
+                frontier.append(d)
+
+    # Step 4: Sort activities and re-index them by their position
+    order = sorted(
+        range(len(pipeline.activities)),
+        key=lambda i: (total_upstream_score[i], -pipeline.activities[i].job.priority),
     )
+    new_ids = {old_id: new_id for new_id, old_id in enumerate(order)}
+    pipeline.activities = [pipeline.activities[i] for i in order]
+    for activity in pipeline.activities:
+        activity.id = new_ids[activity.id]
+        activity.upstreams = [new_ids[i] for i in activity.upstreams]
+        activity.dependents = [new_ids[i] for i in activity.dependents]
 
     if name_filters:
-        # Step 3: Build dependency maps
-        def get_ancestors(activity_name: str, level: Optional[int] = None) -> set:
-            visited, frontier = set(), {activity_name}
+        # Step 5: Build dependency maps
+        def traverse(activity_name: str, direction: str, level: Optional[int] = None) -> set:
+            visited, frontier = set(), {name_to_activity[activity_name].id}
             depth = 0
             while frontier and (level is None or depth < level):
                 next_frontier = set()
-                for name in frontier:
-                    for dep in name_to_activity[name].job.depends_on:
-                        if dep.name not in visited:
-                            next_frontier.add(dep.name)
+                for i in frontier:
+                    for j in getattr(pipeline.activities[i], direction):
+                        if j not in visited:
+                            next_frontier.add(j)
                 visited.update(next_frontier)
                 frontier = next_frontier
                 depth += 1
-            return visited
+            return {pipeline.activities[i].job.name for i in visited}
+
+        def get_ancestors(activity_name: str, level: Optional[int] = None) -> set:
+            return traverse(activity_name, "upstreams", level)
 
         def get_descendants(activity_name: str, level: Optional[int] = None) -> set:
-            visited, frontier = set(), {activity_name}
-            depth = 0
-            while frontier and (level is None or depth < level):
-                next_frontier = set()
-                for name in frontier:
-                    for dep_name in name_to_activity[name].dependents:
-                        if dep_name not in visited:
-                            next_frontier.add(dep_name)
-                visited.update(next_frontier)
-                frontier = next_frontier
-                depth += 1
-            return visited
+            return traverse(activity_name, "dependents", level)
 
         selected = set()
         import re
@@ -474,7 +2062,7 @@ def create_pipeline(
                 if "+" in suffix:
                     selected.update(get_descendants(job_name, level=len(suffix)))
 
-        # Step 4: Filter activities
+        # Step 6: Filter activities
         for activity in pipeline.activities:
             if activity.job.name not in selected:
                 logger.debug(
@@ -483,6 +2071,7 @@ def create_pipeline(
                     name_filters,
                 )
                 activity.status = ActivityStatus.SKIPPED
+                activity.skip_reason = "did not match the name filters"
                 continue
 
     if tag_filters:
@@ -503,6 +2092,7 @@ def create_pipeline(
                         tag_filters,
                     )
                     activity.status = ActivityStatus.SKIPPED
+                    activity.skip_reason = "did not match the tag filters"
                     break
 
     for activity in pipeline.activities:
@@ -516,6 +2106,7 @@ def create_pipeline(
                 activity.job.schedule,
             )
             activity.status = ActivityStatus.SKIPPED
+            activity.skip_reason = f"schedule {activity.job.schedule} is not due"
 
     if all(activity.status is ActivityStatus.SKIPPED for activity in pipeline.activities):
         logger.warning("no jobs matched the provided filters")
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import psutil
+
+from blueno.exceptions import BluenoUserError, JobCancelledError, JobTimeoutError
+from blueno.orchestration.job import BaseJob, StepTiming, job_registry
+from blueno.orchestration.run_context import run_context
+
+logger = logging.getLogger(__name__)
+
+# How often the parent checks whether a job waiting for a worker process started, or was cancelled.
+_POLL_INTERVAL = 0.05
+
+
+class _LogForwarder(logging.Handler):
+    """Re-emits log records received from worker processes through the parent's loggers."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def _initialize_worker(
+    project_dirs: list[str], cwd: str, log_queue: multiprocessing.Queue, log_level: int
+) -> None:
+    """Imports the project once per worker process."""
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(log_level)
+
+    os.chdir(cwd)
+    for project_dir in project_dirs:
+        job_registry.discover_jobs(project_dir)
+
+
+@dataclass(frozen=True)
+class _JobOutcome:
+    """The outcome of a job run in a worker process."""
+
+    result_path: Optional[str]
+    step_timings: List[StepTiming]
+    rows_written: Optional[int]
+    peak_result_size: int
+    cpu_time: float
+
+
+def _claim_job(pid_path: str) -> bool:
+    """Claims a job for the worker process by creating its pid file, unless the parent abandoned the job first.
+
+    The pid is written to a temporary file which is linked to the pid file, so the pid file is created with its content
+    in one step, and creating it fails if the parent already created it to abandon the job.
+    """
+    tmp_path = f"{pid_path}.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(str(os.getpid()))
+    try:
+        os.link(tmp_path, pid_path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+
+
+def _run_job(
+    name: str,
+    inputs: Dict[str, str],
+    result_path: str,
+    pid_path: str,
+    context: Dict[str, object],
+) -> Optional[_JobOutcome]:
+    """Runs a job in a worker process.
+
+    Args:
+        name: The name of the job to run.
+        inputs: Arrow IPC files holding the in-memory results of upstream jobs, by job name.
+        result_path: Where to write the in-memory result of the job, if it has one.
+        pid_path: Where to write the id of the worker process, so the parent can kill it when the job times out.
+        context: The values of the `run_context` in the parent process.
+
+    Returns:
+        The path of the Arrow IPC file with the result of the job, or None if the job has no in-memory result,
+        and the metrics recorded while running the job. None if the parent abandoned the job before it started.
+    """
+    if not _claim_job(pid_path):
+        logger.debug("skipping %s, which was abandoned before it started", name)
+        return None
+
+    for key, value in context.items():
+        setattr(run_context, key, value)
+
+    job = job_registry.jobs[name]
+    upstreams = [job_registry.jobs[upstream_name] for upstream_name in inputs]
+
+    job._reset_metrics()
+    try:
+        for upstream in upstreams:
+            upstream._load_result(inputs[upstream.name])
+
+        cpu_start = time.thread_time()
+        job.run()
+        cpu_time = time.thread_time() - cpu_start
+
+        return _JobOutcome(
+            result_path=result_path if job._export_result(result_path) else None,
+            step_timings=job._step_timings,
+            rows_written=job._rows_written,
+            peak_result_size=job._peak_result_size,
+            cpu_time=cpu_time,
+        )
+    finally:
+        for upstream in upstreams:
+            upstream._clear_result()
+        job._clear_result()
+
+
+class ProcessBackend:
+    """Runs jobs in a pool of worker processes.
+
+    Each worker imports the project once through `JobRegistry.discover_jobs`. Jobs exchange
+    in-memory results with the parent process through Arrow IPC files in a spill directory, and
+    materialized results through their target tables.
+    """
+
+    def __init__(self, processes: int):
+        """Starts the worker processes.
+
+        Args:
+            processes: The number of worker processes.
+        """
+        if not job_registry.discovered_paths:
+            msg = "the process executor requires jobs to be discovered with `job_registry.discover_jobs`"
+            logger.error(msg)
+            raise BluenoUserError(msg)
+
+        self.spill_dir = tempfile.mkdtemp(prefix="blueno-")
+        # Results loaded from the spill directory may outlive the pipeline run.
+        atexit.register(shutil.rmtree, self.spill_dir, ignore_errors=True)
+
+        self._spilled: Dict[str, str] = {}
+        self._spill_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+        ctx = multiprocessing.get_context("spawn")
+        self._log_queue = ctx.Queue()
+        self._log_listener = logging.handlers.QueueListener(self._log_queue, _LogForwarder())
+        self._log_listener.start()
+
+        logger.debug("starting %s worker processes", processes)
+        self._pool = ctx.Pool(
+            processes=processes,
+            initializer=_initialize_worker,
+            initargs=(
+                list(job_registry.discovered_paths),
+                os.getcwd(),
+                self._log_queue,
+                logging.getLogger().getEffectiveLevel(),
+            ),
+        )
+
+    def _spill(self, job: BaseJob) -> Optional[str]:
+        """Writes the in-memory result of a job to the spill directory once."""
+        with self._lock:
+            lock = self._spill_locks.setdefault(job.name, threading.Lock())
+
+        with lock:
+            if job.name in self._spilled:
+                return self._spilled[job.name]
+
+            path = os.path.join(self.spill_dir, f"{job.name}.arrow")
+            if not job._export_result(path):
+                return None
+
+            logger.debug("spilled result of %s %s to %s", job.type, job.name, path)
+            # Let other consumers read the spilled result instead of re-executing it.
+            job._load_result(path)
+            self._spilled[job.name] = path
+            return path
+
+    def run(self, job: BaseJob, timeout: Optional[float] = None) -> float:
+        """Runs a job in a worker process and waits for it to finish.
+
+        The timeout is measured from when a worker process starts the job, so the time the job waits for a free worker
+        doesn't count. A job which is cancelled while it waits is abandoned, so the worker skips it when it gets to it.
+
+        Args:
+            job: The job to run.
+            timeout: The maximum number of seconds the job may run. When the timeout is reached, the worker process is killed.
+
+        Returns:
+            The CPU time of the job in the worker process.
+        """
+        inputs = {}
+        for upstream in job.depends_on:
+            path = self._spill(upstream)
+            if path is not None:
+                inputs[upstream.name] = path
+
+        result_path = os.path.join(self.spill_dir, f"{job.name}.arrow")
+        logger.debug("submitting %s %s to worker process", job.type, job.name)
+        # Each submission has its own pid file, so an abandoned submission can't claim it.
+        pid_path = os.path.join(self.spill_dir, f"{job.name}-{uuid.uuid4().hex}.pid")
+        result = self._pool.apply_async(
+            _run_job, (job.name, inputs, result_path, pid_path, asdict(run_context))
+        )
+        started = None
+        while not result.ready():
+            if started is None and os.path.exists(pid_path):
+                started = time.monotonic()
+
+            if job._cancel_event.is_set():
+                self._stop(job, pid_path)
+                msg = "%s %s was cancelled while running in a worker process"
+                logger.debug(msg, job.type, job.name)
+                raise JobCancelledError(msg % (job.type, job.name))
+
+            if started is not None and timeout is not None:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stop(job, pid_path)
+                    msg = "%s %s did not finish within %s seconds"
+                    logger.error(msg, job.type, job.name, timeout)
+                    raise JobTimeoutError(msg % (job.type, job.name, timeout))
+                result.wait(min(remaining, _POLL_INTERVAL))
+            else:
+                result.wait(_POLL_INTERVAL)
+
+        outcome = result.get()
+
+        job._step_timings = outcome.step_timings
+        job._rows_written = outcome.rows_written
+        job._peak_result_size = outcome.peak_result_size
+
+        if outcome.result_path is not None:
+            job._load_result(outcome.result_path)
+            self._spilled[job.name] = outcome.result_path
+        return outcome.cpu_time
+
+    def _stop(self, job: BaseJob, pid_path: str) -> None:
+        """Stops a job - a job which didn't start yet is abandoned, and the worker process running a started job is killed.
+
+        The pool replaces a killed worker with a new worker.
+        """
+        try:
+            # Creating the pid file first keeps the worker from claiming the job.
+            os.close(os.open(pid_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            logger.warning(
+                "abandoning %s %s, which didn't start in a worker process", job.type, job.name
+            )
+            return
+        except FileExistsError:
+            pass
+
+        with open(pid_path) as f:
+            pid = int(f.read())
+
+        logger.warning("killing worker process %s running %s %s", pid, job.type, job.name)
+        try:
+            psutil.Process(pid).kill()
+        except psutil.NoSuchProcess:
+            pass
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        self._pool.terminate()
+        self._pool.join()
+        self._log_listener.stop()
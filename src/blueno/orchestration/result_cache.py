@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Optional, Union
+
+import polars as pl
+
+from blueno.types import DataFrameType
+from blueno.utils import parse_size
+
+logger = logging.getLogger(__name__)
+
+_CONSTANT_TYPES = (str, bytes, int, float, bool, tuple, frozenset, type(None))
+
+
+class ResultCache:
+    """A persistent cache of the transformed dataframes of blueprints, shared between runs.
+
+    Entries are keyed by a fingerprint of the transform function, the configuration of the
+    blueprint and the versions of its inputs, and are stored as Arrow IPC files in a local
+    directory. When the total size of the entries exceeds `max_size`, the least recently used
+    entries are evicted, except for entries which were returned by `get` or `put` and not released yet.
+
+    Example:
+    ```python notest
+    from blueno import create_pipeline, job_registry
+    from blueno.orchestration.result_cache import ResultCache
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.result_cache = ResultCache(".blueno/cache", max_size="10GB")
+    pipeline.run(concurrency=4)
+    ```
+    """
+
+    def __init__(self, path: str, max_size: Optional[Union[str, int]] = None):
+        """Opens the cache, and creates its directory if it does not exist.
+
+        Args:
+            path: The path of the cache directory.
+            max_size: Optional maximum total size of the entries, e.g. `10GB`.
+        """
+        self.path = path
+        self.max_size = parse_size(max_size) if max_size is not None else None
+        # Entries served by this cache may still be scanned lazily, so they are not evicted until they are released.
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.arrow")
+
+    def _acquire(self, path: str) -> None:
+        with self._lock:
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+
+    def release(self, key: str) -> None:
+        """Releases an entry returned by `get` or `put`, so it can be evicted once nothing else scans it.
+
+        Args:
+            key: The key of the entry.
+        """
+        path = self._entry_path(key)
+        with self._lock:
+            count = self._in_use.get(path, 0) - 1
+            if count > 0:
+                self._in_use[path] = count
+            else:
+                self._in_use.pop(path, None)
+
+    def get(self, key: str) -> Optional[pl.LazyFrame]:
+        """Looks up an entry, and marks it as recently used. The entry is not evicted until it is released.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            The cached dataframe, or None if the key is not cached.
+        """
+        path = self._entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        self._acquire(path)
+        return pl.scan_ipc(path)
+
+    def put(self, key: str, df: DataFrameType) -> pl.LazyFrame:
+        """Stores a dataframe, and evicts the least recently used entries if the cache is full.
+
+        The stored entry is not evicted until it is released. Lazy dataframes are streamed to the cache, and only evaluated once.
+
+        Args:
+            key: The key of the entry.
+            df: The dataframe to store.
+
+        Returns:
+            The stored dataframe, scanned from the cache.
+        """
+        path = self._entry_path(key)
+        # Concurrent writers of the same key each write their own file, and the last one wins.
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if isinstance(df, pl.LazyFrame):
+            df.sink_ipc(tmp_path)
+        else:
+            df.write_ipc(tmp_path)
+        os.replace(tmp_path, path)
+
+        self._acquire(path)
+        self.evict()
+        return pl.scan_ipc(path)
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the entries fit `max_size`."""
+        if self.max_size is None:
+            return
+
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".arrow"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if self._in_use.get(path):
+                continue
+
+            logger.debug("evicting %s bytes from the result cache: %s", size, path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        for entry in os.scandir(self.path):
+            if entry.name.endswith((".arrow", ".tmp")):
+                os.remove(entry.path)
+        with self._lock:
+            self._in_use.clear()
+
+
+def fingerprint(value: Any) -> str:
+    """A SHA-256 fingerprint of a JSON serializable value, where other values are serialized by their `str`."""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def function_fingerprint(fn: Callable) -> str:
+    """A fingerprint of the source of a function, the values of its closure and the constant globals it references.
+
+    Closure values are compared by their `repr`, so closures over objects without a stable `repr` only match within a process.
+    Callables which are not Python functions, e.g. a `functools.partial`, are fingerprinted by their source or `repr` only.
+    """
+    code = getattr(fn, "__code__", None)
+    fn_globals = getattr(fn, "__globals__", {})
+    try:
+        source = inspect.getsource(fn)
+    except (OSError, TypeError):
+        source = code.co_code.hex() if code is not None else repr(fn)
+
+    closure = []
+    for cell in getattr(fn, "__closure__", None) or ():
+        try:
+            closure.append(repr(cell.cell_contents))
+        except ValueError:
+            # The cell is empty, e.g. a variable which is assigned after the function is defined.
+            closure.append(None)
+
+    constants = {
+        name: repr(fn_globals[name])
+        for name in (code.co_names if code is not None else ())
+        if name in fn_globals and isinstance(fn_globals[name], _CONSTANT_TYPES)
+    }
+    return fingerprint([source, closure, constants])
+
+
+def path_fingerprint(path: str) -> Optional[str]:
+    """A fingerprint of the modification times and sizes of a local file, or of the files in a local directory.
+
+    Returns:
+        The fingerprint, or None if the path is a remote URI or does not exist.
+    """
+    if "://" in path and not path.startswith("file://"):
+        return None
+    path = path.removeprefix("file://")
+    if not os.path.exists(path):
+        return None
+
+    if os.path.isfile(path):
+        files = [path]
+    else:
+        files = sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        )
+
+    stats = []
+    for file in files:
+        stat = os.stat(file)
+        stats.append((os.path.relpath(file, path), stat.st_mtime_ns, stat.st_size))
+    return fingerprint(stats)
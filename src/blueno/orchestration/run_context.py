@@ -1,11 +1,14 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
 class RunContext:
     """Global run context. This might be expanded in the future."""
+
     full_refresh: bool = False
     force_refresh: bool = False
+    run_id: Optional[str] = None
 
 
-run_context = RunContext()
\ No newline at end of file
+run_context = RunContext()
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import inspect
 import logging
 from dataclasses import dataclass
-from typing import Dict, Optional
+from datetime import timedelta
+from typing import Dict, Literal, Optional, Union
 
 from typing_extensions import override
 
-from blueno.orchestration.job import BaseJob, job_registry, track_step
+from blueno.orchestration.job import (
+    BaseJob,
+    RetryPolicy,
+    job_registry,
+    run_coroutine,
+    track_step,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +27,24 @@ class Task(BaseJob):
     @track_step
     def run(self):
         """Running the task."""
-        self._fn(*self.depends_on)
+        result = self._fn(*self.depends_on)
+        if inspect.isawaitable(result):
+            run_coroutine(result)
+
+    @override
+    @property
+    def _runs_on_event_loop(self) -> bool:
+        return inspect.iscoroutinefunction(self._fn) and self.executor != "process"
+
+    @override
+    @track_step
+    async def run_async(self) -> None:
+        """Running the task from an event loop. Functions defined with `async def` are awaited on the event loop."""
+        if not inspect.iscoroutinefunction(self._fn):
+            await asyncio.to_thread(self._fn, *self.depends_on)
+            return
+
+        await self._fn(*self.depends_on)
 
     @override
     @classmethod
@@ -28,6 +54,11 @@ class Task(BaseJob):
         name: Optional[str] = None,
         tags: Optional[Dict[str, str]] = None,
         priority: int = 100,
+        executor: Optional[Literal["thread", "process"]] = None,
+        memory_hint: Optional[Union[str, int]] = None,
+        retry: Optional[RetryPolicy] = None,
+        timeout: Optional[timedelta] = None,
+        resources: Optional[Dict[str, int]] = None,
     ):
         """Create a definition for task.
 
@@ -37,6 +68,14 @@ class Task(BaseJob):
             name: The name of the blueprint. If not provided, the name of the function will be used. The name must be unique across all jobs.
             tags: A dictionary of tags to apply to the blueprint. This can be used to group related jobs by tag, and can be used to run a subset of jobs based on tags.
             priority: Determines the execution order among activities ready to run. Higher values indicate higher scheduling preference, but dependencies and concurrency limits are still respected.
+            executor: Optional executor backend to run the task in - `thread` or `process`. Defaults to the executor of the pipeline run.
+            memory_hint: Optional expected peak memory usage of the task, e.g. `512MB`. Used by the pipeline to keep the running jobs within the memory budget of the run.
+            retry: Optional policy to retry the task when it fails with a transient error, e.g. `RetryPolicy(attempts=3)`.
+            timeout: Optional maximum duration of the task, including retries. Defaults to the timeout of the pipeline run.
+                A task running in a worker process is killed. A task running in a thread can't be killed, so it is abandoned and keeps running
+                in the background - use the `process` executor to stop it at the timeout.
+            resources: Optional amounts of named resource pools which the task holds while it runs, e.g. `{"sql_endpoint": 1}`.
+                The pipeline only starts the task when every pool has enough of its capacity left. The capacities of the pools are set with `Pipeline.resource_pools`.
 
         **Simple example**
 
@@ -63,6 +102,11 @@ class Task(BaseJob):
                 tags=tags or {},
                 _fn=func,
                 priority=priority,
+                executor=executor,
+                memory_hint=memory_hint,
+                retry=retry,
+                timeout=timeout,
+                resources=resources or {},
             )
             task._register(job_registry)
             return task
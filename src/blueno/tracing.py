@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("blueno_current_span")
+
+
+@dataclass
+class Span:
+    """A timed operation of a pipeline run.
+
+    Attributes:
+        name: The name of the operation, e.g. the name of a job or a step.
+        category: The kind of operation, e.g. `run`, `activity`, `step` or `delta`.
+        start: When the operation started as a unix timestamp.
+        duration: The elapsed time of the operation in seconds.
+        thread_id: The native id of the thread which ran the operation.
+        span_id: The id of the span, unique within its tracer.
+        parent_id: The id of the enclosing span, if any.
+        attributes: Attributes of the operation, e.g. the job name, rows or Delta version.
+    """
+
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread_id: int
+    span_id: int
+    parent_id: Optional[int]
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CounterSample:
+    """The values of a counter at a point in time, e.g. the number of busy and idle concurrency slots."""
+
+    name: str
+    time: float
+    values: Dict[str, float]
+
+
+class Tracer:
+    """Records the spans of pipeline runs, and exports them as Chrome trace events or OTLP JSON.
+
+    Spans are only recorded while the tracer is activated with `activate`. Spans started in a thread
+    without an enclosing span, like the activities running in worker threads, are children of the
+    open span of category `run`.
+
+    Example:
+    ```python notest
+    from blueno import create_pipeline, job_registry
+    from blueno.tracing import Tracer
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.tracer = Tracer()
+    pipeline.run(concurrency=4)
+    pipeline.tracer.export_chrome("trace.json")
+    ```
+    """
+
+    def __init__(self):
+        """Creates an empty tracer."""
+        self.spans: List[Span] = []
+        self.counters: List[CounterSample] = []
+        self.thread_names: Dict[int, str] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._root_span: Optional[int] = None
+        self._trace_id = os.urandom(16).hex()
+
+    @contextmanager
+    def span(
+        self, name: str, category: str = "operation", **attributes: Any
+    ) -> Iterator[Dict[str, Any]]:
+        """Records the enclosed code as a span.
+
+        Args:
+            name: The name of the operation.
+            category: The kind of operation.
+            **attributes: Attributes of the operation.
+
+        Yields:
+            The attributes of the span, which can be extended while the span is open.
+        """
+        parent_id = _current_span.get(None)
+        with self._lock:
+            span_id = next(self._ids)
+            if parent_id is None:
+                parent_id = self._root_span
+            if category == "run":
+                self._root_span = span_id
+
+        thread = threading.current_thread()
+        thread_id = threading.get_native_id()
+        token = _current_span.set(span_id)
+        start = time.time()
+        wall_start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span = Span(
+                name=name,
+                category=category,
+                start=start,
+                duration=time.perf_counter() - wall_start,
+                thread_id=thread_id,
+                span_id=span_id,
+                parent_id=parent_id,
+                attributes=attributes,
+            )
+            with self._lock:
+                self.spans.append(span)
+                self.thread_names.setdefault(thread_id, thread.name)
+                if span_id == self._root_span:
+                    self._root_span = parent_id
+
+    def counter(self, name: str, **values: float) -> None:
+        """Records the values of a counter at the current time.
+
+        Args:
+            name: The name of the counter.
+            **values: The values of the series of the counter.
+        """
+        with self._lock:
+            self.counters.append(CounterSample(name=name, time=time.time(), values=values))
+
+    def export_chrome(self, path: str) -> None:
+        """Writes the spans and counters in the Chrome Trace Event format, which can be opened in Perfetto or `chrome://tracing`.
+
+        Args:
+            path: The path of the JSON file to write.
+        """
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.thread_names.items()
+        ]
+        events.extend(
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": _jsonable(span.attributes),
+            }
+            for span in self.spans
+        )
+        events.extend(
+            {
+                "name": sample.name,
+                "ph": "C",
+                "ts": sample.time * 1e6,
+                "pid": pid,
+                "args": sample.values,
+            }
+            for sample in self.counters
+        )
+
+        logger.debug("writing %s trace events to %s", len(events), path)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_otlp(self, path: str) -> None:
+        """Writes the spans in the OTLP JSON file format of OpenTelemetry, which can be imported by OpenTelemetry collectors.
+
+        Args:
+            path: The path of the JSON file to write.
+        """
+        spans = [
+            {
+                "traceId": self._trace_id,
+                "spanId": f"{span.span_id:016x}",
+                "parentSpanId": f"{span.parent_id:016x}" if span.parent_id is not None else "",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(span.start * 1e9)),
+                "endTimeUnixNano": str(int((span.start + span.duration) * 1e9)),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in {
+                        "blueno.category": span.category,
+                        "thread.id": span.thread_id,
+                        "thread.name": self.thread_names.get(span.thread_id, ""),
+                        **span.attributes,
+                    }.items()
+                ],
+                "status": {"code": 2 if "error" in span.attributes else 1},
+            }
+            for span in self.spans
+        ]
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [{"key": "service.name", "value": {"stringValue": "blueno"}}]
+                    },
+                    "scopeSpans": [{"scope": {"name": "blueno"}, "spans": spans}],
+                }
+            ]
+        }
+
+        logger.debug("writing %s spans to %s", len(spans), path)
+        with open(path, "w") as f:
+            json.dump(request, f)
+            f.write("\n")
+
+
+def _jsonable(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        for key, value in attributes.items()
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_active_tracer: Optional[Tracer] = None
+
+
+def activate(tracer: Optional[Tracer]) -> None:
+    """Sets the tracer which records the spans of the current process, or stops tracing if None."""
+    global _active_tracer
+    _active_tracer = tracer
+
+
+def trace_span(
+    name: str, category: str = "operation", **attributes: Any
+) -> ContextManager[Dict[str, Any]]:
+    """Records the enclosed code as a span of the active tracer, if any.
+
+    Args:
+        name: The name of the operation.
+        category: The kind of operation.
+        **attributes: Attributes of the operation.
+
+    Returns:
+        A context manager yielding the attributes of the span, which can be extended while the span is open.
+
+    Example:
+    ```python notest
+    from blueno.tracing import trace_span
+
+    with trace_span("collect", "polars") as span:
+        df = lf.collect()
+        span["rows"] = df.height
+    ```
+    """
+    tracer = _active_tracer
+    if tracer is None:
+        return nullcontext(attributes)
+    return tracer.span(name, category, **attributes)
+
+
+def trace_counter(name: str, **values: float) -> None:
+    """Records the values of a counter in the active tracer, if any."""
+    tracer = _active_tracer
+    if tracer is not None:
+        tracer.counter(name, **values)
@@ -1,6 +1,12 @@
 """Collection of utility functions."""
 
-from blueno.utils.misc import quote_identifier, remove_none, separator_indices, shorten_dict_values
+from blueno.utils.misc import (
+    parse_size,
+    quote_identifier,
+    remove_none,
+    separator_indices,
+    shorten_dict_values,
+)
 
 from .delta import (
     create_or_alter_delta_table,
@@ -11,9 +17,12 @@ from .delta import (
     get_max_column_value,
     get_min_column_value,
     get_or_create_delta_table,
+    get_rows_written,
 )
 from .merge_helpers import (
     build_merge_predicate,
+    build_merge_pruning_predicate,
+    build_when_matched_row_hash_predicate,
     build_when_matched_update_columns,
     build_when_matched_update_predicate,
 )
@@ -34,9 +43,13 @@ __all__ = (
     "quote_identifier",
     "remove_none",
     "shorten_dict_values",
+    "parse_size",
     "build_merge_predicate",
+    "build_merge_pruning_predicate",
     "build_when_matched_update_predicate",
+    "build_when_matched_row_hash_predicate",
     "build_when_matched_update_columns",
     "get_min_column_value",
     "get_max_column_value",
+    "get_rows_written",
 )
@@ -6,6 +6,7 @@ from deltalake import DeltaTable, write_deltalake
 from deltalake.exceptions import TableNotFoundError
 
 from blueno.auth import get_storage_options
+from blueno.tracing import trace_span
 
 
 def get_or_create_delta_table(table_uri: str, schema: pl.Schema) -> DeltaTable:
@@ -20,10 +21,12 @@ def get_or_create_delta_table(table_uri: str, schema: pl.Schema) -> DeltaTable:
     """
     storage_options = get_storage_options(table_uri)
 
-    try:
-        dt = DeltaTable(table_uri, storage_options=storage_options)
-    except TableNotFoundError:
-        dt = DeltaTable.create(table_uri, schema, storage_options=storage_options)
+    with trace_span("delta open", "delta", table_uri=table_uri) as span:
+        try:
+            dt = DeltaTable(table_uri, storage_options=storage_options)
+        except TableNotFoundError:
+            dt = DeltaTable.create(table_uri, schema, storage_options=storage_options)
+        span["version"] = dt.version()
 
     return dt
 
@@ -64,11 +67,13 @@ def create_or_alter_delta_table(table_or_uri: str | DeltaTable, schema: pl.Schem
     if isinstance(table_or_uri, DeltaTable):
         dt = table_or_uri
     else:
-        try:
-            dt = DeltaTable(table_or_uri, storage_options=storage_options)
-        except TableNotFoundError:
-            dt = DeltaTable.create(table_or_uri, schema, storage_options=storage_options)
-            return dt
+        with trace_span("delta open", "delta", table_uri=table_or_uri) as span:
+            try:
+                dt = DeltaTable(table_or_uri, storage_options=storage_options)
+            except TableNotFoundError:
+                dt = DeltaTable.create(table_or_uri, schema, storage_options=storage_options)
+                return dt
+            span["version"] = dt.version()
 
     table_schema = pl.Schema(dt.schema())
     if schema_equals(schema, table_schema, True):
@@ -91,10 +96,12 @@ def get_delta_table_if_exists(table_uri: str) -> DeltaTable | None:
     """
     storage_options = get_storage_options(table_uri)
 
-    try:
-        dt = DeltaTable(table_uri, storage_options=storage_options)
-    except TableNotFoundError:
-        return None
+    with trace_span("delta open", "delta", table_uri=table_uri) as span:
+        try:
+            dt = DeltaTable(table_uri, storage_options=storage_options)
+        except TableNotFoundError:
+            return None
+        span["version"] = dt.version()
 
     return dt
 
@@ -162,7 +169,8 @@ def get_last_modified_time(
     else:
         dt = table_or_uri
 
-    metadata = dt.history(limit=limit)
+    with trace_span("delta history", "delta", table_uri=dt.table_uri, limit=limit):
+        metadata = dt.history(limit=limit)
     timestamp = next(
         (commit.get("timestamp") for commit in metadata if commit.get("operation") in operations),
         None,
@@ -204,7 +212,8 @@ def get_last_commit_property(
     else:
         dt = table_or_uri
 
-    metadata = dt.history(limit=limit)
+    with trace_span("delta history", "delta", table_uri=dt.table_uri, limit=limit):
+        metadata = dt.history(limit=limit)
     value = next(
         (
             commit.get(commit_info_key)
@@ -217,6 +226,48 @@ def get_last_commit_property(
     return value
 
 
+def get_rows_written(table_or_uri: str | DeltaTable, since_version: int = -1) -> int | None:
+    """Counts the rows written to a Delta table by the commits after a version, from the operation metrics of the commits.
+
+    Merges count the inserted and updated rows, and other operations count the added rows.
+
+    Args:
+        table_or_uri: A string URI to a Delta table, or a delta table object.
+        since_version: The version before the commits to count. Defaults to counting all commits.
+
+    Returns:
+        The number of rows written, or None if the table doesn't exist.
+
+    Example:
+    ```python notest
+    from blueno.utils import get_rows_written
+
+    rows_written = get_rows_written("path/to/delta_table", since_version=10)
+    ```
+    """
+    if isinstance(table_or_uri, str):
+        dt = get_delta_table_if_exists(table_or_uri)
+        if not dt:
+            return None
+    else:
+        dt = table_or_uri
+
+    limit = dt.version() - since_version
+    with trace_span("delta history", "delta", table_uri=dt.table_uri, limit=limit):
+        commits = dt.history(limit=limit)
+
+    rows_written = 0
+    for commit in commits:
+        metrics = commit.get("operationMetrics") or {}
+        if "num_added_rows" in metrics:
+            rows_written += int(metrics["num_added_rows"])
+        else:
+            rows_written += int(metrics.get("num_target_rows_inserted", 0))
+            rows_written += int(metrics.get("num_target_rows_updated", 0))
+
+    return rows_written
+
+
 def get_max_column_value(table_or_uri: str | DeltaTable, column_name: str) -> Any:
     """Retrieves the maximum value of the specified column from a Delta table.
 
@@ -1,5 +1,10 @@
 """A collection of string builder functions for merging."""
 
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
 from blueno.utils import quote_identifier
 
 
@@ -101,6 +106,106 @@ def build_when_matched_update_predicate(
     return when_matched_update_predicate
 
 
+def build_when_matched_row_hash_predicate(
+    row_hash_column: str, source_alias: str = "source", target_alias: str = "target"
+) -> str:
+    """Constructs a SQL predicate for when matched update conditions, which compares row hashes.
+
+    This function generates a string that represents the condition for updating
+    records whose hash differs, or whose target row was written without a hash.
+
+    Args:
+        row_hash_column: The name of the column holding the hash of the compared columns.
+        source_alias: An alias for the source
+        target_alias: An alias for the target
+
+    Returns:
+        A SQL string representing the when matched update predicate.
+
+    Example:
+    ```python
+    from blueno.utils import build_when_matched_row_hash_predicate
+
+    update_predicate = build_when_matched_row_hash_predicate("__row_hash")
+    print(update_predicate)
+    \"\"\"
+        (target."__row_hash" IS NULL) OR (target."__row_hash" != source."__row_hash")
+    \"\"\"
+    ```
+    """
+    column = quote_identifier(row_hash_column)
+    return (
+        f"({target_alias}.{column} IS NULL) OR ({target_alias}.{column} != {source_alias}.{column})"
+    )
+
+
+def build_merge_pruning_predicate(
+    ranges: dict[str, tuple[Any, Any]],
+    values: dict[str, list[Any]] | None = None,
+    target_alias: str = "target",
+) -> str:
+    """Constructs a SQL predicate which restricts the target of a merge to the ranges and values of the source.
+
+    This function generates a string that can be appended to a merge predicate, so
+    the files of the target whose statistics or partition values are outside the
+    source are skipped.
+
+    Args:
+        ranges: A mapping of column names to the minimum and maximum value in the source.
+            Columns with a missing bound are skipped.
+        values: A mapping of column names to the distinct values in the source.
+            If the values contain None, target records where the column is NULL are included.
+        target_alias: An alias for the target
+
+    Returns:
+        A SQL string representing the pruning predicate, or an empty string if there is nothing to prune on.
+
+    Example:
+    ```python
+    from blueno.utils import build_merge_pruning_predicate
+
+    pruning_predicate = build_merge_pruning_predicate({"id": (1, 100)}, {"region": ["EU", "US"]})
+    print(pruning_predicate)
+    \"\"\"
+        (target."id" >= 1 AND target."id" <= 100) AND (target."region" IN ('EU', 'US'))
+    \"\"\"
+    ```
+    """
+    conjuncts = [
+        f"({target_alias}.{quote_identifier(column)} >= {_format_literal(minimum)}"
+        f" AND {target_alias}.{quote_identifier(column)} <= {_format_literal(maximum)})"
+        for column, (minimum, maximum) in ranges.items()
+        if minimum is not None and maximum is not None
+    ]
+
+    for column, column_values in (values or {}).items():
+        column_name = f"{target_alias}.{quote_identifier(column)}"
+        literals = [_format_literal(value) for value in column_values if value is not None]
+        conditions = [f"{column_name} IN ({', '.join(literals)})"] if literals else []
+        if len(literals) < len(column_values):
+            conditions.append(f"{column_name} IS NULL")
+        if conditions:
+            conjuncts.append(f"({' OR '.join(conditions)})")
+
+    return " AND ".join(conjuncts)
+
+
+def _format_literal(value: Any) -> str:
+    """Formats a value as a SQL literal of its type, so it is compared with the column without casting the column.
+
+    Numbers are unquoted, and dates and datetimes are typed `DATE` and `TIMESTAMP` literals. Other values are quoted as strings.
+    """
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, Decimal)) or (isinstance(value, float) and math.isfinite(value)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
 def build_when_matched_update_columns(
     columns: list[str], source_alias: str = "source", target_alias: str = "target"
 ) -> dict[str, str]:
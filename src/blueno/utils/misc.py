@@ -96,3 +96,46 @@ def shorten_dict_values(obj: Union[List, Dict], max_length: int = 20) -> Union[L
         return obj[:max_length] + "... (truncated)" if len(obj) > max_length else obj
     else:
         return obj
+
+
+def parse_size(size: Union[str, int]) -> int:
+    """Parses a human readable size into a number of bytes.
+
+    Units are powers of 1024, i.e. `1KB` is 1024 bytes. Integers are returned as is.
+
+    Args:
+        size: The size to parse, e.g. `512MB`, `48GB` or `1.5 TB`.
+
+    Returns:
+        The number of bytes.
+
+    Example:
+    ```python
+    from blueno.utils import parse_size
+
+    parse_size("48GB")
+    51539607552
+
+    parse_size("512 mb")
+    536870912
+    ```
+    """
+    if isinstance(size, int):
+        return size
+
+    units = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+    value = size.strip().upper()
+    for unit in sorted(units, key=len, reverse=True):
+        if value.endswith(unit):
+            number = value[: -len(unit)].strip()
+            break
+    else:
+        unit, number = "B", value
+
+    try:
+        return int(float(number) * units[unit])
+    except ValueError:
+        raise ValueError(
+            f"invalid size `{size}` - expected a number followed by one of {list(units)}"
+        )
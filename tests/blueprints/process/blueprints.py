@@ -0,0 +1,38 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+import polars as pl
+
+from blueno import Blueprint, DataFrameType, Task
+
+tmp_dir = f"{tempfile.gettempdir()}/blueno/blueno-process-test"
+
+
+@Blueprint.register(format="dataframe")
+def process_landing() -> DataFrameType:
+    return pl.DataFrame({"id": [1, 2, 3], "value": ["a", "b", "c"]})
+
+
+@Blueprint.register(format="dataframe", executor="process")
+def process_parsed(process_landing: DataFrameType) -> DataFrameType:
+    return process_landing.with_columns(
+        pl.col("value").map_elements(str.upper, return_dtype=pl.String),
+        pl.lit(os.getpid()).alias("pid"),
+    )
+
+
+@Blueprint.register(table_uri=f"{tmp_dir}/process_table", format="delta")
+def process_table(process_parsed: DataFrameType) -> DataFrameType:
+    return process_parsed
+
+
+@Task.register(executor="process")
+def process_failing(process_table) -> None:
+    raise ValueError("failed in worker")
+
+
+@Task.register(executor="process", timeout=timedelta(seconds=2))
+def process_hanging() -> None:
+    time.sleep(60)
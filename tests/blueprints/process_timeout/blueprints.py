@@ -0,0 +1,14 @@
+import time
+from datetime import timedelta
+
+from blueno import Task
+
+
+@Task.register(executor="process", priority=2, timeout=timedelta(seconds=1))
+def process_hanging_first() -> None:
+    time.sleep(60)
+
+
+@Task.register(executor="process", priority=1, timeout=timedelta(seconds=0.5))
+def process_waits_for_worker() -> None:
+    time.sleep(0.1)
@@ -5,6 +5,7 @@ from blueno import (
     Blueprint,
     create_pipeline,
     job_registry,
+    run_context,
 )
 from blueno.exceptions import (
     BluenoUserError,
@@ -12,6 +13,7 @@ from blueno.exceptions import (
     InvalidJobError,
     JobNotFoundError,
 )
+from blueno.tracing import Tracer, activate
 
 
 @pytest.fixture(autouse=True)
@@ -224,3 +226,168 @@ def test_circular_dependencies_raises():
     with pytest.raises(BluenoUserError, match="Cycle detected"):
         pipeline = create_pipeline(job_registry.jobs.values())
         pipeline.run()
+
+
+@pytest.mark.parametrize("write_mode", ["upsert", "safe_append"])
+def test_blueprint_evaluates_transformation_once_per_write(tmp_path, write_mode):
+    evaluations = []
+
+    def count(series: pl.Series) -> pl.Series:
+        evaluations.append(1)
+        return series
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "target"),
+        format="delta",
+        write_mode=write_mode,
+        primary_keys=["id"],
+        incremental_column="version",
+    )
+    def target() -> pl.LazyFrame:
+        return pl.LazyFrame({"id": [1, 2, 3], "version": [1, 1, 1]}).with_columns(
+            pl.col("id").map_batches(count, return_dtype=pl.Int64)
+        )
+
+    target.run()
+    target.run()
+
+    assert len(evaluations) == 2
+    assert pl.read_delta(str(tmp_path / "target"))["id"].sort().to_list() == [1, 2, 3]
+
+
+def test_blueprint_row_hash_only_updates_changed_rows(tmp_path):
+    names = ["Alice", "Bob"]
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "target"),
+        format="delta",
+        write_mode="upsert",
+        primary_keys=["id"],
+        post_transforms=["add_audit_columns"],
+        row_hash=True,
+    )
+    def target() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2], "name": names})
+
+    target.run()
+    first = pl.read_delta(str(tmp_path / "target")).sort("id")
+    names[1] = "Robert"
+    target.run()
+    second = pl.read_delta(str(tmp_path / "target")).sort("id")
+
+    assert second["name"].to_list() == ["Alice", "Robert"]
+    assert second["__updated_at"][0] == first["__updated_at"][0]
+    assert second["__updated_at"][1] > first["__updated_at"][1]
+    assert second["__row_hash"][0] == first["__row_hash"][0]
+
+    with pytest.raises(BluenoUserError, match="row_hash"):
+
+        @Blueprint.register(table_uri=str(tmp_path / "other"), format="delta", row_hash=True)
+        def other() -> pl.DataFrame:
+            return pl.DataFrame({"id": [1]})
+
+
+def test_blueprint_merge_prune_columns_skips_files_outside_source(tmp_path):
+    days = []
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "target"),
+        format="delta",
+        write_mode="upsert",
+        primary_keys=["id"],
+        merge_prune_columns=["day"],
+    )
+    def target() -> pl.DataFrame:
+        return pl.DataFrame({"id": [day * 10 for day in days], "day": days})
+
+    for day in [1, 2, 3]:
+        days[:] = [day]
+        target.run()
+
+    tracer = Tracer()
+    activate(tracer)
+    try:
+        target.run()
+    finally:
+        activate(None)
+
+    (merge,) = [span for span in tracer.spans if span.name == "merge"]
+    assert merge.attributes["files_scanned"] == 1
+    assert merge.attributes["files_skipped"] == 2
+    assert pl.read_delta(str(tmp_path / "target")).sort("id")["id"].to_list() == [10, 20, 30]
+
+    with pytest.raises(BluenoUserError, match="merge_prune_columns"):
+
+        @Blueprint.register(
+            table_uri=str(tmp_path / "other"), format="delta", merge_prune_columns=["day"]
+        )
+        def other() -> pl.DataFrame:
+            return pl.DataFrame({"id": [1], "day": [1]})
+
+
+def test_blueprint_safe_append_with_key_index_only_appends_new_records(tmp_path, monkeypatch):
+    # Appends are skipped when they were already committed in the current pipeline run.
+    monkeypatch.setattr(run_context, "run_id", None)
+    ids = [1, 2]
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "target"),
+        format="delta",
+        write_mode="safe_append",
+        primary_keys=["id"],
+        incremental_column="version",
+        key_index=True,
+    )
+    def target() -> pl.DataFrame:
+        return pl.DataFrame({"id": ids, "version": [1] * len(ids)})
+
+    target.run()
+    ids[:] = [2, 3]
+    target.run()
+    ids[:] = [3, 4]
+    target.run()
+
+    assert pl.read_delta(str(tmp_path / "target")).sort("id")["id"].to_list() == [1, 2, 3, 4]
+    assert pl.read_parquet(str(tmp_path / "target" / "_blueno" / "key_index.parquet")).height == 4
+
+    with pytest.raises(BluenoUserError, match="key_index"):
+
+        @Blueprint.register(table_uri=str(tmp_path / "other"), format="delta", key_index=True)
+        def other() -> pl.DataFrame:
+            return pl.DataFrame({"id": [1]})
+
+
+@pytest.mark.parametrize("write_mode", ["upsert", "append", "overwrite"])
+def test_blueprint_streams_spilled_result_into_write(tmp_path, monkeypatch, write_mode):
+    # Results of unknown size are spilled once they exceed the spill size.
+    monkeypatch.setattr("blueno.orchestration.blueprint._DEFAULT_SPILL_SIZE", 0)
+    monkeypatch.setattr(run_context, "run_id", None)
+    values = [0, 0, 0]
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "target"),
+        format="delta",
+        write_mode=write_mode,
+        primary_keys=["id"],
+    )
+    def target() -> pl.LazyFrame:
+        return pl.LazyFrame({"id": [1, 2, 3], "value": values})
+
+    target.run()
+    values[:] = [1, 1, 1]
+
+    tracer = Tracer()
+    activate(tracer)
+    try:
+        target.run()
+    finally:
+        activate(None)
+
+    (collect,) = [span for span in tracer.spans if span.name == "collect"]
+    assert collect.attributes["spilled_files"] >= 1
+    writes = [span for span in tracer.spans if span.name in ("write_deltalake", "merge")]
+    assert writes and all(span.attributes.get("bytes") is None for span in writes)
+    assert target._dataframe is None
+
+    expected = [1, 1, 1] if write_mode != "append" else [0, 0, 0, 1, 1, 1]
+    assert pl.read_delta(str(tmp_path / "target")).sort("value")["value"].to_list() == expected
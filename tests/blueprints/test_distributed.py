@@ -0,0 +1,197 @@
+import os
+import threading
+from datetime import timedelta
+
+import polars as pl
+import pytest
+
+from blueno import Blueprint, Task, create_pipeline, job_registry, run_context
+from blueno.exceptions import JobTimeoutError
+from blueno.orchestration.distributed import WorkQueue, Worker
+from blueno.orchestration.pipeline import ActivityStatus
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    job_registry.jobs.clear()
+    yield
+    job_registry.jobs.clear()
+
+
+def test_distributed_run_hands_over_results_between_workers(tmp_path):
+    @Blueprint.register(format="dataframe")
+    def source() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(table_uri=str(tmp_path / "target"), format="delta", write_mode="overwrite")
+    def target(self: Blueprint, source: pl.LazyFrame) -> pl.LazyFrame:
+        return source.with_columns(pl.col("id") * 2)
+
+    @Task.register()
+    def report(target) -> None:
+        pass
+
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    workers = [
+        threading.Thread(
+            target=Worker(queue, poll_interval=0.05).run, kwargs={"max_idle": timedelta(seconds=1)}
+        )
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run_distributed(queue, poll_interval=0.05)
+
+    for worker in workers:
+        worker.join()
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    assert pl.read_delta(str(tmp_path / "target"))["id"].sort().to_list() == [2, 4, 6]
+    assert {item.status for item in queue.items(pipeline.run_id)} == {"completed"}
+
+
+def test_distributed_run_removes_handed_over_results(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    handed_over = []
+
+    @Blueprint.register(format="dataframe")
+    def source() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Task.register()
+    def check(source) -> None:
+        handed_over.extend(os.listdir(queue.result_dir(run_context.run_id)))
+
+    worker = threading.Thread(
+        target=Worker(queue, poll_interval=0.05).run, kwargs={"max_idle": timedelta(seconds=1)}
+    )
+    worker.start()
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run_distributed(queue, poll_interval=0.05)
+    worker.join()
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    assert handed_over == ["source.arrow"]
+    assert not os.path.exists(queue.result_dir(pipeline.run_id))
+
+
+def test_distributed_run_fails_activities_of_failed_workers(tmp_path):
+    @Task.register()
+    def broken() -> None:
+        raise ValueError("broken")
+
+    @Task.register()
+    def downstream(broken) -> None:
+        pass
+
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    worker = threading.Thread(
+        target=Worker(queue, poll_interval=0.05).run, kwargs={"max_idle": timedelta(seconds=1)}
+    )
+    worker.start()
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run_distributed(queue, poll_interval=0.05)
+    worker.join()
+
+    assert pipeline.activities[0].status is ActivityStatus.FAILED
+    assert "broken" in str(pipeline.failed_jobs["broken"])
+    assert pipeline.activities[1].status is ActivityStatus.CANCELLED
+
+
+def test_work_queue_reclaims_expired_leases(tmp_path):
+    @Task.register()
+    def leased() -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    queue.publish("run", pipeline.activities[0], context={})
+
+    first = queue.claim("first", lease=timedelta(seconds=0))
+    assert first is not None and first.attempts == 1
+
+    second = queue.claim("second", lease=timedelta(seconds=0))
+    assert second is not None and second.worker == "second" and second.attempts == 2
+    assert not queue.renew(first, "first", lease=timedelta(seconds=60))
+
+    assert queue.claim("third", lease=timedelta(seconds=60)) is None
+    assert queue.items("run")[0].status == "failed"
+
+
+def test_worker_restores_run_context_after_item(tmp_path):
+    from blueno import run_context
+
+    contexts = []
+
+    @Task.register()
+    def record() -> None:
+        contexts.append((run_context.run_id, run_context.full_refresh))
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.publish("run", pipeline.activities[0], context={"run_id": "run", "full_refresh": True})
+
+    previous = (run_context.run_id, run_context.full_refresh)
+    worker = Worker(queue)
+    worker.run_item(queue.claim(worker.worker_id, lease=timedelta(seconds=60)))
+
+    assert contexts == [("run", True)]
+    assert (run_context.run_id, run_context.full_refresh) == previous
+    assert queue.items("run")[0].status == "completed"
+
+
+def test_sharded_run_waits_on_commits_of_other_shards(tmp_path):
+    @Blueprint.register(
+        table_uri=str(tmp_path / "upstream"), format="delta", write_mode="overwrite"
+    )
+    def upstream() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "downstream"), format="delta", write_mode="overwrite"
+    )
+    def downstream(self: Blueprint, upstream: pl.LazyFrame) -> pl.LazyFrame:
+        return upstream
+
+    first = create_pipeline(list(job_registry.jobs.values()))
+    first.shard(1, 2)
+    second = create_pipeline(list(job_registry.jobs.values()))
+    second.shard(2, 2)
+    second.remote_poll_interval = 0.05
+
+    assert [a.shard for a in first.activities] == [1, 2]
+    assert first.activities[1].status is ActivityStatus.SKIPPED
+
+    # Shards of another run never see the upstream commit.
+    second.run(run_id="other", timeout=timedelta(seconds=0.2))
+    assert isinstance(second.failed_jobs["upstream"], JobTimeoutError)
+    assert second.activities[1].status is ActivityStatus.CANCELLED
+
+    first.run(run_id="run")
+    second = create_pipeline(list(job_registry.jobs.values()))
+    second.shard(2, 2)
+    second.run(run_id="run")
+
+    assert second.activities[0].status is ActivityStatus.COMPLETED
+    assert second.activities[1].status is ActivityStatus.COMPLETED
+    assert pl.read_delta(str(tmp_path / "downstream")).height == 3
+
+
+def test_shards_keep_tasks_with_their_dependents():
+    @Task.register()
+    def first() -> None:
+        pass
+
+    @Task.register()
+    def second(first) -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.shard(2, 2)
+
+    assert [a.shard for a in pipeline.activities] == [1, 1]
+    assert all(a.status is ActivityStatus.SKIPPED for a in pipeline.activities)
@@ -0,0 +1,1276 @@
+import os
+import time
+
+import pytest
+
+from blueno import Task, create_pipeline, job_registry
+from blueno.exceptions import JobTimeoutError
+from blueno.orchestration.pipeline import ActivityStatus
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    job_registry.jobs.clear()
+    yield
+    job_registry.jobs.clear()
+
+
+def test_pipeline_runs_dependents_after_upstream():
+    order = []
+
+    @Task.register()
+    def first() -> None:
+        order.append("first")
+
+    @Task.register()
+    def second(first) -> None:
+        order.append("second")
+
+    @Task.register()
+    def third(second) -> None:
+        order.append("third")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=4)
+
+    assert order == ["first", "second", "third"]
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+
+
+def test_pipeline_failure_cancels_all_descendants():
+    @Task.register()
+    def failing() -> None:
+        raise ValueError("boom")
+
+    @Task.register()
+    def child(failing) -> None:
+        pass
+
+    @Task.register()
+    def grandchild(child) -> None:
+        pass
+
+    @Task.register()
+    def unrelated() -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=2)
+
+    statuses = {a.job.name: a.status for a in pipeline.activities}
+    assert statuses == {
+        "failing": ActivityStatus.FAILED,
+        "child": ActivityStatus.CANCELLED,
+        "grandchild": ActivityStatus.CANCELLED,
+        "unrelated": ActivityStatus.COMPLETED,
+    }
+    assert isinstance(pipeline.failed_jobs["failing"], ValueError)
+
+
+def test_pipeline_dispatches_dependents_without_polling_delay():
+    for i in range(50):
+        Task(
+            name=f"task_{i}", tags={}, priority=100, _fn=lambda *args: None, _depends_on=[]
+        )._register(job_registry)
+
+    jobs = list(job_registry.jobs.values())
+    for previous, job in zip(jobs, jobs[1:]):
+        job._depends_on = [previous]
+
+    pipeline = create_pipeline(jobs)
+
+    start = time.perf_counter()
+    pipeline.run(concurrency=1)
+
+    # A 50 activity long chain of no-ops would take at least 5 seconds with 100 ms polling.
+    assert time.perf_counter() - start < 2.5
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+
+
+def test_pipeline_activities_are_indexed_by_position():
+    @Task.register()
+    def upstream() -> None:
+        pass
+
+    @Task.register()
+    def downstream(upstream) -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+
+    for i, activity in enumerate(pipeline.activities):
+        assert activity.id == i
+
+    by_name = {a.job.name: a for a in pipeline.activities}
+    assert by_name["upstream"].dependents == [by_name["downstream"].id]
+    assert by_name["downstream"].upstreams == [by_name["upstream"].id]
+
+
+def test_pipeline_dispatches_ready_activities_by_priority():
+    order = []
+
+    @Task.register(priority=1)
+    def low() -> None:
+        order.append("low")
+
+    @Task.register(priority=200)
+    def high() -> None:
+        order.append("high")
+
+    @Task.register()
+    def medium() -> None:
+        order.append("medium")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=1)
+
+    assert order == ["high", "medium", "low"]
+
+
+def test_pipeline_process_executor():
+    import os
+    import shutil
+
+    from blueno.etl import read_delta
+
+    job_registry.discover_jobs("tests/blueprints/process")
+    shutil.rmtree(job_registry.jobs["process_table"].table_uri, ignore_errors=True)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=2)
+
+    statuses = {a.job.name: a.status for a in pipeline.activities}
+    assert statuses == {
+        "process_landing": ActivityStatus.COMPLETED,
+        "process_parsed": ActivityStatus.COMPLETED,
+        "process_table": ActivityStatus.COMPLETED,
+        "process_failing": ActivityStatus.FAILED,
+        "process_hanging": ActivityStatus.FAILED,
+    }
+    assert isinstance(pipeline.failed_jobs["process_failing"], ValueError)
+    assert isinstance(pipeline.failed_jobs["process_hanging"], JobTimeoutError)
+
+    df = read_delta(job_registry.jobs["process_table"].table_uri).collect().sort("id")
+    assert df["value"].to_list() == ["A", "B", "C"]
+    assert os.getpid() not in df["pid"].to_list()
+
+
+def test_pipeline_process_timeout_counts_from_job_start():
+    job_registry.discover_jobs("tests/blueprints/process_timeout")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=1)
+
+    # The second task waits for the worker which replaces the killed one, which takes longer than its timeout.
+    statuses = {a.job.name: a.status for a in pipeline.activities}
+    assert statuses == {
+        "process_hanging_first": ActivityStatus.FAILED,
+        "process_waits_for_worker": ActivityStatus.COMPLETED,
+    }
+
+
+def test_pipeline_memory_budget_defers_activities():
+    import threading
+
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def track() -> None:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    @Task.register(memory_hint="1GB")
+    def big_first() -> None:
+        track()
+
+    @Task.register(memory_hint="1GB")
+    def big_second() -> None:
+        track()
+
+    @Task.register(memory_hint="1GB")
+    def big_third() -> None:
+        track()
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=3, memory_budget="2GB")
+
+    assert max_running == 2
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+
+
+def test_pipeline_records_run_history(tmp_path):
+    from blueno.orchestration.history import RunHistory
+
+    @Task.register()
+    def recorded() -> None:
+        pass
+
+    @Task.register()
+    def recorded_failing(recorded) -> None:
+        raise ValueError("boom")
+
+    history = RunHistory(str(tmp_path / "history.db"))
+    for _ in range(2):
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.history = history
+        pipeline.run()
+
+    statistics = history.job_statistics()
+    assert set(statistics) == {"recorded", "recorded_failing"}
+    assert statistics["recorded"].runs == 2
+    assert statistics["recorded_failing"].duration == 0.0
+
+
+def _record_durations(history, durations):
+    from blueno.orchestration.pipeline import PipelineActivity
+
+    history.record_run(
+        "recorded",
+        [
+            PipelineActivity(
+                job_registry.jobs[name],
+                start=time.time(),
+                duration=duration,
+                status=ActivityStatus.COMPLETED,
+            )
+            for name, duration in durations.items()
+        ],
+    )
+
+
+def test_pipeline_dispatches_critical_path_first(tmp_path):
+    from blueno.orchestration.history import RunHistory
+
+    order = []
+
+    @Task.register()
+    def short_1() -> None:
+        order.append("short_1")
+
+    @Task.register()
+    def short_2(short_1) -> None:
+        order.append("short_2")
+
+    @Task.register()
+    def short_3(short_2) -> None:
+        order.append("short_3")
+
+    @Task.register()
+    def long() -> None:
+        order.append("long")
+
+    # Without history the longest chain goes first.
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=1)
+    assert order[0] == "short_1"
+
+    history = RunHistory(str(tmp_path / "history.db"))
+    _record_durations(history, {"short_1": 1, "short_2": 1, "short_3": 1, "long": 10})
+
+    order.clear()
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.history = history
+    pipeline.run(concurrency=1)
+    assert order == ["long", "short_1", "short_2", "short_3"]
+
+
+def test_pipeline_simulate_predicts_makespan():
+    @Task.register()
+    def extract() -> None:
+        pass
+
+    @Task.register()
+    def transform_a(extract) -> None:
+        pass
+
+    @Task.register()
+    def transform_b(extract) -> None:
+        pass
+
+    @Task.register()
+    def load(transform_a, transform_b) -> None:
+        pass
+
+    durations = {"extract": 1.0, "transform_a": 5.0, "transform_b": 3.0, "load": 2.0}
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+
+    assert pipeline.simulate(concurrency=1, durations=durations) == 11.0
+    assert pipeline.simulate(concurrency=2, durations=durations) == 8.0
+    assert all(a.status is ActivityStatus.PENDING for a in pipeline.activities)
+
+
+def test_pipeline_records_steps_and_rows_written(tmp_path):
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.orchestration.history import RunHistory
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "history_table"), format="delta", write_mode="append"
+    )
+    def history_table() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    history = RunHistory(str(tmp_path / "history.db"))
+    for _ in range(2):
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.history = history
+        pipeline.run()
+
+    records = history.activities(job_name="history_table")
+    assert len(records) == 2
+    assert all(record.rows_written == 3 for record in records)
+
+    steps = [step.name for step in records[0].steps]
+    for step in ("needs_refresh", "read_sources", "transform", "write", "maintain", "run"):
+        assert step in steps
+    assert all(step.wall_time >= 0 and step.cpu_time >= 0 for step in records[0].steps)
+
+
+def test_pipeline_attributes_resource_usage_to_activities():
+    import polars as pl
+
+    from blueno import Blueprint
+
+    @Blueprint.register(format="dataframe")
+    def busy() -> pl.DataFrame:
+        deadline = time.thread_time() + 0.6
+        while time.thread_time() < deadline:
+            pass
+        return pl.DataFrame({"id": list(range(100_000))})
+
+    @Task.register()
+    def idle() -> None:
+        time.sleep(0.6)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=2)
+
+    activities = {a.job.name: a for a in pipeline.activities}
+    assert activities["busy"].cpu_time >= 0.5
+    assert activities["idle"].cpu_time < 0.3
+    assert activities["busy"].dataframe_size >= 100_000 * 8
+    assert activities["busy"].peak_memory >= activities["busy"].dataframe_size
+    assert activities["idle"].samples
+    assert all(s.cpu_time < 0.3 for s in activities["idle"].samples)
+
+
+def test_pipeline_retries_transient_failures():
+    from blueno import RetryPolicy
+
+    attempts = []
+
+    @Task.register(retry=RetryPolicy(attempts=3, backoff=0))
+    def flaky() -> None:
+        attempts.append("flaky")
+        if len(attempts) < 3:
+            raise TimeoutError("throttled")
+
+    @Task.register(retry=RetryPolicy(attempts=3, backoff=0))
+    def broken() -> None:
+        raise ValueError("not transient")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=2)
+
+    activities = {a.job.name: a for a in pipeline.activities}
+    assert activities["flaky"].status is ActivityStatus.COMPLETED
+    assert activities["flaky"].retries == 2
+    assert activities["broken"].status is ActivityStatus.FAILED
+    assert activities["broken"].retries == 0
+
+
+def test_pipeline_retried_append_commits_once(tmp_path, monkeypatch):
+    import polars as pl
+
+    from blueno import Blueprint, RetryPolicy
+    from blueno.etl import read_delta
+
+    maintained = []
+    original_maintain = Blueprint.maintain
+
+    def flaky_maintain(self):
+        # Fails after the append was committed, on the first attempt only.
+        maintained.append(self.name)
+        if len(maintained) == 1:
+            raise ConnectionError("connection reset")
+        return original_maintain(self)
+
+    monkeypatch.setattr(Blueprint, "maintain", flaky_maintain)
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "appended"),
+        format="delta",
+        write_mode="append",
+        retry=RetryPolicy(attempts=2, backoff=0),
+    )
+    def appended() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run()
+
+    assert pipeline.activities[0].status is ActivityStatus.COMPLETED
+    assert pipeline.activities[0].retries == 1
+    assert read_delta(str(tmp_path / "appended")).collect().height == 3
+
+
+def test_pipeline_timeout_fails_activity_and_cancels_dependents():
+    from datetime import timedelta
+
+    @Task.register(timeout=timedelta(seconds=0.2))
+    def hanging() -> None:
+        time.sleep(5)
+
+    @Task.register()
+    def after_hanging(hanging) -> None:
+        pass
+
+    @Task.register()
+    def sleepy() -> None:
+        time.sleep(5)
+
+    @Task.register()
+    def independent() -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+
+    start = time.perf_counter()
+    pipeline.run(concurrency=2, timeout=timedelta(seconds=0.5))
+    assert time.perf_counter() - start < 3
+
+    statuses = {a.job.name: a.status for a in pipeline.activities}
+    assert statuses == {
+        "hanging": ActivityStatus.FAILED,
+        "after_hanging": ActivityStatus.CANCELLED,
+        "sleepy": ActivityStatus.FAILED,
+        "independent": ActivityStatus.COMPLETED,
+    }
+    assert isinstance(pipeline.failed_jobs["hanging"], JobTimeoutError)
+    assert isinstance(pipeline.failed_jobs["sleepy"], JobTimeoutError)
+
+
+def test_cancelled_job_stops_at_next_step():
+    from blueno.exceptions import JobCancelledError
+
+    @Task.register()
+    def cancelled() -> None:
+        pass
+
+    job = job_registry.jobs["cancelled"]
+    job._cancel()
+    with pytest.raises(JobCancelledError):
+        job.run()
+
+
+def test_pipeline_run_async_multiplexes_async_tasks():
+    import asyncio
+
+    order = []
+
+    for i in range(50):
+
+        @Task.register(name=f"wait_{i}")
+        async def wait() -> None:
+            await asyncio.sleep(0.2)
+
+    @Task.register()
+    def blocking() -> None:
+        order.append("blocking")
+
+    @Task.register()
+    async def after_blocking(blocking) -> None:
+        order.append("after_blocking")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+
+    start = time.perf_counter()
+    asyncio.run(pipeline.run_async(concurrency=1))
+
+    # 50 waits of 0.2 seconds would take 10 seconds with a single worker.
+    assert time.perf_counter() - start < 2
+    assert order == ["blocking", "after_blocking"]
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+
+
+def test_pipeline_run_async_times_out_async_tasks():
+    import asyncio
+    from datetime import timedelta
+
+    @Task.register(timeout=timedelta(seconds=0.2))
+    async def slow() -> None:
+        await asyncio.sleep(5)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    asyncio.run(pipeline.run_async())
+
+    assert pipeline.activities[0].status is ActivityStatus.FAILED
+    assert isinstance(pipeline.failed_jobs["slow"], JobTimeoutError)
+
+
+def test_pipeline_run_async_uses_given_run_id(monkeypatch):
+    import asyncio
+
+    from blueno import run_context
+
+    monkeypatch.setattr(run_context, "run_id", None)
+    run_ids = []
+
+    @Task.register()
+    async def record() -> None:
+        run_ids.append(run_context.run_id)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    asyncio.run(pipeline.run_async(run_id="resumed"))
+
+    assert pipeline.run_id == "resumed"
+    assert run_ids == ["resumed"]
+
+
+def test_async_task_runs_with_the_thread_runner():
+    calls = []
+
+    @Task.register()
+    async def async_task() -> None:
+        calls.append("async_task")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run()
+
+    assert calls == ["async_task"]
+
+
+def test_resource_pools_only_throttle_jobs_sharing_the_pool():
+    import threading
+
+    lock = threading.Lock()
+    running = {"api": 0, "other": 0}
+    peak = {"api": 0, "other": 0}
+
+    def work(kind: str) -> None:
+        with lock:
+            running[kind] += 1
+            peak[kind] = max(peak[kind], running[kind])
+        time.sleep(0.1)
+        with lock:
+            running[kind] -= 1
+
+    for i in range(3):
+
+        @Task.register(name=f"api_{i}", resources={"api": 1})
+        def api() -> None:
+            work("api")
+
+        @Task.register(name=f"other_{i}")
+        def other() -> None:
+            work("other")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.resource_pools = {"api": 1}
+    pipeline.run(concurrency=6)
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    assert peak == {"api": 1, "other": 3}
+
+
+def test_fair_share_alternates_between_tag_groups():
+    started = []
+
+    def register(layer: str, i: int) -> None:
+        @Task.register(name=f"{layer}_{i}", tags={"layer": layer})
+        def job() -> None:
+            started.append(layer)
+            time.sleep(0.05)
+
+    for layer in ("silver", "gold"):
+        for i in range(3):
+            register(layer, i)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.fair_share_tag = "layer"
+    pipeline.run(concurrency=2)
+
+    assert sorted(started[:2]) == ["gold", "silver"]
+    assert sorted(started[2:4]) == ["gold", "silver"]
+
+
+def test_resume_only_reruns_unfinished_activities_at_pinned_versions(tmp_path):
+    import polars as pl
+    from deltalake import DeltaTable
+
+    from blueno import Blueprint
+    from blueno.orchestration.history import RunHistory
+
+    calls = []
+    attempts = {"downstream": 0}
+
+    @Blueprint.register(table_uri=str(tmp_path / "upstream"), format="delta", write_mode="append")
+    def upstream() -> pl.DataFrame:
+        calls.append("upstream")
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(format="dataframe")
+    def lookup() -> pl.DataFrame:
+        calls.append("lookup")
+        return pl.DataFrame({"id": [1, 2, 3, 4], "name": ["a", "b", "c", "d"]})
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "downstream"), format="delta", write_mode="overwrite"
+    )
+    def downstream(self: Blueprint, upstream: pl.LazyFrame, lookup: pl.LazyFrame) -> pl.LazyFrame:
+        calls.append("downstream")
+        attempts["downstream"] += 1
+        if attempts["downstream"] == 1:
+            raise ValueError("failed")
+        return upstream.join(lookup, on="id")
+
+    @Task.register()
+    def report(downstream) -> None:
+        calls.append("report")
+
+    history = RunHistory(str(tmp_path / "history.db"))
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.history = history
+    pipeline.run()
+    run_id = pipeline.run_id
+
+    assert "downstream" in pipeline.failed_jobs
+    version = DeltaTable(str(tmp_path / "upstream")).version()
+    assert history.manifest(run_id)["upstream"].output_version == version
+    assert history.manifest(run_id)["report"].status == "cancelled"
+
+    # A later commit to the upstream table is not visible to the resumed run.
+    pl.DataFrame({"id": [4]}).write_delta(str(tmp_path / "upstream"), mode="append")
+
+    # Resume as a new process would, without the in-memory results of the failed run.
+    calls.clear()
+    for job in job_registry.jobs.values():
+        job._clear_result()
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.history = history
+    pipeline.resume(run_id)
+    pipeline.run(run_id=run_id)
+
+    assert calls == ["lookup", "downstream", "report"]
+    assert not pipeline.failed_jobs
+    assert pl.read_delta(str(tmp_path / "downstream")).height == 3
+    assert history.manifest(run_id)["report"].status == "completed"
+
+
+def test_resume_requires_a_recorded_run(tmp_path):
+    from blueno.exceptions import BluenoUserError
+    from blueno.orchestration.history import RunHistory
+
+    @Task.register()
+    def task() -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.history = RunHistory(str(tmp_path / "history.db"))
+
+    with pytest.raises(BluenoUserError):
+        pipeline.resume("unknown")
+
+
+def test_plan_skips_fresh_subtrees_before_the_run(tmp_path, monkeypatch):
+    from datetime import timedelta
+
+    import polars as pl
+
+    from blueno import Blueprint
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "source"),
+        format="delta",
+        write_mode="overwrite",
+        freshness=timedelta(hours=1),
+    )
+    def source() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(table_uri=str(tmp_path / "target"), format="delta", write_mode="overwrite")
+    def target(self: Blueprint, source: pl.LazyFrame) -> pl.LazyFrame:
+        return source
+
+    @Task.register()
+    def report(target) -> None:
+        pass
+
+    create_pipeline(list(job_registry.jobs.values())).run()
+
+    decided = []
+    decide_refresh = Blueprint._decide_refresh
+
+    def counting_decide_refresh(self):
+        decided.append(self.name)
+        return decide_refresh(self)
+
+    monkeypatch.setattr(Blueprint, "_decide_refresh", counting_decide_refresh)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    entries = {entry.job_name: entry for entry in pipeline.plan()}
+
+    assert {name: entry.run for name, entry in entries.items()} == {
+        "source": False,
+        "target": False,
+        "report": True,
+    }
+    assert entries["source"].reason.startswith("fresh")
+    assert entries["target"].reason == "upstream tables have not changed since the last refresh"
+
+    pipeline.run()
+
+    assert sorted(decided) == ["source", "target"]
+    assert [a.status for a in pipeline.activities] == [
+        ActivityStatus.SKIPPED,
+        ActivityStatus.SKIPPED,
+        ActivityStatus.COMPLETED,
+    ]
+
+
+def test_plan_runs_dependents_of_planned_jobs(tmp_path):
+    from datetime import timedelta
+
+    import polars as pl
+
+    from blueno import Blueprint
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "source"),
+        format="delta",
+        write_mode="overwrite",
+        freshness=timedelta(0),
+    )
+    def source() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(table_uri=str(tmp_path / "target"), format="delta", write_mode="overwrite")
+    def target(self: Blueprint, source: pl.LazyFrame) -> pl.LazyFrame:
+        return source
+
+    @Blueprint.register(table_uri=str(tmp_path / "other"), format="delta", write_mode="overwrite")
+    def other() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1]})
+
+    create_pipeline(list(job_registry.jobs.values()), name_filters=["other"]).run()
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()), name_filters=["source", "target"])
+    entries = {entry.job_name: entry for entry in pipeline.plan()}
+
+    assert entries["source"].run and entries["target"].run
+    assert entries["target"].reason == "upstream job source will run"
+    assert entries["other"].reason == "did not match the name filters"
+
+    pipeline.run()
+
+    statuses = {a.job.name: a.status for a in pipeline.activities}
+    assert statuses["target"] is ActivityStatus.COMPLETED
+    assert pl.read_delta(str(tmp_path / "target")).height == 3
+
+
+def test_pipeline_tracer_records_spans_and_slots(tmp_path):
+    import json
+
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.tracing import Tracer
+
+    @Blueprint.register(table_uri=str(tmp_path / "target"), format="delta", write_mode="append")
+    def target() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Task.register()
+    def report(target) -> None:
+        pass
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.tracer = Tracer()
+    pipeline.run(concurrency=2)
+
+    spans = {(span.category, span.name): span for span in pipeline.tracer.spans}
+    run = spans[("run", "pipeline run")]
+    activity = spans[("activity", "target")]
+    assert activity.parent_id == run.span_id
+    assert activity.attributes["rows_written"] == 3
+    assert spans[("step", "write")].attributes["job_name"] == "target"
+    assert spans[("delta", "write_deltalake")].attributes["version"] == 1
+    assert spans[("activity", "report")].parent_id == run.span_id
+    assert any(sample.values["idle"] == 1 for sample in pipeline.tracer.counters)
+
+    pipeline.tracer.export_chrome(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    assert {event["ph"] for event in events} == {"M", "X", "C"}
+
+    pipeline.tracer.export_otlp(str(tmp_path / "trace.otlp.json"))
+    with open(tmp_path / "trace.otlp.json") as f:
+        otlp_spans = json.load(f)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(otlp_spans) == len(pipeline.tracer.spans)
+
+
+def test_run_continuous_runs_dependents_of_new_commits(tmp_path):
+    import threading
+    from datetime import timedelta
+
+    import polars as pl
+
+    from blueno import Blueprint
+
+    calls = []
+
+    @Blueprint.register(table_uri=str(tmp_path / "source"), format="delta", write_mode="overwrite")
+    def source() -> pl.DataFrame:
+        calls.append("source")
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(table_uri=str(tmp_path / "target"), format="delta", write_mode="overwrite")
+    def target(self: Blueprint, source: pl.LazyFrame) -> pl.LazyFrame:
+        calls.append("target")
+        return source
+
+    @Blueprint.register(table_uri=str(tmp_path / "other"), format="delta", write_mode="overwrite")
+    def other() -> pl.DataFrame:
+        calls.append("other")
+        return pl.DataFrame({"id": [1]})
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=pipeline.run_continuous,
+        kwargs={
+            "poll_interval": 0.05,
+            "debounce": timedelta(seconds=0.1),
+            "stop_event": stop,
+            "max_batches": 2,
+        },
+    )
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while calls.count("target") < 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # The first run commits to the tables itself, which must not trigger a micro-batch.
+    time.sleep(0.3)
+    assert sorted(calls) == ["other", "source", "target"]
+
+    pl.DataFrame({"id": [4]}).write_delta(str(tmp_path / "source"), mode="append")
+    thread.join(10)
+    stop.set()
+
+    assert not thread.is_alive()
+    assert sorted(calls) == ["other", "source", "target", "target"]
+    assert pl.read_delta(str(tmp_path / "target")).height == 4
+    statuses = {a.job.name: a.status for a in pipeline.activities}
+    assert statuses == {
+        "source": ActivityStatus.SKIPPED,
+        "target": ActivityStatus.COMPLETED,
+        "other": ActivityStatus.SKIPPED,
+    }
+
+
+def test_run_continuous_rejects_run_id():
+    from blueno.exceptions import BluenoUserError
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    with pytest.raises(BluenoUserError, match="run_id"):
+        pipeline.run_continuous(run_id="nightly")
+
+
+def test_pipeline_releases_results_after_their_last_dependent():
+    import polars as pl
+
+    from blueno import Blueprint
+
+    retained = {}
+
+    def is_retained(name: str) -> bool:
+        return job_registry.jobs[name]._dataframe is not None
+
+    @Blueprint.register(format="dataframe")
+    def lookup() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(format="dataframe", priority=200)
+    def first(lookup: pl.LazyFrame) -> pl.LazyFrame:
+        return lookup
+
+    @Blueprint.register(format="dataframe")
+    def second(lookup: pl.LazyFrame) -> pl.LazyFrame:
+        retained["lookup"] = is_retained("lookup")
+        return lookup
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=1)
+
+    assert [a.status for a in pipeline.activities] == [ActivityStatus.COMPLETED] * 3
+    assert retained == {"lookup": True}
+    assert not is_retained("lookup")
+    # The leaves are the outputs of the run.
+    assert is_retained("first") and is_retained("second")
+    assert not pipeline._retained_results
+
+
+def test_pipeline_shares_overwritten_delta_results_with_dependents(tmp_path):
+    import polars as pl
+
+    from blueno import Blueprint
+
+    retained = {}
+
+    def is_retained(name: str) -> bool:
+        return job_registry.jobs[name]._dataframe is not None
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "overwritten"), format="delta", write_mode="overwrite"
+    )
+    def overwritten() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(table_uri=str(tmp_path / "appended"), format="delta", write_mode="append")
+    def appended() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(format="dataframe")
+    def report(overwritten: pl.LazyFrame, appended: pl.LazyFrame) -> pl.LazyFrame:
+        retained["overwritten"] = is_retained("overwritten")
+        retained["appended"] = is_retained("appended")
+        return overwritten.join(appended, on="id")
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.run(concurrency=1)
+
+    # Appended results only hold the new rows, so dependents read the table.
+    assert retained == {"overwritten": True, "appended": False}
+    assert not is_retained("overwritten")
+
+
+@pytest.mark.parametrize(
+    ("spill_size", "mode"),
+    [(1024**3, "memory"), (0, "file")],
+)
+def test_pipeline_caches_fan_out_dataframes_once(spill_size, mode):
+    import polars as pl
+
+    from blueno import Blueprint
+
+    executions = []
+
+    def count(series: pl.Series) -> pl.Series:
+        executions.append(1)
+        return series
+
+    @Blueprint.register(format="dataframe", memory_hint=1024)
+    def staged() -> pl.LazyFrame:
+        return pl.LazyFrame({"id": [1, 2, 3]}).with_columns(
+            pl.col("id").map_batches(count, return_dtype=pl.Int64)
+        )
+
+    @Blueprint.register(format="dataframe")
+    def plain() -> pl.LazyFrame:
+        return pl.LazyFrame({"id": [1, 2, 3]})
+
+    def consumer(name: str):
+        def transform(staged: pl.LazyFrame, plain: pl.LazyFrame) -> pl.DataFrame:
+            return staged.join(plain, on="id").collect()
+
+        transform.__name__ = name
+        return Blueprint.register(format="dataframe")(transform)
+
+    for name in ("first", "second", "third"):
+        consumer(name)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.auto_cache_spill_size = spill_size
+    pipeline.run(concurrency=2)
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    assert len(executions) == 1
+    report = pipeline.cache_report()
+    assert report["staged"].startswith(f"{mode} - read by 3 dependents")
+    assert report["plain"].startswith("lazy")
+    assert set(report) == {"staged", "plain"}
+
+
+def test_pipeline_fuses_siblings_sharing_an_upstream(tmp_path):
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.tracing import Tracer
+
+    executions = []
+
+    def count(series: pl.Series) -> pl.Series:
+        executions.append(1)
+        return series
+
+    @Blueprint.register(format="dataframe")
+    def staged() -> pl.LazyFrame:
+        return pl.LazyFrame({"id": [1, 2, 3]}).with_columns(
+            pl.col("id").map_batches(count, return_dtype=pl.Int64)
+        )
+
+    @Blueprint.register(table_uri=str(tmp_path / "totals"), format="delta", write_mode="overwrite")
+    def totals(staged: pl.LazyFrame) -> pl.LazyFrame:
+        return staged.select(pl.col("id").sum())
+
+    @Blueprint.register(table_uri=str(tmp_path / "events"), format="delta", write_mode="append")
+    def events(staged: pl.LazyFrame) -> pl.LazyFrame:
+        return staged.filter(pl.col("id") > 1)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.auto_cache = False
+    pipeline.fuse_siblings = True
+    pipeline.tracer = Tracer()
+    pipeline.run(concurrency=2)
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    assert len(executions) == 1
+    assert pl.read_delta(str(tmp_path / "totals"))["id"].to_list() == [6]
+    assert pl.read_delta(str(tmp_path / "events"))["id"].sort().to_list() == [2, 3]
+
+    fused = [s for s in pipeline.tracer.spans if s.name == "fused execution"]
+    assert len(fused) == 1
+    assert sorted(fused[0].attributes["jobs"].split(", ")) == ["events", "totals"]
+    steps = {a.job.name: [step.name for step in a.steps] for a in pipeline.activities}
+    assert "fused_collect" in steps["totals"] and "fused_collect" in steps["events"]
+
+
+def test_pipeline_materializes_fused_siblings_above_spill_size_on_their_own(tmp_path):
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.tracing import Tracer
+
+    @Blueprint.register(format="dataframe")
+    def staged() -> pl.LazyFrame:
+        return pl.LazyFrame({"id": [1, 2, 3]}).with_columns(pl.col("id") * 2)
+
+    @Blueprint.register(table_uri=str(tmp_path / "totals"), format="delta", write_mode="overwrite")
+    def totals(staged: pl.LazyFrame) -> pl.LazyFrame:
+        return staged.select(pl.col("id").sum())
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "events"), format="delta", write_mode="append", memory_hint="1MB"
+    )
+    def events(staged: pl.LazyFrame) -> pl.LazyFrame:
+        return staged.filter(pl.col("id") > 2)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.auto_cache_spill_size = 1024
+    pipeline.fuse_siblings = True
+    pipeline.tracer = Tracer()
+    pipeline.run(concurrency=1)
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    assert pl.read_delta(str(tmp_path / "totals"))["id"].to_list() == [12]
+    assert pl.read_delta(str(tmp_path / "events"))["id"].sort().to_list() == [4, 6]
+
+    assert len([s for s in pipeline.tracer.spans if s.name == "fused execution"]) == 1
+    assert not [s for s in pipeline.tracer.spans if s.name == "fused collect"]
+    spilled = [s.attributes["path"] for s in pipeline.tracer.spans if s.name == "sink_ipc"]
+    assert [os.path.basename(path) for path in spilled] == ["events.arrow"]
+
+
+@pytest.mark.parametrize("concurrency, fused_jobs", [(4, []), (2, [2])])
+def test_pipeline_only_fuses_siblings_without_shared_plan_when_slots_are_short(
+    tmp_path, concurrency, fused_jobs
+):
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.tracing import Tracer
+
+    @Blueprint.register(table_uri=str(tmp_path / "raw"), format="delta")
+    def raw() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    for name in ["first", "second", "third"]:
+
+        def sibling(raw: pl.LazyFrame) -> pl.LazyFrame:
+            return raw
+
+        sibling.__name__ = name
+        Blueprint.register(table_uri=str(tmp_path / name), format="delta")(sibling)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.fuse_siblings = True
+    pipeline.tracer = Tracer()
+    pipeline.run(concurrency=concurrency)
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    fused = [s for s in pipeline.tracer.spans if s.name == "fused execution"]
+    assert [len(s.attributes["jobs"].split(", ")) for s in fused] == fused_jobs
+
+
+def test_pipeline_spreads_siblings_waiting_for_a_slot_over_the_workers(tmp_path):
+    import threading
+    from collections import Counter
+
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.tracing import Tracer
+
+    threads = {}
+
+    @Blueprint.register(table_uri=str(tmp_path / "raw"), format="delta")
+    def raw() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    for i in range(8):
+
+        def sibling(self: Blueprint, raw: pl.LazyFrame) -> pl.LazyFrame:
+            threads[self.name] = threading.get_native_id()
+            time.sleep(0.2)
+            return raw
+
+        sibling.__name__ = f"sibling_{i}"
+        Blueprint.register(table_uri=str(tmp_path / f"sibling_{i}"), format="delta")(sibling)
+
+    pipeline = create_pipeline(list(job_registry.jobs.values()))
+    pipeline.fuse_siblings = True
+    pipeline.tracer = Tracer()
+    pipeline.run(concurrency=4)
+
+    assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+    # The four siblings which wait for a slot are spread over the four workers instead of fused into one.
+    assert sorted(Counter(threads.values()).values()) == [2, 2, 2, 2]
+    fused = [s for s in pipeline.tracer.spans if s.name == "fused execution"]
+    assert [len(s.attributes["jobs"].split(", ")) for s in fused] == [2, 2, 2, 2]
+    slots = [c.values for c in pipeline.tracer.counters if c.name == "concurrency slots"]
+    assert all(0 <= values["idle"] and values["busy"] <= 4 for values in slots)
+
+
+_result_cache_transforms: list[str] = []
+
+
+def test_result_cache_serves_unchanged_blueprints_across_runs(tmp_path):
+    from datetime import timedelta
+
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.orchestration.result_cache import ResultCache
+
+    # Closures over the list would change their fingerprint with every call.
+    transforms = _result_cache_transforms
+    transforms.clear()
+
+    @Blueprint.register(
+        table_uri=str(tmp_path / "raw"), format="delta", freshness=timedelta(hours=1)
+    )
+    def raw() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(format="dataframe", cache_result=True)
+    def summary(raw: pl.LazyFrame) -> pl.LazyFrame:
+        _result_cache_transforms.append("summary")
+        return raw.select(pl.col("id").sum())
+
+    @Blueprint.register(table_uri=str(tmp_path / "report"), format="parquet", cache_result=True)
+    def report(summary: pl.LazyFrame) -> pl.LazyFrame:
+        _result_cache_transforms.append("report")
+        return summary.with_columns(pl.lit("total").alias("label"))
+
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    def run() -> pl.DataFrame:
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.result_cache = cache
+        pipeline.run(concurrency=1)
+        assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+        return pl.read_parquet(str(tmp_path / "report"))
+
+    assert run()["id"].to_list() == [6]
+    assert transforms == ["summary", "report"]
+
+    # Nothing changed, so both transformations are served from the cache.
+    assert run()["id"].to_list() == [6]
+    assert transforms == ["summary", "report"]
+
+    # A new version of the upstream table invalidates its dependents.
+    pl.DataFrame({"id": [4]}).write_delta(str(tmp_path / "raw"), mode="append")
+    assert run()["id"].to_list() == [10]
+    assert transforms == ["summary", "report"] * 2
+
+
+def test_result_cache_evicts_least_recently_used_entries(tmp_path):
+    import os
+
+    import polars as pl
+
+    from blueno.orchestration.result_cache import ResultCache
+
+    df = pl.DataFrame({"id": list(range(1000))})
+    ResultCache(str(tmp_path)).put("first", df)
+    ResultCache(str(tmp_path)).put("second", df.lazy())
+    os.utime(tmp_path / "first.arrow", (0, 0))
+    size = os.path.getsize(tmp_path / "second.arrow")
+
+    cache = ResultCache(str(tmp_path), max_size=2 * size)
+    cache.put("third", df)
+
+    assert cache.get("first") is None
+    assert cache.get("second").collect().equals(df)
+    assert cache.get("third").collect().equals(df)
+
+
+def test_result_cache_evicts_entries_released_by_earlier_runs(tmp_path):
+    import os
+
+    import polars as pl
+
+    from blueno import Blueprint
+    from blueno.orchestration.result_cache import ResultCache
+
+    @Blueprint.register(table_uri=str(tmp_path / "raw"), format="delta")
+    def raw() -> pl.DataFrame:
+        return pl.DataFrame({"id": [1, 2, 3]})
+
+    @Blueprint.register(format="dataframe", cache_result=True)
+    def summary(raw: pl.LazyFrame) -> pl.LazyFrame:
+        return raw.select(pl.col("id").sum())
+
+    @Blueprint.register(table_uri=str(tmp_path / "report"), format="parquet")
+    def report(summary: pl.LazyFrame) -> pl.LazyFrame:
+        return summary
+
+    # Every entry exceeds the size, so only the entries in use are kept.
+    cache = ResultCache(str(tmp_path / "cache"), max_size=1)
+    for _ in range(3):
+        # Each run writes a new version of the upstream table, so it caches a new entry.
+        pipeline = create_pipeline(list(job_registry.jobs.values()))
+        pipeline.result_cache = cache
+        pipeline.run(concurrency=1)
+        assert all(a.status is ActivityStatus.COMPLETED for a in pipeline.activities)
+
+    assert len([name for name in os.listdir(tmp_path / "cache") if name.endswith(".arrow")]) == 1
+    assert not cache._in_use
+
+
+@pytest.mark.parametrize(
+    "kwargs, match",
+    [
+        ({"executor": "fork"}, "executor"),
+        ({"retry": 3}, "retry"),
+        ({"timeout": 10}, "timeout"),
+        ({"resources": {"sql_endpoint": 0}}, "resources"),
+    ],
+)
+def test_task_register_validates_job_parameters(kwargs, match):
+    from blueno.exceptions import BluenoUserError
+
+    with pytest.raises(BluenoUserError, match=match):
+
+        @Task.register(**kwargs)
+        def task() -> None:
+            pass
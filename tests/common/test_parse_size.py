@@ -0,0 +1,17 @@
+import pytest
+
+from blueno.utils import parse_size
+
+
+def test_parse_size_units():
+    assert parse_size("48GB") == 48 * 1024**3
+    assert parse_size("512 mb") == 512 * 1024**2
+    assert parse_size("1.5KB") == 1536
+    assert parse_size("100") == 100
+    assert parse_size("100B") == 100
+    assert parse_size(2048) == 2048
+
+
+def test_parse_size_invalid_raises():
+    with pytest.raises(ValueError, match="invalid size"):
+        parse_size("lots")
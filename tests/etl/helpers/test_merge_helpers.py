@@ -1,7 +1,10 @@
 import re
+from datetime import date, datetime
 
 from blueno.utils import (
     build_merge_predicate,
+    build_merge_pruning_predicate,
+    build_when_matched_row_hash_predicate,
     build_when_matched_update_columns,
     build_when_matched_update_predicate,
 )
@@ -49,6 +52,48 @@ def test_build_when_matched_update_predicate():
     )
 
 
+def test_build_when_matched_row_hash_predicate():
+    expected_output = """
+        (target."__row_hash" IS NULL) OR (target."__row_hash" != source."__row_hash")
+    """
+
+    actual_output = build_when_matched_row_hash_predicate("__row_hash")
+    assert re.sub(r"\s+", " ", actual_output.strip()) == re.sub(
+        r"\s+", " ", expected_output.strip()
+    )
+
+
+def test_build_merge_pruning_predicate():
+    expected_output = """
+        (target."id" >= 1 AND target."id" <= 100)
+        AND (target."price" >= 0.5 AND target."price" <= 2.25)
+        AND (target."updated_at" >= TIMESTAMP '2024-01-01 00:00:00'
+            AND target."updated_at" <= TIMESTAMP '2024-01-31 12:30:00.000001')
+        AND (target."region" IN ('EU', 'O''Hare'))
+        AND (target."country" IN ('DK') OR target."country" IS NULL)
+        AND (target."day" IN (DATE '2024-01-01'))
+        AND (target."active" IN (TRUE, FALSE))
+    """
+
+    actual_output = build_merge_pruning_predicate(
+        {
+            "id": (1, 100),
+            "amount": (None, None),
+            "price": (0.5, 2.25),
+            "updated_at": (datetime(2024, 1, 1), datetime(2024, 1, 31, 12, 30, 0, 1)),
+        },
+        {
+            "region": ["EU", "O'Hare"],
+            "country": ["DK", None],
+            "day": [date(2024, 1, 1)],
+            "active": [True, False],
+        },
+    )
+    assert re.sub(r"\s+", " ", actual_output.strip()) == re.sub(
+        r"\s+", " ", expected_output.strip()
+    )
+
+
 def test_build_when_matched_update_columns():
     column_names = ["column1", "column2", "column3"]
     expected_output = {
@@ -0,0 +1,81 @@
+import polars as pl
+from deltalake import DeltaTable
+from polars.testing import assert_frame_equal
+
+from blueno.etl import read_delta, upsert
+from blueno.etl.load.key_index import KeyIndex
+
+
+def test_key_index_follows_commits_of_other_writers(tmp_path):
+    table_uri = str(tmp_path / "target_table")
+    pl.DataFrame({"ID": [1, 2], "Region": ["EU", "US"]}).write_delta(
+        table_uri, delta_write_options={"partition_by": ["Region"]}
+    )
+
+    key_index = KeyIndex(table_uri, ["ID", "Region"])
+    key_index.sync(DeltaTable(table_uri))
+    lookup = pl.DataFrame({"ID": [1, 2, 3], "Region": ["EU", "EU", "EU"]})
+    assert key_index.candidates(lookup)["ID"].to_list() == [1]
+
+    pl.DataFrame({"ID": [3], "Region": ["EU"]}).write_delta(table_uri, mode="append")
+    key_index.sync(DeltaTable(table_uri))
+    assert key_index.version == 1
+    assert key_index.candidates(lookup)["ID"].to_list() == [1, 3]
+
+    pl.DataFrame({"ID": [2], "Region": ["EU"]}).write_delta(table_uri, mode="overwrite")
+    key_index.sync(DeltaTable(table_uri))
+    assert key_index.candidates(lookup)["ID"].to_list() == [2]
+
+    # A new index loads the stored one.
+    stored = KeyIndex(table_uri, ["ID", "Region"])
+    stored.sync(DeltaTable(table_uri))
+    assert stored.version == 2
+    assert stored.candidates(lookup)["ID"].to_list() == [2]
+
+
+def test_key_index_is_rebuilt_when_its_key_changes(tmp_path):
+    table_uri = str(tmp_path / "target_table")
+    pl.DataFrame({"ID": [1, 2], "Type": ["a", "b"]}).write_delta(table_uri)
+    KeyIndex(table_uri, ["ID"]).sync(DeltaTable(table_uri))
+
+    key_index = KeyIndex(table_uri, ["ID", "Type"])
+    key_index.sync(DeltaTable(table_uri))
+
+    lookup = pl.DataFrame({"ID": [1, 2], "Type": ["a", "a"]})
+    assert key_index.candidates(lookup)["ID"].to_list() == [1]
+
+
+def test_upsert_with_key_index_appends_new_keys(tmp_path):
+    table_uri = str(tmp_path / "target_table")
+    key_index = KeyIndex(table_uri, ["ID"])
+
+    metrics = upsert(
+        table_uri,
+        pl.DataFrame({"ID": [1, 2], "Value": [0, 0]}),
+        ["ID"],
+        append_new_keys=True,
+        key_index=key_index,
+    )
+    assert metrics["upsert_path"] == "append"
+    metrics = upsert(
+        table_uri,
+        pl.DataFrame({"ID": [3, 4], "Value": [0, 0]}),
+        ["ID"],
+        append_new_keys=True,
+        key_index=key_index,
+    )
+    assert metrics["upsert_path"] == "append"
+
+    metrics = upsert(
+        table_uri,
+        pl.DataFrame({"ID": [2, 5], "Value": [1, 1]}),
+        ["ID"],
+        append_new_keys=True,
+        key_index=key_index,
+    )
+    assert metrics["upsert_path"] == "merge"
+    assert metrics["num_target_rows_updated"] == 1
+
+    expected_df = pl.DataFrame({"ID": [1, 2, 3, 4, 5], "Value": [0, 1, 0, 0, 1]})
+    assert_frame_equal(read_delta(table_uri).collect(), expected_df, check_row_order=False)
+    assert key_index.version == DeltaTable(table_uri).version()
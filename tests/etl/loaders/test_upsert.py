@@ -1,10 +1,13 @@
 import polars as pl
+import pytest
+from deltalake import DeltaTable
 from polars.testing import assert_frame_equal
 
 from blueno.etl import (
     read_delta,
     upsert,
 )
+from blueno.exceptions import GenericBluenoError
 
 
 def test_upsert(tmp_path):
@@ -43,3 +46,150 @@ def test_upsert(tmp_path):
     )
 
     assert_frame_equal(actual_df, expected_df, check_row_order=False)
+
+
+def test_upsert_evaluates_lazy_source_once(tmp_path):
+    target_table_path = str(tmp_path / "target_table")
+    evaluations = []
+
+    def count(series: pl.Series) -> pl.Series:
+        evaluations.append(1)
+        return series
+
+    source_df = pl.LazyFrame({"ID": [1, 2, 3], "FirstName": ["Alice", "Bob", "Charlie"]})
+    upsert(
+        target_table_path,
+        source_df.with_columns(pl.col("ID").map_batches(count, return_dtype=pl.Int64)),
+        ["ID"],
+    )
+
+    assert len(evaluations) == 1
+    assert_frame_equal(
+        source_df.collect(), read_delta(target_table_path).collect(), check_row_order=False
+    )
+
+
+def test_upsert_rejects_duplicate_keys(tmp_path):
+    source_df = pl.LazyFrame({"ID": [1, 1, 2], "Type": ["a", "a", "b"]})
+
+    with pytest.raises(GenericBluenoError, match="1 duplicates"):
+        upsert(str(tmp_path / "target_table"), source_df, ["ID", "Type"])
+
+
+def test_upsert_with_row_hash_only_updates_changed_rows(tmp_path):
+    target_table_path = str(tmp_path / "target_table")
+
+    # Rows written without a hash are updated once to add it.
+    upsert(target_table_path, pl.DataFrame({"ID": [1, 2], "Name": ["Alice", "Bob"]}), ["ID"])
+    metrics = upsert(
+        target_table_path,
+        pl.DataFrame({"ID": [1, 2], "Name": ["Alice", "Bob"]}),
+        ["ID"],
+        row_hash_column="__row_hash",
+    )
+    assert metrics["num_target_rows_updated"] == 2
+
+    metrics = upsert(
+        target_table_path,
+        pl.LazyFrame({"Name": ["Alice", "Robert", "Charlie"], "ID": [1, 2, 3]}),
+        ["ID"],
+        row_hash_column="__row_hash",
+    )
+
+    assert metrics["num_target_rows_updated"] == 1
+    assert metrics["num_target_rows_inserted"] == 1
+    actual_df = read_delta(target_table_path).drop("__row_hash").collect()
+    expected_df = pl.DataFrame({"ID": [1, 2, 3], "Name": ["Alice", "Robert", "Charlie"]})
+    assert_frame_equal(actual_df, expected_df, check_row_order=False)
+
+
+def test_upsert_with_row_hash_updates_all_rows_once_after_polars_changed(tmp_path):
+    target_table_path = str(tmp_path / "target_table")
+    source_df = pl.DataFrame({"ID": [1, 2], "Name": ["Alice", "Bob"]})
+
+    upsert(target_table_path, source_df, ["ID"], row_hash_column="__row_hash")
+    dt = DeltaTable(target_table_path)
+    assert dt.metadata().configuration["blueno.row_hash.polars_version"] == pl.__version__
+
+    dt.alter.set_table_properties(
+        {"blueno.row_hash.polars_version": "0.0.1"}, raise_if_not_exists=False
+    )
+    metrics = upsert(target_table_path, source_df, ["ID"], row_hash_column="__row_hash")
+    assert metrics["num_target_rows_updated"] == 2
+
+    dt = DeltaTable(target_table_path)
+    assert dt.metadata().configuration["blueno.row_hash.polars_version"] == pl.__version__
+    metrics = upsert(target_table_path, source_df, ["ID"], row_hash_column="__row_hash")
+    assert metrics["num_target_rows_updated"] == 0
+
+
+def test_upsert_with_prune_columns_skips_files_outside_source(tmp_path):
+    target_table_path = str(tmp_path / "target_table")
+
+    for day in [1, 2, 3]:
+        upsert(
+            target_table_path,
+            pl.DataFrame({"ID": [day * 10, day * 10 + 1], "Day": [day, day], "Amount": [0, 0]}),
+            ["ID"],
+        )
+
+    metrics = upsert(
+        target_table_path,
+        pl.DataFrame({"ID": [30, 32], "Day": [3, 3], "Amount": [1, 1]}),
+        ["ID"],
+        prune_columns=["Day"],
+    )
+
+    assert metrics["num_target_files_scanned"] == 1
+    assert metrics["num_target_files_skipped_during_scan"] == 2
+    assert metrics["num_target_rows_updated"] == 1
+    assert metrics["num_target_rows_inserted"] == 1
+    actual_df = read_delta(target_table_path).collect()
+    expected_df = pl.DataFrame(
+        {
+            "ID": [10, 11, 20, 21, 30, 31, 32],
+            "Day": [1, 1, 2, 2, 3, 3, 3],
+            "Amount": [0, 0, 0, 0, 1, 0, 1],
+        }
+    )
+    assert_frame_equal(actual_df, expected_df, check_row_order=False)
+
+
+def test_upsert_appends_when_no_source_key_exists_in_target(tmp_path):
+    target_table_path = str(tmp_path / "target_table")
+    upsert(target_table_path, pl.DataFrame({"ID": [1, 2], "Name": ["Alice", "Bob"]}), ["ID"])
+
+    metrics = upsert(
+        target_table_path,
+        pl.DataFrame({"ID": [3, 4], "Name": ["Charlie", "Aimee"]}),
+        ["ID"],
+        append_new_keys=True,
+    )
+
+    assert metrics["upsert_path"] == "append"
+    assert metrics["num_target_rows_inserted"] == 2
+    assert DeltaTable(target_table_path).history(1)[0]["operation"] == "WRITE"
+    actual_df = read_delta(target_table_path).collect()
+    expected_df = pl.DataFrame({"ID": [1, 2, 3, 4], "Name": ["Alice", "Bob", "Charlie", "Aimee"]})
+    assert_frame_equal(actual_df, expected_df, check_row_order=False)
+
+
+def test_upsert_splits_when_few_source_keys_exist_in_target(tmp_path):
+    target_table_path = str(tmp_path / "target_table")
+    upsert(target_table_path, pl.DataFrame({"ID": ["a", "b"], "Value": [0, 0]}), ["ID"])
+
+    source_df = pl.DataFrame({"ID": ["b"] + [f"new_{i}" for i in range(10)], "Value": [1] * 11})
+    metrics = upsert(target_table_path, source_df, ["ID"], append_new_keys=True)
+
+    assert metrics["upsert_path"] == "split"
+    assert metrics["num_source_rows"] == 11
+    assert metrics["num_target_rows_updated"] == 1
+    assert metrics["num_target_rows_inserted"] == 10
+    actual_df = read_delta(target_table_path).collect()
+    expected_df = pl.concat([pl.DataFrame({"ID": ["a"], "Value": [0]}), source_df])
+    assert_frame_equal(actual_df, expected_df, check_row_order=False)
+
+    # Without append_new_keys, the source is always merged.
+    metrics = upsert(target_table_path, source_df, ["ID"])
+    assert metrics["upsert_path"] == "merge"
+    assert metrics["num_target_rows_updated"] == 0